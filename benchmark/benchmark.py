@@ -0,0 +1,393 @@
+"""
+Frame-time benchmark and golden image regression for trabalho1, trabalho2 and trabalho3.
+
+Every scene is loaded in its own process (the three folders share module names) into an
+offscreen OpenGL context (trabalho3/offscreen.py, works with Mesa llvmpipe on machines
+without a GPU or display) and rendered along a deterministic path:
+  - trabalho2 and trabalho3: a camera flown with Camera.ProcessKeyboard and
+    Camera.ProcessMouseMovement (trabalho3/camera.py), the same calls the window input makes
+  - trabalho1 has no camera, its path is the key presses of the scene (moon cycle,
+    scrolling the scenery, turning the lighthouse) sent through KeyControl
+For each scene it records the load time and the per frame CPU time (input + issuing the
+draw calls), GPU time (GL_TIME_ELAPSED query), triangles drawn (GL_PRIMITIVES_GENERATED
+query), GL calls issued by the draw queue (trabalho2 and trabalho3, see engine/draw_queue.py)
+and total frame time (until glFinish), and compares every GOLDEN_EVERY-th frame
+with the PNG stored in ./golden. With software GL the
+timer query only covers command processing: the rasterization shows up in the frame time.
+
+Results are written as JSON (stdout by default) so runs can be compared across commits;
+a summary goes to stderr. The exit status is 1 when a frame differs from its golden image
+or has none (run --update-golden to store it).
+
+    python ./benchmark/benchmark.py [--scenes trabalho1 trabalho3] [--frames 24] [--json results.json]
+    python ./benchmark/benchmark.py --update-golden     # after an intended visual change
+    python ./benchmark/benchmark.py --no-lod            # full meshes only, to compare with the LODs
+    python ./benchmark/benchmark.py --compact-vertices  # meshes in the vertex_format.py compact format
+
+The same runs are checked by pytest (test_benchmark.py, options in conftest.py), skipped
+when no OpenGL context can be created:
+
+    python -m pytest benchmark [--benchmark-json results.json] [--max-frame-ms 250] [--compact-vertices]
+"""
+import argparse, ctypes, datetime, json, os, platform, subprocess, sys, tempfile, time
+
+import numpy as np
+from PIL import Image
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARK_DIR)
+GOLDEN_DIR = os.path.join(BENCHMARK_DIR, "golden")
+OFFSCREEN_DIR = os.path.join(ROOT, "trabalho3")
+
+# folder with the scene's modules and the directory its relative asset paths start from
+SCENES = {
+    "trabalho1": ("trabalho1", ""),
+    "trabalho2": ("trabalho2", "trabalho2"),
+    "trabalho3": ("trabalho3", "trabalho3"),
+}
+
+# frames 0, GOLDEN_EVERY, 2 * GOLDEN_EVERY, ... are compared with their golden image
+GOLDEN_EVERY = 8
+
+# simulated time between two frames: the camera moves at Camera.MovementSpeed units per second
+FRAME_TIME = 0.1
+
+# (camera movements, mouse x offset, mouse y offset) applied every frame of each 8 frame segment;
+# the pose of frame n only depends on n, so a longer run extends the path instead of changing it
+CAMERA_PATH = [
+    (("BACKWARD", "UP"), 0.0, -10.0),
+    ((), 40.0, 0.0),
+    (("FORWARD", "LEFT"), 0.0, 0.0),
+    (("RIGHT",), -60.0, 10.0),
+]
+SEGMENT_FRAMES = 8
+
+# glfw key names sent to trabalho1's KeyControl every frame
+KEY_PATH = ("KEY_S", "KEY_RIGHT", "KEY_L")
+
+
+# mean/median/95th percentile/max of a list of times in seconds, in milliseconds
+# -------------------------------------------------------------------------------
+def summarize(times: list) -> dict:
+    if not times:
+        return {}
+    ms = np.array(times) * 1000
+    return {"mean": round(float(ms.mean()), 3), "median": round(float(np.median(ms)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3), "max": round(float(ms.max()), 3)}
+
+def golden_path(scene: str, frame: int) -> str:
+    return os.path.join(GOLDEN_DIR, f"{scene}_{frame:03d}.png")
+
+# per channel difference between a frame and its golden image
+# ------------------------------------------------------------
+def compare(image: np.ndarray, golden: np.ndarray, tolerance: int) -> dict:
+    difference = np.abs(image.astype(np.int16) - golden.astype(np.int16)).max(axis=2)
+    return {"max_diff": int(difference.max()), "mean_diff": round(float(difference.mean()), 4),
+            "pixels_over": round(float((difference > tolerance).mean() * 100), 4)}
+
+
+# the scenes as seen by the worker: step(frame) applies that frame's input, render() draws it
+# -------------------------------------------------------------------------------------------
+class Trabalho1:
+    compatibility = True
+
+    # trabalho1 draws no OBJ meshes, so lod and compact change nothing
+    def __init__(self, width: int, height: int, lod: bool = True, compact: bool = False):
+        import glfw
+        import trabalho1
+        from controlers.keyControl import KeyControl
+
+        self.module = trabalho1
+        self.program = trabalho1.create_program()
+        self.objectsControl = trabalho1.load_scene()
+        self.VBO = trabalho1.upload_vertices(self.program, self.objectsControl)
+        self.keyControl = KeyControl()
+        self.keys = [getattr(glfw, name) for name in KEY_PATH]
+        self.press = glfw.PRESS
+
+    def step(self, frame: int) -> None:
+        for key in self.keys:
+            self.keyControl.action(window=None, key=key, action=self.press, objectsControl=self.objectsControl)
+
+    def render(self) -> None:
+        self.module.render(self.program, self.objectsControl)
+
+    # the transformation uniforms and draws of the objects
+    def gl_calls(self) -> int:
+        return self.objectsControl.gl_calls
+
+    def delete(self) -> None:
+        from OpenGL.GL import glDeleteBuffers, glDeleteProgram
+        glDeleteBuffers(1, (self.VBO,))
+        glDeleteProgram(self.program)
+
+class FlyingCamera:
+    compatibility = False
+    start = (0.0, 0.0, 0.0)
+
+    def __init__(self, width: int, height: int, lod: bool = True, compact: bool = False):
+        import glm
+        from camera import Camera
+
+        self.camera = Camera(glm.vec3(*self.start))
+        self.aspect = width / height
+
+    def step(self, frame: int) -> None:
+        from camera import Camera_Movement
+
+        movements, xoffset, yoffset = CAMERA_PATH[frame // SEGMENT_FRAMES % len(CAMERA_PATH)]
+        for movement in movements:
+            self.camera.ProcessKeyboard(Camera_Movement[movement], FRAME_TIME)
+        self.camera.ProcessMouseMovement(xoffset, yoffset)
+
+class Trabalho2(FlyingCamera):
+    start = (0.0, 1.0, 5.0)
+
+    def __init__(self, width: int, height: int, lod: bool = True, compact: bool = False):
+        super().__init__(width, height)
+        import glm
+        import trabalho2
+
+        trabalho2.use_mesh_lod = lod
+        trabalho2.COMPACT_VERTICES = compact
+        self.scene = trabalho2.Scene()
+        self.projection = glm.perspective(glm.radians(45.0), self.aspect, 0.1, 500.0)
+
+    def render(self) -> None:
+        self.scene.render(self.camera.GetViewMatrix(), self.projection)
+
+    def gl_calls(self) -> int:
+        return self.scene.gl_state.calls
+
+    def delete(self) -> None:
+        self.scene.delete()
+
+class Trabalho3(FlyingCamera):
+    start = (0.0, 5.0, 3.0)
+
+    def __init__(self, width: int, height: int, lod: bool = True, compact: bool = False):
+        super().__init__(width, height)
+        import trabalho3
+
+        trabalho3.use_mesh_lod = lod
+        trabalho3.COMPACT_VERTICES = compact
+        self.scene = trabalho3.Scene()
+
+    def step(self, frame: int) -> None:
+        super().step(frame)
+        self.scene.orbitLight(frame * FRAME_TIME * 0.5)
+
+    def render(self) -> None:
+        self.scene.render(self.camera, self.aspect)
+
+    def gl_calls(self) -> int:
+        return self.scene.glState.calls
+
+    def delete(self) -> None:
+        self.scene.delete()
+
+SCENE_CLASSES = {"trabalho1": Trabalho1, "trabalho2": Trabalho2, "trabalho3": Trabalho3}
+
+
+# renders one scene in this process, saves its golden frames as PNG into out_dir and
+# returns the timings; lod=False draws every mesh at full detail, compact=True uploads the
+# meshes in the compact vertex format
+# ----------------------------------------------------------------------------------------
+def run_worker(name: str, frames: int, size: tuple, out_dir: str, lod: bool = True, compact: bool = False) -> dict:
+    folder, cwd = SCENES[name]
+    sys.path.insert(0, os.path.join(ROOT, folder))
+    sys.path.append(OFFSCREEN_DIR)
+    os.chdir(os.path.join(ROOT, cwd))
+
+    import offscreen
+    sceneClass = SCENE_CLASSES[name]
+    context = offscreen.OffscreenContext(*size, compatibility=sceneClass.compatibility)
+    from OpenGL.GL import (glEnable, glFinish, glGenQueries, glDeleteQueries, glBeginQuery, glEndQuery,
+                           glGetQueryObjectui64v, GL_DEPTH_TEST, GL_TIME_ELAPSED, GL_PRIMITIVES_GENERATED,
+                           GL_QUERY_RESULT)
+
+    glEnable(GL_DEPTH_TEST)
+
+    start = time.perf_counter()
+    scene = sceneClass(*size, lod=lod, compact=compact)
+    glFinish()
+    load_time = time.perf_counter() - start
+
+    query, primitivesQuery = glGenQueries(2)
+    elapsed, primitives = ctypes.c_uint64(), ctypes.c_uint64()
+    cpu_times, gpu_times, frame_times, triangles, gl_calls = [], [], [], [], []
+    golden_frames = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        glBeginQuery(GL_PRIMITIVES_GENERATED, primitivesQuery)
+        scene.step(frame)
+        scene.render()
+        glEndQuery(GL_PRIMITIVES_GENERATED)
+        glEndQuery(GL_TIME_ELAPSED)
+        issued = time.perf_counter()
+        glFinish()
+        end = time.perf_counter()
+
+        cpu_times.append(issued - start)
+        glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+        gpu_times.append(elapsed.value / 1e9)
+        glGetQueryObjectui64v(primitivesQuery, GL_QUERY_RESULT, ctypes.byref(primitives))
+        triangles.append(primitives.value)
+        gl_calls.append(scene.gl_calls())
+        frame_times.append(end - start)
+
+        if frame % GOLDEN_EVERY == 0:
+            Image.fromarray(context.read_pixels()).save(os.path.join(out_dir, f"{name}_{frame:03d}.png"))
+            golden_frames.append(frame)
+
+    glDeleteQueries(2, (query, primitivesQuery))
+    renderer = context.renderer()
+    scene.delete()
+    context.destroy()
+
+    # the first frame pays for shader compilation and the first uploads
+    return {
+        "renderer": renderer,
+        "load_s": round(load_time, 4),
+        "first_frame_ms": round(frame_times[0] * 1000, 3),
+        "cpu_ms": summarize(cpu_times[1:]),
+        "gpu_ms": summarize(gpu_times[1:]),
+        "frame_ms": summarize(frame_times[1:]),
+        "fps": round((len(frame_times) - 1) / sum(frame_times[1:]), 2) if frames > 1 else None,
+        "triangles": round(sum(triangles) / len(triangles)) if triangles else 0,
+        "gl_calls": round(sum(gl_calls) / len(gl_calls)) if gl_calls and None not in gl_calls else None,
+        "golden_frames": golden_frames,
+    }
+
+# runs a worker process for the scene and checks its frames against the golden images
+# -----------------------------------------------------------------------------------
+def run_scene(name: str, args, out_dir: str) -> dict:
+    result_path = os.path.join(out_dir, f"{name}.json")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", name, "--result", result_path,
+               "--frames", str(args.frames), "--size", *map(str, args.size), "--out", out_dir]
+    if args.no_lod:
+        command.append("--no-lod")
+    if args.compact_vertices:
+        command.append("--compact-vertices")
+    # anything the scene prints (asset reports, texture load errors) stays out of the JSON on stdout
+    process = subprocess.run(command, stdout=sys.stderr)
+    if process.returncode != 0 or not os.path.isfile(result_path):
+        return {"error": f"worker exited with status {process.returncode}", "passed": False}
+
+    with open(result_path) as f:
+        result = json.load(f)
+
+    result["golden"] = []
+    for frame in result.pop("golden_frames"):
+        image = np.array(Image.open(os.path.join(out_dir, f"{name}_{frame:03d}.png")).convert("RGB"))
+        path = golden_path(name, frame)
+        entry = {"frame": frame, "file": os.path.relpath(path, ROOT)}
+
+        if args.update_golden:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            Image.fromarray(image).save(path)
+            entry["status"] = "updated"
+        elif not os.path.isfile(path):
+            entry["status"] = "missing"
+        else:
+            golden = np.array(Image.open(path).convert("RGB"))
+            if golden.shape != image.shape:
+                entry["status"] = "size mismatch"
+            else:
+                entry.update(compare(image, golden, args.tolerance))
+                entry["status"] = "pass" if entry["pixels_over"] <= args.max_pixels else "fail"
+            if entry["status"] != "pass" and args.save_failures:
+                os.makedirs(args.save_failures, exist_ok=True)
+                Image.fromarray(image).save(os.path.join(args.save_failures, os.path.basename(path)))
+        result["golden"].append(entry)
+
+    # a frame without its golden image (deleted, renamed, or past the stored frames) fails like a
+    # frame that differs: only --update-golden may create them
+    result["passed"] = bool(result["golden"]) and all(entry["status"] in ("pass", "updated") for entry in result["golden"])
+    return result
+
+def git_revision() -> dict:
+    def git(*arguments):
+        return subprocess.run(["git", *arguments], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+# whether an offscreen OpenGL context can be created here, checked in a child process like the
+# scenes themselves
+# ----------------------------------------------------------------------------------------------
+def gl_available() -> bool:
+    check = "import sys; sys.path.insert(0, sys.argv[1]); import offscreen; offscreen.OffscreenContext(16, 16).destroy()"
+    return subprocess.run([sys.executable, "-c", check, OFFSCREEN_DIR], capture_output=True).returncode == 0
+
+def parse_args(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=list(SCENES))
+    parser.add_argument("--frames", type=int, default=3 * GOLDEN_EVERY, help="frames rendered per scene")
+    parser.add_argument("--size", type=int, nargs=2, default=(320, 240), metavar=("W", "H"))
+    parser.add_argument("--json", default="-", help="file for the JSON results ('-' for stdout)")
+    parser.add_argument("--tolerance", type=int, default=4, help="largest difference per channel (0-255) a pixel may have")
+    parser.add_argument("--max-pixels", type=float, default=0.1, help="percentage of pixels allowed above --tolerance")
+    parser.add_argument("--update-golden", action="store_true", help="store the rendered frames as the new golden images")
+    parser.add_argument("--save-failures", metavar="DIR", help="write the frames that do not match into DIR")
+    parser.add_argument("--no-lod", action="store_true", help="draw every mesh at full detail (no levels of detail)")
+    parser.add_argument("--compact-vertices", action="store_true", help="upload the meshes in the compact vertex format")
+    parser.add_argument("--worker", choices=list(SCENES), help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+# renders every scene of args.scenes and returns the results, as written to the JSON
+# ----------------------------------------------------------------------------------
+def run(args) -> dict:
+    results = {
+        **git_revision(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": list(args.size),
+        "frames": args.frames,
+        "tolerance": args.tolerance,
+        "max_pixels": args.max_pixels,
+        "lod": not args.no_lod,
+        "compact_vertices": args.compact_vertices,
+        "scenes": {},
+    }
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in args.scenes:
+            print(f"--- {name}", file=sys.stderr)
+            results["scenes"][name] = run_scene(name, args, out_dir)
+    results["passed"] = all(scene["passed"] for scene in results["scenes"].values())
+    return results
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv)
+    if args.worker:
+        result = run_worker(args.worker, args.frames, tuple(args.size), args.out, not args.no_lod, args.compact_vertices)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    results = run(args)
+
+    log = lambda *values: print(*values, file=sys.stderr)
+    log(f"\n{'scene':<10} {'load s':>7} {'cpu ms':>8} {'gpu ms':>8} {'frame ms':>9} {'fps':>7} {'triangles':>10} {'gl calls':>9}  golden")
+    for name, scene in results["scenes"].items():
+        if "error" in scene:
+            log(f"{name:<10} {scene['error']}")
+            continue
+        statuses = ", ".join(f"{entry['frame']}:{entry['status']}" for entry in scene["golden"])
+        log(f"{name:<10} {scene['load_s']:>7.2f} {scene['cpu_ms'].get('median', 0):>8.2f} "
+            f"{scene['gpu_ms'].get('median', 0):>8.2f} {scene['frame_ms'].get('median', 0):>9.2f} "
+            f"{scene['fps'] or 0:>7.1f} {scene.get('triangles', 0):>10} {scene.get('gl_calls') or '-':>9}  {statuses}")
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0 if results["passed"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
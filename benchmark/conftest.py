@@ -0,0 +1,46 @@
+"""
+pytest options of the benchmark suite (test_benchmark.py); they mirror the command line of
+benchmark.py, which the scenes are run with.
+"""
+import json
+
+import pytest
+
+import benchmark
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption("--frames", type=int, default=3 * benchmark.GOLDEN_EVERY, help="frames rendered per scene")
+    group.addoption("--tolerance", type=int, default=4, help="largest difference per channel (0-255) a pixel may have")
+    group.addoption("--max-pixels", type=float, default=0.1, help="percentage of pixels allowed above --tolerance")
+    group.addoption("--max-frame-ms", type=float, default=1000.0,
+                    help="largest 95th percentile frame time (ms) a scene may take")
+    group.addoption("--no-lod", action="store_true", help="draw every mesh at full detail (no levels of detail)")
+    group.addoption("--compact-vertices", action="store_true", help="upload the meshes in the compact vertex format")
+    group.addoption("--save-failures", metavar="DIR", help="write the frames that do not match into DIR")
+    group.addoption("--benchmark-json", metavar="FILE", help="write the results of the run into FILE")
+
+# every scene is rendered once per session (by the benchmark.py workers), on first use; the
+# results are written as the command line writes them when --benchmark-json is given
+# ------------------------------------------------------------------------------------------
+@pytest.fixture(scope="session")
+def results(request):
+    if not benchmark.gl_available():
+        pytest.skip("no OpenGL context available (EGL offscreen context creation failed)")
+
+    option = request.config.getoption
+    argv = ["--frames", str(option("frames")), "--tolerance", str(option("tolerance")),
+            "--max-pixels", str(option("max_pixels"))]
+    if option("no_lod"):
+        argv.append("--no-lod")
+    if option("compact_vertices"):
+        argv.append("--compact-vertices")
+    if option("save_failures"):
+        argv += ["--save-failures", option("save_failures")]
+    results = benchmark.run(benchmark.parse_args(argv))
+
+    if option("benchmark_json"):
+        with open(option("benchmark_json"), "w") as f:
+            json.dump(results, f, indent=2)
+    return results
@@ -0,0 +1,29 @@
+"""
+The golden image regression and the frame-time budget of the three scenes, as pytest tests
+over the benchmark.py runs (see conftest.py for the options).
+"""
+import pytest
+
+import benchmark
+
+SCENES = list(benchmark.SCENES)
+
+
+def scene_result(results: dict, scene: str) -> dict:
+    result = results["scenes"][scene]
+    assert "error" not in result, f"{scene}: {result['error']}"
+    return result
+
+@pytest.mark.parametrize("scene", SCENES)
+def test_golden(results, scene):
+    golden = scene_result(results, scene)["golden"]
+    assert golden, f"{scene} compared no frame with a golden image"
+    failures = [entry for entry in golden if entry["status"] != "pass"]
+    assert not failures, f"{scene} frames differ from or have no golden images (see --update-golden): {failures}"
+
+@pytest.mark.parametrize("scene", SCENES)
+def test_frame_time(results, scene, request):
+    budget = request.config.getoption("max_frame_ms")
+    frame_ms = scene_result(results, scene)["frame_ms"]
+    assert frame_ms, f"{scene} rendered a single frame, nothing to time"
+    assert frame_ms["p95"] <= budget, f"{scene} 95th percentile frame time {frame_ms['p95']} ms > {budget} ms"
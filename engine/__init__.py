@@ -0,0 +1,16 @@
+"""
+Rendering engine shared by trabalho2 and trabalho3: the asset registry, the mesh and texture
+caches (with the mesh optimizer, levels of detail and compact vertex format run when a mesh
+enters the cache), instancing, frustum culling and the state-sorted draw queue.
+
+The scenes differ in their vertex layout, so the engine does not parse OBJ files itself: it
+imports the obj_loader module of the scene being run (trabalho2/obj_loader.py, position and
+texture coordinates, or trabalho3/obj_loader.py, which adds normals), found in the scene folder
+the script runs from. Each scene puts the repository root on sys.path before importing
+from engine.
+
+The command line tools of the caches run from a scene folder, for that scene's ./objects:
+
+    python ../engine mesh_cache warm
+    python ../engine texture_cache clear
+"""
@@ -0,0 +1,17 @@
+"""
+Runs one of the engine's command line tools from a scene folder (trabalho2/ or trabalho3/):
+
+    python ../engine <mesh_cache | mesh_optimizer | texture_cache | vertex_format> [arguments]
+"""
+import os, runpy, sys
+
+TOOLS = ("mesh_cache", "mesh_optimizer", "texture_cache", "vertex_format")
+
+if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+    print(__doc__.strip(), file=sys.stderr)
+    raise SystemExit(2)
+
+# the engine package from the repository root, and obj_loader.py from the scene folder
+sys.path[:1] = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.getcwd()]
+tool = sys.argv.pop(1)
+runpy.run_module(f"engine.{tool}", run_name="__main__", alter_sys=True)
@@ -0,0 +1,86 @@
+import os, time
+
+# one loaded asset (GPU mesh, texture, ...) shared by every object that uses the same file
+class Asset:
+    def __init__(self, kind: str, path: str, value, nbytes: int, load_time: float, unload=None):
+        self.kind = kind
+        self.path = path
+        self.value = value
+        self.nbytes = nbytes
+        self.load_time = load_time
+        self.unload = unload
+        self.refs = 0
+
+# reference-counted cache of loaded assets keyed by (kind, path), so objects built from
+# the same OBJ/image files share one VAO/VBO and one texture instead of loading their own copy
+class AssetRegistry:
+    def __init__(self):
+        self.entries = {}
+
+    # returns the asset stored for path, calling load(path) -> (value, nbytes) only on the first request
+    # ---------------------------------------------------------------------------------------------------
+    def acquire(self, kind: str, path: str, load, unload=None):
+        key = (kind, os.path.normpath(path))
+        entry = self.entries.get(key)
+
+        if entry is None:
+            start = time.perf_counter()
+            value, nbytes = load(path)
+            entry = Asset(kind, path, value, nbytes, time.perf_counter() - start, unload)
+            self.entries[key] = entry
+
+        entry.refs += 1
+        return entry.value
+
+    # stores an asset loaded elsewhere (e.g. by a background loader) so the next acquire() finds it;
+    # it starts without references and is unloaded once the last one acquiring it releases it
+    # -----------------------------------------------------------------------------------------------
+    def preload(self, kind: str, path: str, value, nbytes: int, load_time: float, unload=None) -> None:
+        key = (kind, os.path.normpath(path))
+        if key in self.entries:
+            if unload:
+                unload(value)
+            return
+        self.entries[key] = Asset(kind, path, value, nbytes, load_time, unload)
+
+    # records the final size and load time of an asset whose contents were filled in after preload()
+    # ------------------------------------------------------------------------------------------------
+    def update(self, kind: str, path: str, nbytes: int, load_time: float) -> None:
+        entry = self.entries.get((kind, os.path.normpath(path)))
+        if entry is not None:
+            entry.nbytes = nbytes
+            entry.load_time = load_time
+
+    # drops one reference, unloading the asset once nobody uses it anymore
+    # ---------------------------------------------------------------------
+    def release(self, kind: str, path: str) -> None:
+        key = (kind, os.path.normpath(path))
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+
+        entry.refs -= 1
+        if entry.refs <= 0:
+            if entry.unload:
+                entry.unload(entry.value)
+            del self.entries[key]
+
+    def total_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self.entries.values())
+
+    # load time and memory per unique asset, plus what loading one copy per instance would have cost
+    # -----------------------------------------------------------------------------------------------
+    def report(self) -> str:
+        lines = [f"{'kind':<8} {'refs':>4} {'load ms':>8} {'MB':>8}  path"]
+        unshared_bytes = 0
+        unshared_time = 0.0
+
+        for entry in sorted(self.entries.values(), key=lambda e: (e.kind, e.path)):
+            lines.append(f"{entry.kind:<8} {entry.refs:>4} {entry.load_time * 1000:>8.1f} {entry.nbytes / 2**20:>8.2f}  {entry.path}")
+            unshared_bytes += entry.nbytes * entry.refs
+            unshared_time += entry.load_time * entry.refs
+
+        total_time = sum(entry.load_time for entry in self.entries.values())
+        lines.append(f"{len(self.entries)} unique assets: {self.total_bytes() / 2**20:.1f} MB loaded in {total_time:.2f} s "
+                     f"(one copy per instance: {unshared_bytes / 2**20:.1f} MB, ~{unshared_time:.2f} s)")
+        return "\n".join(lines)
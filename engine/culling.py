@@ -0,0 +1,78 @@
+import glm
+import numpy as np
+
+# object space bounding box (min, max) of an interleaved vertex buffer whose first three floats are the position
+# --------------------------------------------------------------------------------------------------------------
+def mesh_bounds(vertices, stride: int) -> tuple:
+    positions = np.asarray(vertices, dtype=np.float32).reshape(-1, stride)[:, :3]
+    if len(positions) == 0:
+        return np.zeros(3), np.zeros(3)
+    return positions.min(axis=0).astype(np.float64), positions.max(axis=0).astype(np.float64)
+
+# world space bounding box and sphere of an object, derived from its mesh's box and model matrix
+class Bounds:
+    def __init__(self, local_min: np.ndarray, local_max: np.ndarray):
+        self.local_center = (local_min + local_max) / 2
+        self.local_extent = (local_max - local_min) / 2
+        self.update(glm.mat4(1.0))
+
+    # re-fits the world box around the transformed local box (Arvo's method) and the sphere around it
+    # -----------------------------------------------------------------------------------------------
+    def update(self, model: glm.mat4) -> None:
+        matrix = np.array(model, dtype=np.float64)
+        linear = matrix[:3, :3]
+
+        self.center = linear @ self.local_center + matrix[:3, 3]
+        extent = np.abs(linear) @ self.local_extent
+        self.min = self.center - extent
+        self.max = self.center + extent
+        # the local box's half diagonal grows at most by the largest axis scale
+        self.radius = np.linalg.norm(self.local_extent) * np.linalg.norm(linear, axis=0).max()
+
+# the six planes (a, b, c, d) of the frustum of projection * view, normalized and facing inwards:
+# a point is inside when a*x + b*y + c*z + d >= 0 for all of them (Gribb & Hartmann)
+# ----------------------------------------------------------------------------------------------
+def frustum_planes(projection_view: glm.mat4) -> np.ndarray:
+    m = np.array(projection_view, dtype=np.float64)
+    planes = np.array([m[3] + m[0], m[3] - m[0],    # left, right
+                       m[3] + m[1], m[3] - m[1],    # bottom, top
+                       m[3] + m[2], m[3] - m[2]])   # near, far
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+# skips objects outside the view frustum. objects only need a bounds attribute (Bounds) kept up to
+# date with their model matrix; drawn and culled hold the counts of the last cull() call.
+class FrustumCuller:
+    def __init__(self):
+        self.enabled = True
+        self.drawn = 0
+        self.culled = 0
+
+    # returns the objects whose bounding volumes intersect the frustum, in their original order
+    # -----------------------------------------------------------------------------------------
+    def cull(self, objects, projection: glm.mat4, view: glm.mat4) -> list:
+        objects = list(objects)
+        if not self.enabled or not objects:
+            self.drawn, self.culled = len(objects), 0
+            return objects
+
+        planes = frustum_planes(projection * view)
+        normals, offsets = planes[:, :3], planes[:, 3]
+
+        centers = np.array([obj.bounds.center for obj in objects])
+        radii = np.array([obj.bounds.radius for obj in objects])
+
+        # 1. spheres: cheap and rejects most of what is behind or beside the camera
+        distances = centers @ normals.T + offsets
+        visible = (distances >= -radii[:, None]).all(axis=1)
+
+        # 2. boxes, for what the spheres let through: the corner furthest along each plane normal must be inside
+        candidates = np.nonzero(visible)[0]
+        if len(candidates):
+            mins = np.array([objects[i].bounds.min for i in candidates])
+            maxs = np.array([objects[i].bounds.max for i in candidates])
+            corners = np.where(normals[None] >= 0, maxs[:, None], mins[:, None])
+            visible[candidates] = ((corners * normals[None]).sum(axis=2) + offsets >= 0).all(axis=1)
+
+        self.drawn = int(visible.sum())
+        self.culled = len(objects) - self.drawn
+        return [obj for obj, inside in zip(objects, visible) if inside]
@@ -0,0 +1,108 @@
+from OpenGL.GL import *
+
+import glm
+
+# the GL state the draw loop changes (program, VAO, texture per unit, uniform values) as last set
+# through this tracker: a bind or uniform upload that would not change anything is dropped.
+# calls counts the GL calls issued since new_frame(), skipped the ones dropped; with filter=False
+# every call is issued, to compare against. Whatever is drawn outside the tracker may change the
+# state behind its back: call reset() after it.
+class GLState:
+    def __init__(self, filter: bool = True):
+        self.filter = filter
+        # uniform locations never change for a linked program, so they are kept across frames
+        self.locations = {}
+        # "program", "vertex_array", "active_unit", ("texture", unit) and (program, uniform name)
+        self.bound = {}
+        self.calls = 0
+        self.skipped = 0
+
+    # forgets what is bound, so the next binds are all issued
+    def reset(self) -> None:
+        self.bound = {}
+
+    def new_frame(self) -> None:
+        self.reset()
+        self.calls = self.skipped = 0
+
+    @property
+    def program(self) -> int:
+        return self.bound.get("program")
+
+    # whether setting key to value changes anything; if so it becomes current and is counted
+    def changed(self, key, value) -> bool:
+        if self.filter and key in self.bound and self.bound[key] == value:
+            self.skipped += 1
+            return False
+        self.bound[key] = value
+        self.calls += 1
+        return True
+
+    # counts calls issued elsewhere on the tracker's behalf (e.g. the draw calls of a mesh)
+    def count(self, calls: int = 1) -> None:
+        self.calls += calls
+
+    def use_program(self, program: int) -> None:
+        if self.changed("program", program):
+            glUseProgram(program)
+
+    def bind_vertex_array(self, vertex_array: int) -> None:
+        if self.changed("vertex_array", vertex_array):
+            glBindVertexArray(vertex_array)
+
+    # binds textures[i] to texture unit i (GL_TEXTURE_2D), switching units only when needed
+    # -------------------------------------------------------------------------------------
+    def bind_textures(self, textures) -> None:
+        for unit, texture in enumerate(textures):
+            if self.filter and self.bound.get(("texture", unit)) == texture:
+                self.skipped += 1
+                continue
+            if self.changed("active_unit", unit):
+                glActiveTexture(GL_TEXTURE0 + unit)
+            self.changed(("texture", unit), texture)
+            glBindTexture(GL_TEXTURE_2D, texture)
+
+    # the location of a uniform, asked to GL once per program
+    def uniform_location(self, program: int, name: str) -> int:
+        location = self.locations.get((program, name))
+        if location is None:
+            location = self.locations[(program, name)] = glGetUniformLocation(program, name)
+            self.calls += 1
+        return location
+
+    # uniforms of the program in use, uploaded only when their value changed
+    # -----------------------------------------------------------------------
+    def set_mat4(self, name: str, matrix: glm.mat4) -> None:
+        if self.changed((self.program, name), matrix.to_tuple()):
+            glUniformMatrix4fv(self.uniform_location(self.program, name), 1, GL_FALSE, glm.value_ptr(matrix))
+
+    def set_vec3(self, name: str, value: glm.vec3) -> None:
+        if self.changed((self.program, name), value.to_tuple()):
+            glUniform3fv(self.uniform_location(self.program, name), 1, glm.value_ptr(value))
+
+# one frame's draws, collected in any order and issued sorted by (program, textures, VAO) so that
+# consecutive items share as much state as possible, which GLState then does not bind again.
+# draw(state) issues the item's own uniforms and draw calls through the tracker
+class DrawQueue:
+    def __init__(self, state: GLState, sort: bool = True):
+        self.state = state
+        self.sort = sort
+        self.items = []
+
+    # textures: the texture id of each texture unit, in unit order
+    def submit(self, program: int, textures: tuple, vertex_array: int, draw) -> None:
+        self.items.append((program, tuple(textures), vertex_array, len(self.items), draw))
+
+    # issues every item (in submission order when sort is off) and empties the queue; the VAO is
+    # unbound at the end, as the code after it expects
+    # -------------------------------------------------------------------------------------------
+    def flush(self) -> None:
+        items = sorted(self.items, key=lambda item: item[:4]) if self.sort else self.items
+        for program, textures, vertex_array, _, draw in items:
+            self.state.use_program(program)
+            self.state.bind_textures(textures)
+            self.state.bind_vertex_array(vertex_array)
+            draw(self.state)
+        if items:
+            self.state.bind_vertex_array(0)
+        self.items = []
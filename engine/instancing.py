@@ -0,0 +1,109 @@
+from OpenGL.GL import *
+
+import ctypes
+import numpy as np
+
+# first attribute location of the per-instance model matrix (one vec4 column per location, 3..6)
+INSTANCE_LOCATION = 3
+
+# column-major float32 copy of a list of glm.mat4, ready to be uploaded as instance data
+# --------------------------------------------------------------------------------------
+def pack_matrices(matrices: list) -> np.ndarray:
+    if not matrices:
+        return np.zeros((0, 4, 4), dtype=np.float32)
+    return np.ascontiguousarray(np.array(matrices, dtype=np.float32).transpose(0, 2, 1))
+
+# a set of objects sharing one mesh, drawn with one instanced draw call per level of detail in use.
+# the mesh only has to provide bind_attributes() (binds its VBO and EBO and sets up locations
+# 0..2) and draw_elements(lod, instance_count); each object only has to provide model,
+# model_version and lod (see mesh_lod.py).
+class InstanceGroup:
+    def __init__(self, mesh, objects: list):
+        self.mesh = mesh
+        self.objects = list(objects)
+        self.versions = None
+        self.instance_count = 0
+        # the instance the model matrix attributes start at
+        self.first_instance = 0
+
+        self.VAO = glGenVertexArrays(1)
+        self.instanceVBO = glGenBuffers(1)
+
+        glBindVertexArray(self.VAO)
+        mesh.bind_attributes()
+        # the mesh describes its vertex layout to this VAO again if its format changes
+        mesh.vertex_arrays.append(self.VAO)
+
+        self.bind_instances(0)
+        for column in range(4):
+            glEnableVertexAttribArray(INSTANCE_LOCATION + column)
+            glVertexAttribDivisor(INSTANCE_LOCATION + column, 1)
+
+        glBindVertexArray(0)
+        self.update()
+
+    # points the model matrix attributes of the bound VAO at the matrix of instance first, so a
+    # draw call can start in the middle of the buffer (there is no base instance in OpenGL 3.3)
+    # ------------------------------------------------------------------------------------------
+    def bind_instances(self, first: int) -> None:
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVBO)
+        mat4_size = 16 * ctypes.sizeof(ctypes.c_float)
+        for column in range(4):
+            offset = first * mat4_size + column * mat4_size // 4
+            glVertexAttribPointer(INSTANCE_LOCATION + column, 4, GL_FLOAT, GL_FALSE, mat4_size, ctypes.c_void_p(offset))
+        self.first_instance = first
+
+    # re-uploads the instance matrices of objects (default: the whole group), but only if the set
+    # of objects changed or one of them moved since the last upload; returns the GL calls issued
+    # --------------------------------------------------------------------------------------------
+    def update(self, objects: list = None) -> int:
+        objects = self.objects if objects is None else objects
+        versions = [(id(obj), obj.model_version) for obj in objects]
+        if versions == self.versions:
+            return 0
+
+        models = pack_matrices([obj.model for obj in objects])
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVBO)
+        glBufferData(GL_ARRAY_BUFFER, models.nbytes, models, GL_DYNAMIC_DRAW)
+        self.versions = versions
+        self.instance_count = len(objects)
+        return 2
+
+    # draws objects (a subset of the group, e.g. the ones left after culling) or the whole group,
+    # their matrices sorted by level of detail so each level is one consecutive run of instances
+    # -------------------------------------------------------------------------------------------
+    def draw(self, objects: list = None) -> None:
+        glBindVertexArray(self.VAO)
+        self.draw_instances(objects)
+        glBindVertexArray(0)
+
+    # draw() with the group's VAO already bound; returns the GL calls issued
+    # ----------------------------------------------------------------------
+    def draw_instances(self, objects: list = None) -> int:
+        objects = sorted(self.objects if objects is None else objects, key=lambda obj: obj.lod)
+        calls = self.update(objects)
+        if self.instance_count == 0:
+            return calls
+        first = 0
+        for lod, members in group_by(objects, lambda obj: obj.lod).items():
+            if first != self.first_instance:
+                self.bind_instances(first)
+                calls += 5
+            self.mesh.draw_elements(lod, len(members))
+            calls += 1
+            first += len(members)
+        return calls
+
+    def delete(self) -> None:
+        if self.VAO in self.mesh.vertex_arrays:
+            self.mesh.vertex_arrays.remove(self.VAO)
+        glDeleteVertexArrays(1, (self.VAO,))
+        glDeleteBuffers(1, (self.instanceVBO,))
+
+# groups objects by key(obj) (e.g. mesh + textures), keeping the order in which keys first appear
+# -----------------------------------------------------------------------------------------------
+def group_by(objects, key) -> dict:
+    groups = {}
+    for obj in objects:
+        groups.setdefault(key(obj), []).append(obj)
+    return groups
@@ -0,0 +1,182 @@
+"""
+On-disk cache of the indexed meshes built by obj_loader.py, with their triangles
+and vertices reordered by mesh_optimizer.py and their levels of detail built by
+mesh_lod.py.
+
+Each entry is a small header and a table of the levels of detail, followed by the
+raw float32 vertex data and the uint16/uint32 index data of every level, so a
+cache hit is two np.memmap views that can be handed straight to glBufferData.
+Entries are keyed by the SHA-1 of the OBJ file, the MTL libraries it
+references and the loader, optimizer and LOD versions: editing any of them (or
+bumping obj_loader.LOADER_VERSION, mesh_optimizer.OPTIMIZER_VERSION or
+mesh_lod.LOD_VERSION) makes the old entry unreachable.
+
+    python ../engine mesh_cache warm [file.obj ...]   # default: every ./objects/*/*.obj
+    python ../engine mesh_cache list
+    python ../engine mesh_cache clear
+"""
+import argparse, glob, hashlib, os, re, struct, sys
+
+import numpy as np
+
+import obj_loader
+from engine import mesh_lod, mesh_optimizer
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mesh_cache")
+
+# magic, format version, floats per vertex, vertex count, index count, bytes per index,
+# level of detail count, hex SHA-1 key
+HEADER = struct.Struct("<8sIIQQII40s")
+MAGIC = b"OBJCACHE"
+FORMAT_VERSION = 3
+
+# one per level of detail: first index, index count, base vertex, vertex count, error
+LEVEL = struct.Struct("<QQQQd")
+
+INDEX_TYPES = {2: np.uint16, 4: np.uint32}
+
+# paths of the MTL libraries referenced by an OBJ file
+# ----------------------------------------------------
+def material_libraries(obj_path: str, obj_data: bytes = None) -> list:
+    if obj_data is None:
+        with open(obj_path, "rb") as f:
+            obj_data = f.read()
+
+    base_dir = os.path.dirname(obj_path)
+    names = re.findall(rb"^mtllib[ \t]+(.+?)[ \t]*$", obj_data, re.M)
+    return [os.path.join(base_dir, name.decode()) for name in names]
+
+# content hash identifying the vertex and index buffers of an OBJ file
+# ---------------------------------------------------------
+def cache_key(obj_path: str) -> str:
+    with open(obj_path, "rb") as f:
+        obj_data = f.read()
+
+    digest = hashlib.sha1()
+    digest.update(f"{FORMAT_VERSION}:{obj_loader.LOADER_VERSION}:{obj_loader.VERTEX_STRIDE}:"
+                  f"{mesh_optimizer.OPTIMIZER_VERSION}:{mesh_lod.LOD_VERSION}".encode())
+    digest.update(obj_data)
+
+    for mtl_path in material_libraries(obj_path, obj_data):
+        if os.path.exists(mtl_path):
+            with open(mtl_path, "rb") as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
+
+def cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + ".mesh")
+
+# memory-maps a cache entry into (vertices, indices, lods), returning None if it is missing or unreadable
+# ------------------------------------------------------------------------------------------------------
+def read_entry(path: str, key: str = None):
+    try:
+        with open(path, "rb") as f:
+            magic, version, stride, count, index_count, index_size, lod_count, stored_key = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION or (key and stored_key.decode() != key):
+                return None
+            lods = [mesh_lod.MeshLod(*LEVEL.unpack(f.read(LEVEL.size))) for _ in range(lod_count)]
+    except (OSError, struct.error):
+        return None
+
+    index_type = INDEX_TYPES[index_size]
+    if index_count == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=index_type), lods
+
+    offset = HEADER.size + lod_count * LEVEL.size
+    vertices = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(count * stride,))
+    indices = np.memmap(path, dtype=index_type, mode="r", offset=offset + vertices.nbytes, shape=(index_count,))
+    return vertices, indices, lods
+
+# writes a cache entry atomically so an interrupted run never leaves a truncated file behind
+# -----------------------------------------------------------------------------------------
+def write_entry(path: str, key: str, vertices: np.ndarray, indices: np.ndarray, lods: list) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1)
+    indices = np.ascontiguousarray(indices).reshape(-1)
+    stride = obj_loader.VERTEX_STRIDE
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, stride, len(vertices) // stride,
+                            len(indices), indices.itemsize, len(lods), key.encode()))
+        for lod in lods:
+            f.write(LEVEL.pack(lod.first_index, lod.index_count, lod.base_vertex, lod.vertex_count, lod.error))
+        f.write(vertices.tobytes())
+        f.write(indices.tobytes())
+    os.replace(tmp_path, path)
+
+# returns the (vertices, indices) buffers of an OBJ file and its levels of detail (mesh_lod.MeshLod,
+# level 0 first), parsing it only when no valid cache entry exists
+# -------------------------------------------------------------------------------------------------
+def load_mesh(obj_path: str) -> tuple:
+    key = cache_key(obj_path)
+    path = cache_path(key)
+
+    mesh = read_entry(path, key)
+    if mesh is not None:
+        return mesh
+
+    vertices, indices = obj_loader.load_indexed_obj_model(obj_path)
+    vertices, indices = mesh_optimizer.optimize_mesh(vertices, indices, obj_loader.VERTEX_STRIDE)
+    vertices, indices, lods = mesh_lod.build_lods(vertices, indices, obj_loader.VERTEX_STRIDE)
+    try:
+        write_entry(path, key, vertices, indices, lods)
+    except OSError as e:
+        print(f"Mesh cache not written for {obj_path}: {e}")
+    return vertices, indices, lods
+
+# what indexing saves on the full mesh (level 0): the triangle corners, the unique vertices they
+# share, and the GPU bytes of the buffers drawn with glDrawArrays (one full vertex per corner) and
+# glDrawElements
+# -----------------------------------------------------------------------------------------------
+def indexing_savings(vertices: np.ndarray, indices: np.ndarray, lods: list) -> dict:
+    vertex_bytes = obj_loader.VERTEX_STRIDE * vertices.itemsize
+    full = lods[0]
+    return {
+        "corners": full.index_count,
+        "vertices": full.vertex_count,
+        "array_bytes": full.index_count * vertex_bytes,
+        "indexed_bytes": full.vertex_count * vertex_bytes + full.index_count * indices.itemsize,
+    }
+
+def clear_cache() -> int:
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_DIR, "*.mesh")) + glob.glob(os.path.join(CACHE_DIR, "*.tmp")):
+        os.remove(path)
+        removed += 1
+    return removed
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("warm", "list", "clear"))
+    parser.add_argument("paths", nargs="*", help="OBJ files to warm (default: ./objects/*/*.obj)")
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        print(f"Removed {clear_cache()} cache entries from {CACHE_DIR}")
+
+    elif args.command == "list":
+        entries = sorted(glob.glob(os.path.join(CACHE_DIR, "*.mesh")))
+        for path in entries:
+            print(f"{os.path.basename(path)}  {os.path.getsize(path) / 2**20:8.2f} MB")
+        print(f"{len(entries)} entries in {CACHE_DIR}")
+
+    else:
+        # the vertex shader runs once per corner with glDrawArrays and, with a perfect
+        # post-transform cache, once per unique vertex with glDrawElements
+        print(f"{'corners':>9} {'vertices':>9} {'shared':>7} {'arrays MB':>10} {'indexed MB':>11} {'saved':>6}  "
+              f"{'LOD triangles':<24} mesh")
+        for obj_path in args.paths or sorted(glob.glob("./objects/*/*.obj")):
+            mesh = load_mesh(obj_path)
+            savings = indexing_savings(*mesh)
+            levels = "/".join(str(lod.triangle_count) for lod in mesh[2])
+            shared = savings["corners"] / max(savings["vertices"], 1)
+            saved = 1 - savings["indexed_bytes"] / max(savings["array_bytes"], 1)
+            print(f"{savings['corners']:>9} {savings['vertices']:>9} {shared:>6.2f}x "
+                  f"{savings['array_bytes'] / 2**20:>10.2f} {savings['indexed_bytes'] / 2**20:>11.2f} {saved:>6.0%}  {levels:<24} {obj_path}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
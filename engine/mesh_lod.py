@@ -0,0 +1,221 @@
+"""
+Levels of detail for the indexed meshes of mesh_cache.py, and picking one per object.
+
+build_lods() simplifies a mesh to about LOD_RATIOS of its triangles with quadric error
+metric vertex clustering (Lindstrom, "Out-of-Core Simplification of Large Polygonal
+Models", 2000): the bounding box is cut into cubic cells, all the vertices of a cell
+collapse onto the point that minimizes the summed squared distances to the planes of
+their triangles, and the triangles left with two corners in the same cell disappear.
+Each level is searched for by cell size, then reordered by mesh_optimizer.py. All the
+levels share one vertex and one index buffer; a MeshLod says where each one starts.
+
+update_lods() picks, for every object, the coarsest level whose error projects to at most
+LOD_PIXEL_ERROR pixels on screen. Going coarser needs the error to fall LOD_HYSTERESIS
+times further, so an object at the switching distance does not flicker between levels.
+"""
+import math
+
+import numpy as np
+
+import obj_loader
+from engine import mesh_optimizer
+
+# triangles of each level relative to the full mesh (level 0)
+LOD_RATIOS = (1.0, 0.5, 0.25, 0.125)
+
+# meshes with fewer triangles keep only level 0
+MIN_LOD_TRIANGLES = 2000
+
+# a level is dropped when it does not get below this fraction of the previous one's triangles
+MIN_LOD_REDUCTION = 0.8
+
+# cell sizes tried per level, and how close to the wanted triangle count is close enough
+LOD_SEARCH_STEPS = 8
+LOD_SEARCH_TOLERANCE = 0.15
+
+# normals and texture coordinates are only averaged between vertices of a cell that point to
+# the same side (one of six axis directions) and lie in the same 1 / UV_BUCKETS texture square,
+# which keeps hard edges and texture seams apart
+UV_BUCKETS = 8
+
+# largest on-screen error, in pixels, of the level drawn, and how much smaller it has to be
+# before switching to a coarser level
+LOD_PIXEL_ERROR = 1.0
+LOD_HYSTERESIS = 1.5
+
+# bump whenever build_lods() changes its output, so mesh_cache.py drops old entries
+LOD_VERSION = 1
+
+# one level inside the shared buffers: index_count indices from first_index, numbering the
+# vertex_count vertices from base_vertex; error is the farthest any vertex of the full mesh
+# moved, relative to the mesh's bounding radius (0 for level 0)
+class MeshLod:
+    def __init__(self, first_index: int, index_count: int, base_vertex: int, vertex_count: int, error: float):
+        self.first_index = first_index
+        self.index_count = index_count
+        self.base_vertex = base_vertex
+        self.vertex_count = vertex_count
+        self.error = error
+
+    @property
+    def triangle_count(self) -> int:
+        return self.index_count // 3
+
+# the area weighted plane quadric of every triangle, as (count, 16) rows of a 4x4 matrix
+# --------------------------------------------------------------------------------------
+def triangle_quadrics(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    corners = positions[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(lengths, 1e-30)[:, None]
+
+    planes = np.concatenate((normals, -np.einsum("ij,ij->i", normals, corners[:, 0])[:, None]), axis=1)
+    # the cross product length is twice the triangle area
+    quadrics = planes[:, :, None] * planes[:, None, :] * (lengths / 2)[:, None, None]
+    return quadrics.reshape(-1, 16)
+
+# sums rows of values into the bins given by labels, one column at a time
+def bin_sum(labels: np.ndarray, values: np.ndarray, bins: int) -> np.ndarray:
+    return np.stack([np.bincount(labels, weights=column, minlength=bins) for column in values.T], axis=1)
+
+# collapses the mesh onto a grid of cubic cells of the given size. Returns the new vertex and
+# index buffers and the largest distance a vertex moved
+# -----------------------------------------------------------------------------------------
+def cluster_mesh(vertices: np.ndarray, indices: np.ndarray, stride: int, cell: float, quadrics: np.ndarray = None) -> tuple:
+    table = vertices.reshape(-1, stride)
+    positions = table[:, :3].astype(np.float64)
+    triangles = indices.reshape(-1, 3).astype(np.int64)
+    if quadrics is None:
+        quadrics = triangle_quadrics(positions, triangles)
+
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    grid = np.floor((positions - low) / cell).astype(np.int64)
+    _, vertex_cell = np.unique(np.ravel_multi_index(tuple(grid.T), tuple(grid.max(axis=0) + 1)), return_inverse=True)
+    vertex_cell = vertex_cell.reshape(-1)
+    cell_count = int(vertex_cell.max()) + 1
+
+    # every cell gets the quadrics of the triangles touching it and solves for its point,
+    # pulled slightly towards the mean of its vertices where the planes leave it free
+    # (flat or straight regions)
+    corner_cells = vertex_cell[triangles]
+    cell_quadric = bin_sum(corner_cells.reshape(-1), np.repeat(quadrics, 3, axis=0), cell_count).reshape(-1, 4, 4)
+    vertex_count = np.bincount(vertex_cell, minlength=cell_count)
+    mean = bin_sum(vertex_cell, positions, cell_count) / vertex_count[:, None]
+
+    a, b = cell_quadric[:, :3, :3], cell_quadric[:, :3, 3]
+    regularization = (1e-3 * np.trace(a, axis1=1, axis2=2) / 3 + 1e-12)[:, None, None] * np.eye(3)
+    rhs = regularization[:, 0, 0][:, None] * mean - b
+    points = np.linalg.solve(a + regularization, rhs[:, :, None])[:, :, 0]
+
+    cell_low = np.floor((mean - low) / cell) * cell + low
+    points = np.clip(points, np.maximum(cell_low, low), np.minimum(cell_low + cell, high))
+    error = float(np.linalg.norm(positions - points[vertex_cell], axis=1).max())
+
+    # the new vertices: one per cell, side and texture square
+    keys = [vertex_cell]
+    if stride >= 8:
+        normals = table[:, 3:6]
+        axis = np.abs(normals).argmax(axis=1)
+        keys.append(axis * 2 + (normals[np.arange(len(normals)), axis] < 0))
+    uv = np.floor(table[:, stride - 2:] * UV_BUCKETS).astype(np.int64)
+    keys += [uv[:, 0] - uv[:, 0].min(), uv[:, 1] - uv[:, 1].min()]
+    _, new_vertex = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+    new_vertex = new_vertex.reshape(-1)
+    new_count = int(new_vertex.max()) + 1
+
+    attributes = bin_sum(new_vertex, table[:, 3:].astype(np.float64), new_count)
+    attributes /= np.bincount(new_vertex, minlength=new_count)[:, None]
+    if stride >= 8:
+        attributes[:, 0:3] /= np.maximum(np.linalg.norm(attributes[:, 0:3], axis=1), 1e-12)[:, None]
+    new_cell = np.zeros(new_count, dtype=np.int64)
+    new_cell[new_vertex] = vertex_cell
+    new_table = np.concatenate((points[new_cell], attributes), axis=1).astype(np.float32)
+
+    # drops the collapsed triangles, then the repeated ones (same corners, same winding)
+    kept = ((corner_cells[:, 0] != corner_cells[:, 1]) & (corner_cells[:, 1] != corner_cells[:, 2])
+            & (corner_cells[:, 0] != corner_cells[:, 2]))
+    new_triangles = new_vertex[triangles[kept]]
+    start = new_triangles.argmin(axis=1)[:, None]
+    rotated = np.take_along_axis(new_triangles, (start + np.arange(3)) % 3, axis=1)
+    _, first = np.unique(rotated, axis=0, return_index=True)
+    new_triangles = new_triangles[np.sort(first)]
+
+    used, new_indices = obj_loader.index_corners(new_triangles.reshape(-1, 1))
+    new_vertices = new_table[new_triangles.reshape(-1)[used]].reshape(-1)
+    return new_vertices, new_indices, error
+
+# the cell size whose clustering gets closest to target triangles (within the tolerance) in
+# LOD_SEARCH_STEPS tries; on a surface the triangle count falls with the square of the cell size
+# ---------------------------------------------------------------------------------------------
+def search_level(vertices: np.ndarray, indices: np.ndarray, stride: int, target: int, cell: float, quadrics: np.ndarray):
+    best = None
+    for _ in range(LOD_SEARCH_STEPS):
+        level = cluster_mesh(vertices, indices, stride, cell, quadrics)
+        triangles = len(level[1]) // 3
+        if triangles <= target * (1 + LOD_SEARCH_TOLERANCE):
+            if best is None or triangles > len(best[1]) // 3:
+                best = level
+        if abs(triangles / target - 1) <= LOD_SEARCH_TOLERANCE:
+            break
+        cell *= min(max(math.sqrt(max(triangles, 1) / target), 0.5), 2.0)
+    return best
+
+# the levels of a mesh packed into shared (vertices, indices) buffers, plus their MeshLod list
+# --------------------------------------------------------------------------------------------
+def build_lods(vertices: np.ndarray, indices: np.ndarray, stride: int) -> tuple:
+    levels = [(vertices, indices, 0.0)]
+    triangles = len(indices) // 3
+
+    if triangles >= MIN_LOD_TRIANGLES:
+        positions = vertices.reshape(-1, stride)[:, :3].astype(np.float64)
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        radius = max(float(np.linalg.norm(high - low)) / 2, 1e-12)
+        quadrics = triangle_quadrics(positions, indices.reshape(-1, 3).astype(np.int64))
+
+        # first guess: a grid with about as many cells on a side as the mesh has triangles per side
+        cell = float((high - low).max()) / math.sqrt(triangles)
+        for ratio in LOD_RATIOS[1:]:
+            target = int(triangles * ratio)
+            level = search_level(vertices, indices, stride, target, cell, quadrics)
+            if level is None or not 0 < len(level[1]) // 3 <= MIN_LOD_REDUCTION * (len(levels[-1][1]) // 3):
+                break
+            level_vertices, level_indices = mesh_optimizer.optimize_mesh(level[0], level[1], stride)
+            levels.append((level_vertices, level_indices, level[2] / radius))
+            cell = level[2]
+
+    lods, first_index, base_vertex = [], 0, 0
+    for level_vertices, level_indices, error in levels:
+        vertex_count = len(level_vertices) // stride
+        lods.append(MeshLod(first_index, len(level_indices), base_vertex, vertex_count, error))
+        first_index += len(level_indices)
+        base_vertex += vertex_count
+
+    all_vertices = np.concatenate([level[0] for level in levels])
+    all_indices = np.concatenate([level[1] for level in levels]).astype(indices.dtype)
+    return all_vertices, all_indices, lods
+
+# the level to draw for an object whose bounding sphere covers radius_pixels on screen, given
+# the errors of the mesh's levels and the level drawn last frame
+# --------------------------------------------------------------------------------------------
+def select_lod(errors: list, current: int, radius_pixels: float) -> int:
+    lod = 0
+    for level in range(1, len(errors)):
+        limit = LOD_PIXEL_ERROR if level <= current else LOD_PIXEL_ERROR / LOD_HYSTERESIS
+        if errors[level] * radius_pixels > limit:
+            break
+        lod = level
+    return lod
+
+# sets the lod of every object (with mesh.lods, bounds and lod attributes) seen from eye, where
+# pixels_per_unit is the screen height / (2 tan(fov / 2)); enabled=False draws level 0 everywhere
+# -----------------------------------------------------------------------------------------------
+def update_lods(objects, eye, pixels_per_unit: float, enabled: bool = True) -> None:
+    eye = np.asarray(eye, dtype=np.float64)
+    for obj in objects:
+        lods = obj.mesh.lods
+        if not enabled or len(lods) <= 1:
+            obj.lod = 0
+            continue
+        distance = np.linalg.norm(obj.bounds.center - eye) - obj.bounds.radius
+        radius_pixels = math.inf if distance <= 0 else obj.bounds.radius * pixels_per_unit / distance
+        obj.lod = select_lod([lod.error for lod in lods], obj.lod, radius_pixels)
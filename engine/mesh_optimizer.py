@@ -0,0 +1,198 @@
+"""
+Triangle and vertex reordering for indexed meshes, run once when mesh_cache.py builds an
+entry (Sander, Nehab and Barczak, "Fast Triangle Reordering for Vertex Locality and
+Reduced Overdraw", 2007):
+
+1. tipsify() reorders the triangles so consecutive ones share vertices still in the GPU's
+   post-transform cache, fanning around one vertex at a time;
+2. sort_clusters() reorders the runs of triangles tipsify() emitted in one go, outward
+   facing ones first, so they tend to be drawn before what they hide;
+3. reorder_vertices() renumbers the vertices in the order the triangles use them, so the
+   vertex fetches walk the vertex buffer forwards.
+
+Cache efficiency is measured as the ACMR: transformed vertices per triangle with a FIFO
+cache of CACHE_SIZE entries (3 is the worst case, ~0.5 the best for a regular grid).
+
+    python ../engine mesh_optimizer [file.obj ...]   # default: every ./objects/*/*.obj
+"""
+import argparse, glob, sys, time
+
+import numpy as np
+
+import obj_loader
+
+# post-transform cache entries assumed by tipsify() and acmr()
+CACHE_SIZE = 16
+
+# the overdraw order is kept only while its ACMR stays within this factor of tipsify()'s
+OVERDRAW_THRESHOLD = 1.05
+
+# bump whenever optimize_mesh() changes its output, so mesh_cache.py drops old entries
+OPTIMIZER_VERSION = 1
+
+# average cache miss ratio: vertices transformed per triangle with a FIFO cache of cache_size
+# -------------------------------------------------------------------------------------------
+def acmr(indices: np.ndarray, cache_size: int = CACHE_SIZE) -> float:
+    if len(indices) == 0:
+        return 0.0
+
+    # a vertex stays cached until cache_size more misses push it out
+    entered = [-cache_size - 1] * (int(indices.max()) + 1)
+    misses = 0
+    for vertex in indices.tolist():
+        if misses - entered[vertex] > cache_size:
+            entered[vertex] = misses
+            misses += 1
+    return misses / (len(indices) // 3)
+
+# the triangles using each vertex, as CSR arrays: triangles[offsets[v]:offsets[v + 1]]
+# -------------------------------------------------------------------------------------
+def vertex_triangles(indices: np.ndarray, vertex_count: int) -> tuple:
+    corners = indices.astype(np.int64)
+    order = np.argsort(corners, kind="stable")
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(corners, minlength=vertex_count))
+    return offsets, order // 3
+
+# triangle order for vertex cache locality (Tipsify). Returns the new order of the triangles
+# and where each cluster starts: the triangle after which the fan had to jump to a vertex not
+# adjacent to the previous ones
+# -------------------------------------------------------------------------------------------
+def tipsify(indices: np.ndarray, vertex_count: int, cache_size: int = CACHE_SIZE) -> tuple:
+    triangles = indices.reshape(-1, 3).tolist()
+    offsets, adjacent = vertex_triangles(indices, vertex_count)
+    offsets, adjacent = offsets.tolist(), adjacent.tolist()
+
+    live = np.bincount(indices.astype(np.int64), minlength=vertex_count).tolist()
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(triangles)
+    dead_end = []
+    order, clusters = [], []
+    time_stamp = cache_size + 1
+    cursor = 0
+
+    fan = 0 if vertex_count else -1
+    restarted = True
+    while fan >= 0:
+        if restarted:
+            clusters.append(len(order))
+
+        candidates = []
+        for triangle in adjacent[offsets[fan]:offsets[fan + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            order.append(triangle)
+            for vertex in triangles[triangle]:
+                dead_end.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if time_stamp - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = time_stamp
+                    time_stamp += 1
+
+        # the candidate that will still be in the cache after its remaining triangles are
+        # emitted, preferring the oldest one
+        fan, best = -1, -1
+        for vertex in candidates:
+            if live[vertex] > 0:
+                priority = 0
+                if time_stamp - cache_time[vertex] + 2 * live[vertex] <= cache_size:
+                    priority = time_stamp - cache_time[vertex]
+                if priority > best:
+                    fan, best = vertex, priority
+
+        restarted = fan < 0
+        if restarted:
+            # recently used vertices with triangles left, then the next vertex in input order
+            while dead_end and fan < 0:
+                vertex = dead_end.pop()
+                if live[vertex] > 0:
+                    fan = vertex
+            while fan < 0 and cursor < vertex_count:
+                if live[cursor] > 0:
+                    fan = cursor
+                cursor += 1
+
+    # a restart that emitted nothing (a vertex without triangles) does not start a cluster
+    clusters = np.unique(np.array(clusters, dtype=np.int64))
+    return np.array(order, dtype=np.int64), clusters[clusters < len(order)]
+
+# reorders the clusters of triangles (runs starting at the cluster offsets of tipsify()) from
+# the most to the least outward facing: the dot product between the cluster's mean normal
+# and the direction from the mesh centroid to the cluster's centroid, both area weighted.
+# Outer surfaces then tend to be drawn before the ones they hide from any point of view
+# ------------------------------------------------------------------------------------------
+def sort_clusters(indices: np.ndarray, clusters: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    if len(clusters) <= 1:
+        return indices
+
+    corners = positions[indices.reshape(-1, 3)].astype(np.float64)
+    # cross product length is twice the area, direction is the face normal
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    centroids = corners.mean(axis=1)
+
+    total = max(areas.sum(), 1e-12)
+    mesh_centroid = (centroids * areas[:, None]).sum(axis=0) / total
+
+    cluster_area = np.maximum(np.add.reduceat(areas, clusters), 1e-12)
+    cluster_centroid = np.add.reduceat(centroids * areas[:, None], clusters) / cluster_area[:, None]
+    cluster_normal = np.add.reduceat(normals, clusters)
+    outward = np.einsum("ij,ij->i", cluster_centroid - mesh_centroid, cluster_normal)
+
+    sizes = np.diff(np.append(clusters, len(indices) // 3))
+    ranked = np.argsort(-outward, kind="stable")
+    triangle_order = np.concatenate([np.arange(clusters[c], clusters[c] + sizes[c]) for c in ranked])
+    return indices.reshape(-1, 3)[triangle_order].reshape(-1)
+
+# renumbers the vertices in order of first use and drops the unused ones
+# ----------------------------------------------------------------------
+def reorder_vertices(vertices: np.ndarray, indices: np.ndarray, stride: int) -> tuple:
+    used, first = np.unique(indices, return_index=True)
+    old_of_new = used[np.argsort(first)]
+    new_of_old = np.zeros(len(vertices) // stride, dtype=np.int64)
+    new_of_old[old_of_new] = np.arange(len(old_of_new))
+
+    vertices = np.ascontiguousarray(vertices.reshape(-1, stride)[old_of_new]).reshape(-1)
+    return vertices, new_of_old[indices].astype(indices.dtype)
+
+# the three passes above (the overdraw one within OVERDRAW_THRESHOLD), for the (vertices, indices) buffers of obj_loader.load_indexed_obj_model
+# ------------------------------------------------------------------------------------------------------------------------
+def optimize_mesh(vertices: np.ndarray, indices: np.ndarray, stride: int) -> tuple:
+    if len(indices) == 0:
+        return vertices, indices
+
+    vertex_count = len(vertices) // stride
+    triangle_order, clusters = tipsify(indices, vertex_count)
+    indices = indices.reshape(-1, 3)[triangle_order].reshape(-1)
+
+    # many small clusters make the cache start over too often to be worth it
+    sorted_indices = sort_clusters(indices, clusters, vertices.reshape(-1, stride)[:, :3])
+    if acmr(sorted_indices) <= OVERDRAW_THRESHOLD * acmr(indices):
+        indices = sorted_indices
+    return reorder_vertices(vertices, indices, stride)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="OBJ files to optimize (default: ./objects/*/*.obj)")
+    args = parser.parse_args(argv)
+
+    print(f"ACMR with a {CACHE_SIZE} entry FIFO cache (vertex shader runs per triangle)")
+    print(f"{'triangles':>9} {'exported':>9} {'tipsify':>8} {'optimized':>10} {'ms':>6}  mesh")
+    for obj_path in args.paths or sorted(glob.glob("./objects/*/*.obj")):
+        vertices, indices = obj_loader.load_indexed_obj_model(obj_path)
+
+        triangle_order, _ = tipsify(indices, len(vertices) // obj_loader.VERTEX_STRIDE)
+        tipsified = indices.reshape(-1, 3)[triangle_order].reshape(-1)
+
+        start = time.perf_counter()
+        _, optimized = optimize_mesh(vertices, indices, obj_loader.VERTEX_STRIDE)
+        elapsed = time.perf_counter() - start
+
+        print(f"{len(indices) // 3:>9} {acmr(indices):>9.3f} {acmr(tipsified):>8.3f} "
+              f"{acmr(optimized):>10.3f} {elapsed * 1000:>6.0f}  {obj_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+On-disk cache of textures baked for upload: the image decoded once with PIL, flipped so
+the first row is the bottom one, and stored with its whole mipmap chain, optionally
+block compressed (BC1/BC3/BC4, i.e. S3TC and RGTC1) by the CPU encoder below.
+
+Each entry is a small header and a table of mip levels followed by their raw data, so a
+cache hit is a single np.memmap whose levels go straight to glTexImage2D (or
+glCompressedTexImage2D), with no decoding and no glGenerateMipmap. Entries are keyed by
+the SHA-1 of the image file, the pixel layout and the cache version.
+
+Layouts: single channel images become "r8" (sampled as (r, 0, 0, 1), like GL_RED) and
+everything else "rgba8"; rgba=True expands single channel images to RGBA too. Compressed
+entries use "bc4" for r8 and "bc1" or "bc3" (when some texel is not opaque) for rgba8.
+
+    python ../engine texture_cache bake [--compress] [--rgba] [image ...]   # default: every ./objects image
+    python ../engine texture_cache list
+    python ../engine texture_cache clear
+"""
+import argparse, glob, hashlib, os, struct, sys
+
+import numpy as np
+from PIL import Image
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".texture_cache")
+
+# magic, format version, layout, width, height, mip level count, hex SHA-1 key
+HEADER = struct.Struct("<8sI8sIII40s")
+# per mip level: data offset from the start of the file, data size, width, height
+LEVEL = struct.Struct("<QQII")
+MAGIC = b"TEXCACHE"
+FORMAT_VERSION = 1
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tga", ".bmp")
+
+# bytes per texel of the uncompressed layouts, bytes per 4x4 block of the compressed ones
+TEXEL_BYTES = {"r8": 1, "rgba8": 4}
+BLOCK_BYTES = {"bc1": 8, "bc3": 16, "bc4": 8}
+
+# blocks encoded per numpy batch, keeps the palette distance arrays at a few tens of MB
+ENCODE_BATCH = 1 << 15
+
+# a baked texture: levels holds (width, height, data) for mip level 0, 1, ... down to 1x1
+class BakedTexture:
+    def __init__(self, layout: str, levels: list):
+        self.layout = layout
+        self.levels = levels
+        self.width, self.height = levels[0][0], levels[0][1]
+
+    @property
+    def compressed(self) -> bool:
+        return self.layout in BLOCK_BYTES
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(data) for _, _, data in self.levels)
+
+# bytes of one row of texels (or of 4x4 blocks, for the compressed layouts) of a level
+def row_bytes(layout: str, width: int) -> int:
+    if layout in BLOCK_BYTES:
+        return (width + 3) // 4 * BLOCK_BYTES[layout]
+    return width * TEXEL_BYTES[layout]
+
+# content hash identifying a baked texture
+# ----------------------------------------
+def cache_key(image_path: str, rgba: bool, compress: bool) -> str:
+    digest = hashlib.sha1()
+    digest.update(f"{FORMAT_VERSION}:{'rgba' if rgba else 'native'}:{'bc' if compress else 'raw'}".encode())
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + ".tex")
+
+# block compression
+# -----------------
+
+# the 4x4 blocks of an (h, w, c) image, padded by repeating its last row/column: (blocks, 16, c)
+def image_blocks(pixels: np.ndarray) -> np.ndarray:
+    height, width, channels = pixels.shape
+    padded = np.pad(pixels, ((0, -height % 4), (0, -width % 4), (0, 0)), mode="edge")
+    rows, columns = padded.shape[0] // 4, padded.shape[1] // 4
+    return padded.reshape(rows, 4, columns, 4, channels).swapaxes(1, 2).reshape(-1, 16, channels)
+
+def encode_565(colors: np.ndarray) -> np.ndarray:
+    colors = colors.astype(np.uint16)
+    return (colors[:, 0] >> 3) << 11 | (colors[:, 1] >> 2) << 5 | colors[:, 2] >> 3
+
+def decode_565(values: np.ndarray) -> np.ndarray:
+    r, g, b = values >> 11 & 31, values >> 5 & 63, values & 31
+    return np.stack([r << 3 | r >> 2, g << 2 | g >> 4, b << 3 | b >> 2], axis=1).astype(np.float32)
+
+# index of the closest palette entry for every texel: palette (n, k, c), texels (n, 16, c) -> (n, 16)
+def closest(palette: np.ndarray, texels: np.ndarray) -> np.ndarray:
+    distances = ((texels[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=3)
+    return distances.argmin(axis=2).astype(np.uint64)
+
+# BC1 colour blocks (8 bytes each) for (n, 16, 3) texels: the endpoints are the block's bounding
+# box, inset by 1/16 of its size, and every texel picks the closest of the four palette colours
+# ----------------------------------------------------------------------------------------------
+def encode_bc1(texels: np.ndarray) -> np.ndarray:
+    low, high = texels.min(axis=1).astype(np.float32), texels.max(axis=1).astype(np.float32)
+    inset = (high - low) / 16
+    color0, color1 = encode_565(np.clip(high - inset + 0.5, 0, 255)), encode_565(np.clip(low + inset + 0.5, 0, 255))
+    # color0 > color1 selects the four colour mode; equal endpoints only need index 0
+    color0, color1 = np.maximum(color0, color1), np.minimum(color0, color1)
+
+    end0, end1 = decode_565(color0), decode_565(color1)
+    palette = np.stack([end0, end1, (2 * end0 + end1) / 3, (end0 + 2 * end1) / 3], axis=1)
+    indices = closest(palette, texels.astype(np.float32))
+    indices[color0 == color1] = 0
+
+    bits = (indices << (2 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+    block = np.empty((len(texels), 8), dtype=np.uint8)
+    block[:, 0:2] = color0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    block[:, 2:4] = color1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    block[:, 4:8] = bits.astype("<u4").view(np.uint8).reshape(-1, 4)
+    return block
+
+# BC4 blocks (8 bytes each, also the alpha half of BC3) for (n, 16) single channel texels,
+# using the eight value mode between the block's minimum and maximum
+# ----------------------------------------------------------------------------------------
+def encode_bc4(texels: np.ndarray) -> np.ndarray:
+    value0, value1 = texels.max(axis=1), texels.min(axis=1)
+    end0, end1 = value0.astype(np.float32)[:, None], value1.astype(np.float32)[:, None]
+    weights = np.array([0, 7, 1, 2, 3, 4, 5, 6], dtype=np.float32) / 7
+    palette = (end0 * (1 - weights) + end1 * weights)[:, :, None]
+    indices = closest(palette, texels.astype(np.float32)[:, :, None])
+    indices[value0 == value1] = 0
+
+    bits = (indices << (3 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+    block = np.empty((len(texels), 8), dtype=np.uint8)
+    block[:, 0], block[:, 1] = value0, value1
+    block[:, 2:8] = bits.astype("<u8").view(np.uint8).reshape(-1, 8)[:, :6]
+    return block
+
+def encode_blocks(layout: str, blocks: np.ndarray) -> np.ndarray:
+    if layout == "bc4":
+        return encode_bc4(blocks[:, :, 0])
+    if layout == "bc1":
+        return encode_bc1(blocks[:, :, :3])
+    return np.concatenate([encode_bc4(blocks[:, :, 3]), encode_bc1(blocks[:, :, :3])], axis=1)
+
+def compress_level(layout: str, pixels: np.ndarray) -> bytes:
+    blocks = image_blocks(pixels)
+    return b"".join(encode_blocks(layout, blocks[start:start + ENCODE_BATCH]).tobytes()
+                    for start in range(0, len(blocks), ENCODE_BATCH))
+
+# baking
+# ------
+
+# decodes, flips and mipmaps an image; raises OSError when it is missing or not an image
+# ---------------------------------------------------------------------------------------
+def bake(image_path: str, rgba: bool = False, compress: bool = False) -> BakedTexture:
+    with Image.open(image_path) as img:
+        img = img.transpose(Image.FLIP_TOP_BOTTOM)
+        img = img.convert("L" if img.mode == "L" and not rgba else "RGBA")
+
+    layout = "r8" if img.mode == "L" else "rgba8"
+    if compress:
+        opaque = layout == "r8" or img.getextrema()[3][0] == 255
+        layout = "bc4" if layout == "r8" else "bc1" if opaque else "bc3"
+
+    # box filtered halvings, sized like the levels glGenerateMipmap would make
+    levels = []
+    level = img
+    while True:
+        pixels = np.asarray(level).reshape(level.height, level.width, -1)
+        data = compress_level(layout, pixels) if compress else pixels.tobytes()
+        levels.append((level.width, level.height, data))
+        if level.width == 1 and level.height == 1:
+            break
+        level = level.resize((max(level.width // 2, 1), max(level.height // 2, 1)), Image.BOX)
+    return BakedTexture(layout, levels)
+
+# memory-maps a cache entry, returning None if it is missing or unreadable
+# ------------------------------------------------------------------------
+def read_entry(path: str, key: str = None):
+    try:
+        with open(path, "rb") as f:
+            magic, version, layout, width, height, count, stored_key = HEADER.unpack(f.read(HEADER.size))
+            table = [LEVEL.unpack(f.read(LEVEL.size)) for _ in range(count)]
+    except (OSError, struct.error):
+        return None
+
+    layout = layout.rstrip(b"\0").decode()
+    if magic != MAGIC or version != FORMAT_VERSION or (key and stored_key.decode() != key) or count == 0:
+        return None
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    return BakedTexture(layout, [(w, h, data[offset:offset + size]) for offset, size, w, h in table])
+
+# writes a cache entry atomically so an interrupted run never leaves a truncated file behind
+# -----------------------------------------------------------------------------------------
+def write_entry(path: str, key: str, texture: BakedTexture) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    offset = HEADER.size + LEVEL.size * len(texture.levels)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, texture.layout.encode(), texture.width, texture.height,
+                            len(texture.levels), key.encode()))
+        for width, height, data in texture.levels:
+            f.write(LEVEL.pack(offset, len(data), width, height))
+            offset += len(data)
+        for _, _, data in texture.levels:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+# returns the baked texture of an image, baking it only when no valid cache entry exists;
+# None when the image is missing or cannot be decoded (the caller decides how to report it)
+# -----------------------------------------------------------------------------------------
+def load_texture(image_path: str, rgba: bool = False, compress: bool = False):
+    try:
+        key = cache_key(image_path, rgba, compress)
+    except OSError:
+        return None
+    path = cache_path(key)
+
+    texture = read_entry(path, key)
+    if texture is not None:
+        return texture
+
+    try:
+        texture = bake(image_path, rgba, compress)
+    except OSError:
+        return None
+    try:
+        write_entry(path, key, texture)
+    except OSError as e:
+        print(f"Texture cache not written for {image_path}: {e}")
+    return texture
+
+def clear_cache() -> int:
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_DIR, "*.tex")) + glob.glob(os.path.join(CACHE_DIR, "*.tmp")):
+        os.remove(path)
+        removed += 1
+    return removed
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("bake", "list", "clear"))
+    parser.add_argument("paths", nargs="*", help="images to bake (default: every image under ./objects)")
+    parser.add_argument("--compress", action="store_true", help="block compress the levels (BC1/BC3/BC4)")
+    parser.add_argument("--rgba", action="store_true", help="expand single channel images to RGBA")
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        print(f"Removed {clear_cache()} cache entries from {CACHE_DIR}")
+
+    elif args.command == "list":
+        entries = sorted(glob.glob(os.path.join(CACHE_DIR, "*.tex")))
+        for path in entries:
+            texture = read_entry(path)
+            layout = f"{texture.layout} {texture.width}x{texture.height}" if texture else "unreadable"
+            print(f"{os.path.basename(path)}  {layout:<16} {os.path.getsize(path) / 2**20:8.2f} MB")
+        print(f"{len(entries)} entries in {CACHE_DIR}")
+
+    else:
+        paths = args.paths or sorted(path for path in glob.glob("./objects/**/*", recursive=True)
+                                     if path.lower().endswith(IMAGE_EXTENSIONS))
+        for image_path in paths:
+            texture = load_texture(image_path, args.rgba, args.compress)
+            if texture is None:
+                print(f"{image_path}: not an image")
+            else:
+                print(f"{image_path}: {texture.layout} {texture.width}x{texture.height}, "
+                      f"{len(texture.levels)} levels, {texture.nbytes / 2**20:.2f} MB")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
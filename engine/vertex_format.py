@@ -0,0 +1,163 @@
+"""
+Compact vertex format for the interleaved float vertices of obj_loader.py: half the bytes
+for the same attribute locations.
+
+    attribute   float path     compact path
+    position    3 x float32    3 x int16 (+ 2 padding bytes), normalized in the mesh bounding box
+    normal      3 x float32    10-10-10-2 signed normalized (GL_INT_2_10_10_10_REV)
+    texcoord    2 x float32    2 x float16 (GL_HALF_FLOAT)
+
+The vertex shaders get the position back with a per mesh uniform pair,
+position = positionOffset + aPos * positionScale, which is the identity (offset 0, scale 1)
+for float vertices; normals and texture coordinates need no decoding. Half floats only keep
+texture coordinates within TEXCOORD_TOLERANCE up to |uv| = 4, so meshes that tile their
+textures further than that stay in the float format (see can_pack()).
+
+    python ../engine vertex_format [file.obj ...]   # bytes per vertex and largest errors, default: ./objects/*/*.obj
+"""
+from OpenGL.GL import *
+
+import argparse, ctypes, glob, sys
+
+import numpy as np
+
+# (attribute, first float, float count) of the interleaved float vertices of each stride;
+# the attributes take locations 0, 1, ... in this order
+ATTRIBUTES = {
+    8: (("position", 0, 3), ("normal", 3, 3), ("texcoord", 6, 2)),
+    5: (("position", 0, 3), ("texcoord", 3, 2)),
+}
+
+# numpy layout of one compact vertex field: dtype, and GL type, component count and normalization
+COMPACT_FIELDS = {
+    "position": (("<i2", 4), GL_SHORT, 3, GL_TRUE),
+    "normal": ("<u4", GL_INT_2_10_10_10_REV, 4, GL_TRUE),
+    "texcoord": (("<f2", 2), GL_HALF_FLOAT, 2, GL_FALSE),
+}
+
+SHORT_MAX = 32767
+TEN_BIT_MAX = 511
+
+# largest texture coordinate error the half floats may introduce (a texel of a 1024 texture)
+TEXCOORD_TOLERANCE = 1 / 1024
+
+def compact_dtype(stride: int) -> np.dtype:
+    return np.dtype([(name, COMPACT_FIELDS[name][0]) for name, _, _ in ATTRIBUTES[stride]])
+
+# the (offset, scale) that map the normalized int16 positions back into the bounding box
+# --------------------------------------------------------------------------------------
+def position_range(vertices: np.ndarray, stride: int) -> tuple:
+    positions = vertices.reshape(-1, stride)[:, :3]
+    if len(positions) == 0:
+        return np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)
+    low, high = positions.min(axis=0).astype(np.float64), positions.max(axis=0).astype(np.float64)
+    return (low + high) / 2, np.maximum((high - low) / 2, 1e-12)
+
+# whether the texture coordinates of the mesh fit in half floats within TEXCOORD_TOLERANCE;
+# never for an empty mesh, whose format is only decided once it has vertices
+# -----------------------------------------------------------------------------------------
+def can_pack(vertices: np.ndarray, stride: int) -> bool:
+    if len(vertices) == 0:
+        return False
+    texcoords = vertices.reshape(-1, stride)[:, stride - 2:]
+    error = np.abs(texcoords.astype(np.float16).astype(np.float64) - texcoords).max(initial=0)
+    return bool(error <= TEXCOORD_TOLERANCE)
+
+# packs float vertices into the compact format; returns the packed vertices and the position
+# (offset, scale) the shader has to apply
+# ------------------------------------------------------------------------------------------
+def pack_vertices(vertices: np.ndarray, stride: int) -> tuple:
+    table = vertices.reshape(-1, stride)
+    packed = np.zeros(len(table), dtype=compact_dtype(stride))
+    offset, scale = position_range(vertices, stride)
+
+    for name, first, count in ATTRIBUTES[stride]:
+        values = table[:, first:first + count].astype(np.float64)
+        if name == "position":
+            packed[name][:, :3] = np.clip(np.rint((values - offset) / scale * SHORT_MAX), -SHORT_MAX, SHORT_MAX)
+        elif name == "normal":
+            values /= np.maximum(np.linalg.norm(values, axis=1), 1e-12)[:, None]
+            ten_bits = np.clip(np.rint(values * TEN_BIT_MAX), -TEN_BIT_MAX, TEN_BIT_MAX).astype(np.int64) & 0x3FF
+            packed[name] = ten_bits[:, 0] | ten_bits[:, 1] << 10 | ten_bits[:, 2] << 20
+        else:
+            packed[name] = values.astype(np.float16)
+
+    return packed, offset.astype(np.float32), scale.astype(np.float32)
+
+# the float vertices the GPU reads back from packed ones (what the shader sees), for error checks
+# -----------------------------------------------------------------------------------------------
+def unpack_vertices(packed: np.ndarray, stride: int, offset: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    table = np.zeros((len(packed), stride), dtype=np.float64)
+    for name, first, count in ATTRIBUTES[stride]:
+        if name == "position":
+            table[:, 0:3] = offset + np.maximum(packed[name][:, :3] / SHORT_MAX, -1.0) * scale
+        elif name == "normal":
+            bits = packed[name].astype(np.int64)
+            ten_bits = np.stack([(bits >> shift) & 0x3FF for shift in (0, 10, 20)], axis=1)
+            ten_bits = np.where(ten_bits >= 512, ten_bits - 1024, ten_bits)
+            table[:, first:first + count] = np.maximum(ten_bits / TEN_BIT_MAX, -1.0)
+        else:
+            table[:, first:first + count] = packed[name]
+    return table.reshape(-1)
+
+# sets up the attribute pointers of the bound VAO for the VBO bound to GL_ARRAY_BUFFER
+# ------------------------------------------------------------------------------------
+def bind_attributes(stride: int, compact: bool) -> None:
+    if compact:
+        dtype = compact_dtype(stride)
+        for location, (name, _, _) in enumerate(ATTRIBUTES[stride]):
+            _, gl_type, size, normalized = COMPACT_FIELDS[name]
+            glVertexAttribPointer(location, size, gl_type, normalized, dtype.itemsize, ctypes.c_void_p(dtype.fields[name][1]))
+            glEnableVertexAttribArray(location)
+    else:
+        for location, (_, first, count) in enumerate(ATTRIBUTES[stride]):
+            glVertexAttribPointer(location, count, GL_FLOAT, GL_FALSE, stride * 4, ctypes.c_void_p(first * 4))
+            glEnableVertexAttribArray(location)
+
+# largest difference between the float vertices and what the compact ones decode to: position
+# (in object units and relative to the bounding box size), normal angle (degrees) and texcoord
+# --------------------------------------------------------------------------------------------
+def compaction_error(vertices: np.ndarray, stride: int) -> dict:
+    packed, offset, scale = pack_vertices(vertices, stride)
+    original = vertices.reshape(-1, stride).astype(np.float64)
+    decoded = unpack_vertices(packed, stride, offset, scale).reshape(-1, stride)
+
+    error = {}
+    for name, first, count in ATTRIBUTES[stride]:
+        a, b = original[:, first:first + count], decoded[:, first:first + count]
+        if name == "position":
+            error["position"] = float(np.abs(a - b).max(initial=0))
+            error["position_relative"] = error["position"] / float(2 * scale.max())
+        elif name == "normal":
+            a = a / np.maximum(np.linalg.norm(a, axis=1), 1e-12)[:, None]
+            b = b / np.maximum(np.linalg.norm(b, axis=1), 1e-12)[:, None]
+            cosines = np.clip(np.einsum("ij,ij->i", a, b), -1.0, 1.0)
+            error["normal_degrees"] = float(np.degrees(np.arccos(cosines)).max(initial=0))
+        else:
+            error["texcoord"] = float(np.abs(a - b).max(initial=0))
+    return error
+
+def main(argv=None) -> int:
+    import obj_loader
+    from engine import mesh_cache
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="OBJ files to check (default: ./objects/*/*.obj)")
+    args = parser.parse_args(argv)
+
+    stride = obj_loader.VERTEX_STRIDE
+    print(f"bytes per vertex: {stride * 4} float, {compact_dtype(stride).itemsize} compact")
+    print(f"{'vertices':>9} {'float MB':>9} {'compact MB':>11} {'position':>10} {'of box':>8} "
+          f"{'normal':>7} {'texcoord':>9} {'format':>7}  mesh")
+    for obj_path in args.paths or sorted(glob.glob("./objects/*/*.obj")):
+        vertices = mesh_cache.load_mesh(obj_path)[0]
+        count = len(vertices) // stride
+        error = compaction_error(vertices, stride)
+        normal = f"{error['normal_degrees']:>6.2f}°" if "normal_degrees" in error else f"{'-':>7}"
+        print(f"{count:>9} {vertices.nbytes / 2**20:>9.2f} {count * compact_dtype(stride).itemsize / 2**20:>11.2f} "
+              f"{error['position']:>10.2e} {error['position_relative']:>8.1e} {normal} {error['texcoord']:>9.2e} "
+              f"{'compact' if can_pack(vertices, stride) else 'float':>7}  {obj_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
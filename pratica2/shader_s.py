@@ -32,11 +32,14 @@ class Shader:
             glAttachShader(self.ID, fragment)
             glLinkProgram(self.ID)
             self.checkCompileErrors(self.ID, "PROGRAM")
+            # 3. look up every active uniform once, so the setters never have to ask the driver
+            self.uniforms = self.introspectUniforms()
             # delete the shaders as they're linked into our program now and no longer necessary
             glDeleteShader(vertex)
             glDeleteShader(fragment)
         
         except IOError:
+            self.uniforms = {}
             print("ERROR::SHADER::FILE_NOT_SUCCESFULLY_READ")
             
         
@@ -50,17 +53,55 @@ class Shader:
     # ------------------------------------------------------------------------
     def use(self) -> None:
         glUseProgram(self.ID)
+
+    # name -> location table of the active uniforms of the linked program; arrays are
+    # registered by their bare name and by every element ("colors", "colors[0]", "colors[1]", ...)
+    # ------------------------------------------------------------------------
+    def introspectUniforms(self) -> dict:
+        uniforms = {}
+        for index in range(glGetProgramiv(self.ID, GL_ACTIVE_UNIFORMS)):
+            name, size, type = glGetActiveUniform(self.ID, index)
+            name = name.decode()
+            location = glGetUniformLocation(self.ID, name)
+            # uniforms inside a uniform block have no location
+            if location == -1:
+                continue
+
+            uniforms[name] = location
+            if name.endswith("[0]"):
+                base = name[:-3]
+                uniforms[base] = location
+                for element in range(1, int(size)):
+                    uniforms[f"{base}[{element}]"] = glGetUniformLocation(self.ID, f"{base}[{element}]")
+        return uniforms
+
+    # cached uniform location; names the linker dropped are asked once and remembered as -1
+    # ------------------------------------------------------------------------
+    def getUniformLocation(self, name: str) -> int:
+        location = self.uniforms.get(name)
+        if location is None:
+            location = glGetUniformLocation(self.ID, name)
+            self.uniforms[name] = location
+        return location
         
     # utility uniform functions
     # ------------------------------------------------------------------------
     def setBool(self, name: str, value: bool) -> None:
-        glUniform1i(glGetUniformLocation(self.ID, name), int(value))
+        glUniform1i(self.getUniformLocation(name), int(value))
     # ------------------------------------------------------------------------
     def setInt(self, name: str, value: int) -> None:
-        glUniform1i(glGetUniformLocation(self.ID, name), value)
+        glUniform1i(self.getUniformLocation(name), value)
     # ------------------------------------------------------------------------
     def setFloat(self, name: str, value: float) -> None:
-        glUniform1f(glGetUniformLocation(self.ID, name), value)
+        glUniform1f(self.getUniformLocation(name), value)
+
+    # uniform array functions: the whole array (e.g. "weights" for float weights[N]) is uploaded with a single call
+    # ------------------------------------------------------------------------
+    def setIntArray(self, name: str, values: list) -> None:
+        glUniform1iv(self.getUniformLocation(name), len(values), list(values))
+    # ------------------------------------------------------------------------
+    def setFloatArray(self, name: str, values: list) -> None:
+        glUniform1fv(self.getUniformLocation(name), len(values), list(values))
 
     # utility function for checking shader compilation/linking errors.
     # ------------------------------------------------------------------------
@@ -0,0 +1,80 @@
+"""
+Microbenchmark das matrizes de transformação do trabalho1: a montagem
+objeto a objeto de TransformControl (cinco matrizes 4x4 e quatro np.dot
+por objeto) contra o TransformStore (todas as matrizes sujas de uma vez),
+de 18 (a cena) até 100 mil objetos. Não precisa de OpenGL.
+
+    python ./trabalho1/bench_transforms.py [--counts 18 100 1000 10000 100000] [--dirty 0.01]
+"""
+import argparse, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from controlers.transformControl import TransformControl
+from controlers.transformStore import TransformStore
+
+def per_object_matrix(offset, angle, scale):
+  """
+  Matriz de um objeto como ObjectControl.apply_transform a montava
+  """
+  mat_transform = TransformControl.multiplica_matriz(TransformControl.rotation_z(angle[2]), TransformControl.rotation_y(angle[1]))
+  mat_transform = TransformControl.multiplica_matriz(TransformControl.rotation_x(angle[0]), mat_transform)
+  mat_transform = TransformControl.multiplica_matriz(TransformControl.scale(scale), mat_transform)
+  return TransformControl.multiplica_matriz(TransformControl.translation(offset), mat_transform)
+
+def timed(function, min_time = 0.2):
+  """
+  Tempo médio (s) de uma chamada, repetindo por pelo menos min_time segundos
+  """
+  calls, start = 0, time.perf_counter()
+  while True:
+    function()
+    calls += 1
+    elapsed = time.perf_counter() - start
+    if elapsed >= min_time:
+      return elapsed / calls
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--counts", type=int, nargs="+", default=[18, 100, 1000, 10000, 100000])
+  parser.add_argument("--dirty", type=float, default=0.01, help="fração de objetos alterados por quadro")
+  args = parser.parse_args()
+
+  rng = np.random.default_rng(0)
+  print(f"{'objetos':>8} {'por objeto ms':>14} {'lote ms':>9} {f'{args.dirty:.0%} sujos ms':>12} "
+        f"{'sem mudança ms':>15} {'ganho':>7} {'erro máx':>9}")
+  for count in args.counts:
+    offsets = rng.uniform(-1, 1, (count, 3))
+    angles = rng.uniform(-np.pi, np.pi, (count, 3))
+    scales = rng.uniform(0.5, 2, (count, 3))
+
+    store = TransformStore()
+    for offset, angle, scale in zip(offsets, angles, scales):
+      store.add(offset, angle, scale)
+    store.update()
+
+    def per_object():
+      return [per_object_matrix(o, a, s) for o, a, s in zip(offsets, angles, scales)]
+
+    def mark(rows):
+      store.rows['dirty'][rows] = True
+      store.pending = True
+      store.update()
+
+    every_row = np.arange(count)
+    some_rows = rng.choice(count, max(1, int(count * args.dirty)), replace=False)
+
+    reference = np.array(per_object())
+    error = float(np.abs(store.matrices[:count] - reference).max())
+
+    loop = timed(per_object)
+    batch = timed(lambda: mark(every_row))
+    partial = timed(lambda: mark(some_rows))
+    clean = timed(store.update)
+    print(f"{count:>8} {loop * 1000:>14.3f} {batch * 1000:>9.3f} {partial * 1000:>12.3f} "
+          f"{clean * 1000:>15.5f} {loop / batch:>6.1f}x {error:>9.1e}")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -10,8 +10,6 @@ class ObjectsBuildControl:
     self.PI = 3.141592
     self.num_sectors = 32 # qtd de sectors (longitude)
     self.num_stacks = 32 # qtd de stacks (latitude)
-    self.sector_step=(self.PI*2) / self.num_sectors # variar de 0 até 2π
-    self.stack_step=(self.PI) / self.num_stacks # variar de 0 até π
 
   def normalize_sketch(self, sketchFolderPath, objName, scale, fname = None):
     """
@@ -59,53 +57,64 @@ class ObjectsBuildControl:
     return normalized_verts
 
 
-  def build_sphere(self, vertices, x0, y0, r, sphere_func = None):
+  def sphere_mesh(self, x0, y0, r, sphere_func = None, num_sectors = None, num_stacks = None):
     """
-    Construir esfera
+    Construir esfera como malha indexada, de uma vez só sobre a grade (u, v)
 
     @param
-      vertices: listagem de vertices que será atualizada
       x0: origem x da esfera
       y0: origem y da esfera
       r: raio da esfera
-      sphere_func: funcao de recorte da esfera
+      sphere_func: funcao de recorte da esfera (recebe arrays de angulos)
+      num_sectors: qtd de sectors (longitude), padrão self.num_sectors
+      num_stacks: qtd de stacks (latitude), padrão self.num_stacks
+    @return
+      vertices: array ((num_sectors+1)*(num_stacks+1), 3), um por ponto da grade
+      indices: array (num_sectors*num_stacks*6,), dois triangulos por poligono,
+        na mesma ordem de vertices que build_sphere sempre produziu
     """
     if not sphere_func:
       sphere_func = self.default_sphere
+    num_sectors = num_sectors or self.num_sectors
+    num_stacks = num_stacks or self.num_stacks
+
+    # angulos de cada ponto da grade; o ultimo sector fecha em 2π
+    # e o ultimo stack em π exatamente
+    us = np.arange(num_sectors + 1) * ((self.PI*2) / num_sectors)
+    us[-1] = self.PI*2
+    vs = np.arange(num_stacks + 1) * (self.PI / num_stacks)
+    vs[-1] = self.PI
+    u, v = np.meshgrid(us, vs, indexing='ij')
+
+    x, y, z = sphere_func(x0, y0, u, v, r)
+    vertices = np.stack(np.broadcast_arrays(x, y, z), axis=-1).reshape(-1, 3)
+
+    # pontos de cada poligono (i = sector, j = stack)
+    i, j = np.meshgrid(np.arange(num_sectors), np.arange(num_stacks), indexing='ij')
+    p0 = i * (num_stacks + 1) + j
+    p1 = p0 + 1
+    p2 = p0 + (num_stacks + 1)
+    p3 = p2 + 1
+
+    # triangulo 1 (p0, p2, p1) e triangulo 2 (p3, p1, p2) de cada poligono
+    indices = np.stack([p0, p2, p1, p3, p1, p2], axis=-1).reshape(-1)
+    return vertices, indices
+
+  def build_sphere(self, vertices, x0, y0, r, sphere_func = None, num_sectors = None, num_stacks = None):
+    """
+    Construir esfera, acrescentando à listagem os vertices já expandidos
+    (6 por poligono, ver sphere_mesh)
 
-    # vamos gerar um conjunto de vertices representantes poligonos
-    # para a superficie da esfera.
-    # cada poligono eh representado por dois triangulos
-    for i in range(0,self.num_sectors): # para cada sector (longitude)
-      for j in range(0,self.num_stacks): # para cada stack (latitude)
-        u = i * self.sector_step # angulo setor
-        v = j * self.stack_step # angulo stack
-        
-        un = 0 # angulo do proximo sector
-        if i+1==self.num_sectors:
-            un = self.PI*2
-        else: un = (i+1)*self.sector_step
-            
-        vn = 0 # angulo do proximo stack
-        if j+1==self.num_stacks:
-            vn = self.PI
-        else: vn = (j+1)*self.stack_step
-        
-        # vertices do poligono
-        p0=sphere_func(x0,y0,u, v, r)
-        p1=sphere_func(x0,y0,u, vn, r)
-        p2=sphere_func(x0,y0,un, v, r)
-        p3=sphere_func(x0,y0,un, vn, r)
-        
-        # triangulo 1 (primeira parte do poligono)
-        vertices.append(p0)
-        vertices.append(p2)
-        vertices.append(p1)
-        
-        # triangulo 2 (segunda e ultima parte do poligono)
-        vertices.append(p3)
-        vertices.append(p1)
-        vertices.append(p2)
+    @param
+      vertices: listagem de vertices que será atualizada
+      x0: origem x da esfera
+      y0: origem y da esfera
+      r: raio da esfera
+      sphere_func: funcao de recorte da esfera
+      num_sectors, num_stacks: resolução da esfera
+    """
+    mesh_vertices, indices = self.sphere_mesh(x0, y0, r, sphere_func, num_sectors, num_stacks)
+    vertices.extend(mesh_vertices[indices].tolist())
 
   def default_sphere(self,x0,y0,u,v,r):
     x = x0 + r*np.sin(v)*np.cos(u)
@@ -114,88 +123,88 @@ class ObjectsBuildControl:
     return (x,y,z)
   
   def moon_sphere(self,x0,y0,u,v,r):
-    if u < self.PI/4:
-      x = x0
-      y = y0
-      z = 0
-      return (x,y,z)
-
-    x = x0 + r*np.sin(v)*np.cos(u)
-    y = y0 + r*np.sin(v)*np.sin(u)
-    z = r*np.cos(v)
-
-    return (x,y,z)
+    """
+    Esfera recortada: pontos com u < π/4 vão para o centro (x0, y0, 0)
+    """
+    x, y, z = self.default_sphere(x0, y0, u, v, r)
+    mask = u < self.PI/4
+    return np.where(mask, x0, x), np.where(mask, y0, y), np.where(mask, 0, z)
   
   def lighthouse_sphere(self,x0,y0,u,v,r):
-    if self.PI/4 < v < 3*self.PI/4:
-      x = x0
-      y = y0
-      z = 0
-      return (x,y,z)
+    """
+    Esfera recortada: pontos com π/4 < v < 3π/4 vão para o centro (x0, y0, 0)
+    """
+    x, y, z = self.default_sphere(x0, y0, u, v, r)
+    mask = (self.PI/4 < v) & (v < 3*self.PI/4)
+    return np.where(mask, x0, x), np.where(mask, y0, y), np.where(mask, 0, z)
 
-    x = x0 + r*np.sin(v)*np.cos(u)
-    y = y0 + r*np.sin(v)*np.sin(u)
-    z = r*np.cos(v)
+  def sphere_face(self, spheres, color):
+    """
+    Face de objeto indexada com uma ou mais esferas
 
-    return (x,y,z)
+    @param
+      spheres: listagem de (vertices, indices) de sphere_mesh
+      color: cor da face
+    """
+    vertices, indices, base = [], [], 0
+    for mesh_vertices, mesh_indices in spheres:
+      vertices.append(mesh_vertices)
+      indices.append(mesh_indices + base)
+      base += len(mesh_vertices)
+    return {
+      "vertices": np.concatenate(vertices).tolist(),
+      "indices": np.concatenate(indices).tolist(),
+      "color": color
+    }
 
-  def build_cloud(self):
-    verts = []
+  def build_cloud(self, num_sectors = None, num_stacks = None):
     r = 0.2
     y_shift0 = 0.1
     x_shift0 = 0.5
     z_shift0 = 0
 
-    self.build_sphere(verts, x_shift0, y_shift0, r)
-    self.build_sphere(verts, x_shift0 + 0.15, y_shift0+0.1, 0.1)
-    self.build_sphere(verts, x_shift0 + 0.2, y_shift0-0.2, 0.15)
+    face = self.sphere_face([
+      self.sphere_mesh(x_shift0, y_shift0, r, None, num_sectors, num_stacks),
+      self.sphere_mesh(x_shift0 + 0.15, y_shift0+0.1, 0.1, None, num_sectors, num_stacks),
+      self.sphere_mesh(x_shift0 + 0.2, y_shift0-0.2, 0.15, None, num_sectors, num_stacks),
+    ], [0.254,0.823,0.858,1])
     fjson = open(f'{self.objFilesPath}/cloud.json', 'w')
     moonObj = {
-      "faces": [{
-        "vertices": verts,
-        "color": [0.254,0.823,0.858,1]
-      }]
+      "faces": [face]
     }
     fjson.writelines(json.dumps(moonObj))
     
     return y_shift0, x_shift0, z_shift0
 
 
-  def build_moon(self):
-    verts = []
+  def build_moon(self, num_sectors = None, num_stacks = None):
     r = 0.2
     y_shift = 0
     x_shift = 1.2
     z_shift = 0.8
 
-    self.build_sphere(verts, x_shift, y_shift, r, sphere_func=self.moon_sphere)
+    face = self.sphere_face([
+      self.sphere_mesh(x_shift, y_shift, r, self.moon_sphere, num_sectors, num_stacks),
+    ], [1,0,0,1])
     fjson = open(f'{self.objFilesPath}/moon.json', 'w')
     moonObj = {
-      "faces": [{
-        "vertices": verts,
-        "color": [1,0,0,1]
-      }]
+      "faces": [face]
     }
     fjson.writelines(json.dumps(moonObj))
     return y_shift, x_shift, z_shift
 
-  def build_lighthouse_top(self):
-    verts = []
+  def build_lighthouse_top(self, num_sectors = None, num_stacks = None):
     r = 0.2
     y_shift = 0
     x_shift = 0
     z_shift = 0
 
-    self.sector_step=(self.PI*2)/self.num_sectors # variar de 0 até 2π
-    self.stack_step=(self.PI)/self.num_stacks # variar de 0 até π
-
-    self.build_sphere(verts, x_shift, y_shift, r, sphere_func=self.lighthouse_sphere)
+    face = self.sphere_face([
+      self.sphere_mesh(x_shift, y_shift, r, self.lighthouse_sphere, num_sectors, num_stacks),
+    ], [0.941,0.933,0.6117,1])
     fjson = open(f'{self.objFilesPath}/lighthouse_top.json', 'w')
     moonObj = {
-      "faces": [{
-        "vertices": verts,
-        "color": [0.941,0.933,0.6117,1]
-      }]
+      "faces": [face]
     }
     fjson.writelines(json.dumps(moonObj))
     return y_shift, x_shift, z_shift
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 import json
 from .transformControl import TransformControl
+from .transformStore import TransformStore
 import numpy as np
 import glfw
 from OpenGL.GL import *
@@ -24,11 +25,19 @@ class ObjectControl(TransformControl) :
     self.folder_path = folder_path
     self.vertices_list = {
       'vertices': [],
+      'colors': [],
       'first_last_vertices': [],
     }
     self.faces_color = []
     self.object_list = []
-    self.current_object_faces = {}
+    # nome -> registro de self.object_list, para achar um objeto sem percorrer a lista
+    self.object_index = {}
+    # (programa, nome) -> localização do uniform, pedida ao OpenGL uma única vez
+    self.uniform_locations = {}
+    # chamadas OpenGL emitidas por apply_transform desde o último reset_gl_calls()
+    self.gl_calls = 0
+    # deslocamento, ângulo e escala de todos os objetos, ver TransformStore
+    self.transforms = TransformStore()
 
 
   def load_object(self, filename, global_offset = [0,0,0]):
@@ -49,7 +58,11 @@ class ObjectControl(TransformControl) :
     faces = json.load(objVertices)['faces']
 
     objName = os.path.splitext(filename)[0]
+    if objName in self.object_index:
+      raise NameError(f'Object named {objName} already loaded')
     vf = vi
+    first_vertex = vi
+    first_face = len(self.faces_color)
 
     # Nesse loop, atualizamos a listagem de faces
     # para cada objeto, anotando qual o vertice inicial e o total de vertices
@@ -64,7 +77,8 @@ class ObjectControl(TransformControl) :
     """
 
     # Atualizamos também a listagem de vertices 
-    # de cada face a ser carregada nos shaders
+    # de cada face a ser carregada nos shaders,
+    # com a cor da face repetida em cada vértice
 
     """
     self.vertices_list = [{
@@ -72,6 +86,10 @@ class ObjectControl(TransformControl) :
         [0.6, -0.3, 0.2],
         ...
       ],
+      'colors': [
+        [1, 0, 0, 1],
+        ...
+      ],
       'first_last_vertices': {
         'name': objName,
         'first': vi,
@@ -80,6 +98,11 @@ class ObjectControl(TransformControl) :
     }]
     """
     for face in faces:
+      # faces indexadas (as esferas de ObjectsBuildControl) guardam cada
+      # vertice uma vez só e são expandidas aqui, na ordem dos indices
+      if 'indices' in face:
+        face['vertices'] = np.asarray(face['vertices'])[face['indices']].tolist()
+
       total_vertices = len(face['vertices'])
       map_color_position = {
         'name': objName,
@@ -91,6 +114,7 @@ class ObjectControl(TransformControl) :
       
       for vert in face['vertices']:
         self.vertices_list['vertices'].append(vert)
+        self.vertices_list['colors'].append(face['color'])
 
       self.vertices_list['first_last_vertices'].append({
           'name': objName,
@@ -103,32 +127,51 @@ class ObjectControl(TransformControl) :
 
     # Também construimos uma listagem de objetos 
     # com suas principais caracteristicas e posicoes
-    # globais
+    # globais. As faces de um objeto são consecutivas em
+    # self.faces_color, e os comandos de desenho (primeiro
+    # vértice e total de vértices de cada face) já ficam prontos
+    # em arrays para um único glMultiDrawArrays
     """
     self.object_list = [{
       'name': objName,
       'vertices': {
-        'first': vi,
+        'first': primeiro vértice,
         'last': vf
       },
-      'global_offset': global_offset,
-      'global_angle': [0,0,0],
-      'global_scale': [1,1,1],
+      'faces': {
+        'first': primeira face em self.faces_color,
+        'last': última face + 1
+      },
+      'draw': {
+        'first': array int32,
+        'count': array int32
+      },
+      'transform': linha em self.transforms (deslocamento global_offset,
+                   angulo [0,0,0] e escala [1,1,1] iniciais),
       'global_dt': 0
     }]
     """
     
-    self.object_list.append({
+    object_faces = self.faces_color[first_face:]
+    record = {
       'name': objName,
       'vertices': {
-        'first': vi,
+        'first': first_vertex,
         'last': vf
       },
-      'global_offset': global_offset,
-      'global_angle': [0,0,0],
-      'global_scale': [1,1,1],
+      'faces': {
+        'first': first_face,
+        'last': len(self.faces_color)
+      },
+      'draw': {
+        'first': np.array([face['first'] for face in object_faces], np.int32),
+        'count': np.array([face['total'] for face in object_faces], np.int32)
+      },
+      'transform': self.transforms.add(global_offset),
       'global_dt': 0
-    })
+    }
+    self.object_list.append(record)
+    self.object_index[objName] = record
     self.dt = 0.01
     return self.vertices_list
   
@@ -139,7 +182,7 @@ class ObjectControl(TransformControl) :
     @param
       offset: deslocamento incrementado
     """
-    g_offset = self.current_object['global_offset']
+    g_offset = self.transforms.offset(self.current_object['transform'])
 
     if self.current_object['name'] == 'moon':
       res = Trajectories.circle(g_offset, self.current_object['global_dt'])
@@ -158,33 +201,56 @@ class ObjectControl(TransformControl) :
       offset: deslocamento para translado
       scale: fato de escala
     """
-    curObj = list(filter(lambda x : x['name'] == objName, self.object_list))
-    if not curObj:
-      raise NameError(f'Object named {objName} not loaded')
-    self.current_object = curObj[0]
+    self.current_object = self.get_object(objName)
     
+    index = self.current_object['transform']
+
     if offset:
-      self.current_object['global_offset'] = self.get_trajectory(offset)
+      self.transforms.set(index, offset=self.get_trajectory(offset))
 
     if angle:
-      g_angle = self.current_object['global_angle']
-      self.current_object['global_angle'] = [angle[0] + g_angle[0], angle[1] + g_angle[1], angle[2] + g_angle[2]]
+      g_angle = self.transforms.angle(index)
+      self.transforms.set(index, angle=[angle[0] + g_angle[0], angle[1] + g_angle[1], angle[2] + g_angle[2]])
     
     if scale:
-      g_scale = self.current_object['global_scale']
-      self.current_object['global_scale'] = [scale[0] + g_scale[0], scale[1] + g_scale[1], scale[2] + g_scale[2]]
+      g_scale = self.transforms.scale(index)
+      self.transforms.set(index, scale=[scale[0] + g_scale[0], scale[1] + g_scale[1], scale[2] + g_scale[2]])
     
+  def get_object(self, objName):
+    """
+    Registro de um objeto carregado, por seu nome
+    """
+    record = self.object_index.get(objName)
+    if record is None:
+      raise NameError(f'Object named {objName} not loaded')
+    return record
+
+  def uniform_location(self, program, name):
+    """
+    Localização de um uniform do programa, em cache
+    """
+    location = self.uniform_locations.get((program, name))
+    if location is None:
+      location = self.uniform_locations[(program, name)] = glGetUniformLocation(program, name)
+    return location
+
+  def reset_gl_calls(self):
+    self.gl_calls = 0
+
   def draw(self, program):
     """
-    Exibir em tela o objeto corrente com seus vértices
-    e cor de face
+    Exibir em tela o objeto corrente com seus vértices:
+    todas as faces em um único glMultiDrawArrays, a cor
+    de cada face vem do atributo de vértice color. Objetos
+    de uma face só (a maioria) usam glDrawArrays, que no
+    PyOpenGL custa bem menos que converter os arrays
     """
-    loc_color = glGetUniformLocation(program, "color")
-    for face_color in self.current_object_faces:
-      r,g,b,a = face_color['rgb']
-      vi, vt = face_color['first'], face_color['total']
-      glUniform4f(loc_color, r, g, b, a)
-      glDrawArrays(GL_TRIANGLE_STRIP, vi, vt)
+    commands = self.current_object['draw']
+    if len(commands['count']) == 1:
+      glDrawArrays(GL_TRIANGLE_STRIP, int(commands['first'][0]), int(commands['count'][0]))
+    else:
+      glMultiDrawArrays(GL_TRIANGLE_STRIP, commands['first'], commands['count'], len(commands['count']))
+    self.gl_calls += 1
   
   def apply_transform(self, program, objName):
     """
@@ -194,34 +260,18 @@ class ObjectControl(TransformControl) :
     @param
       objName: nome do objeto a ser transformado
     """
-    cur_Obj = list(filter(lambda x : x['name'] == objName, self.object_list))
-    if not cur_Obj:
-      raise NameError(f'Object named {objName} not loaded')
-    self.current_object = cur_Obj[0]
-    
-    offset = self.current_object['global_offset']
-    angle = self.current_object['global_angle']
-    scale = self.current_object['global_scale']
-
-    mat_rotation_x = TransformControl.rotation_x(angle[0])
-    mat_rotation_y = TransformControl.rotation_y(angle[1])
-    mat_rotation_z = TransformControl.rotation_z(angle[2])
-
-    mat_scale = TransformControl.scale(scale)
-
-    mat_translacao = TransformControl.translation(offset)
-
-    mat_transform = TransformControl.multiplica_matriz(mat_rotation_z,mat_rotation_y)
-    mat_transform = TransformControl.multiplica_matriz(mat_rotation_x,mat_transform)
-    mat_transform = TransformControl.multiplica_matriz(mat_scale,mat_transform)
+    self.current_object = self.get_object(objName)
     
-    mat_transform = TransformControl.multiplica_matriz(mat_translacao,mat_transform)
+    # matrizes recalculadas em lote, só para os objetos alterados
+    # desde o último quadro (nada a fazer nos quadros sem alterações)
+    self.transforms.update()
+    mat_transform = self.transforms.matrices[self.current_object['transform']]
     
-    loc_transformation = glGetUniformLocation(program, "mat_transformation")
+    loc_transformation = self.uniform_location(program, "mat_transformation")
     glUniformMatrix4fv(loc_transformation, 1, GL_TRUE, mat_transform) 
+    self.gl_calls += 1
     
-    self.current_object_faces = list(filter(lambda x : x['name'] == objName, self.faces_color))
-    if not self.current_object_faces:
+    if not len(self.current_object['draw']['count']):
       raise NameError(f'Object named {objName} without faces')
     
     self.draw(program)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import numpy as np
+
+class TransformStore:
+  """
+  Armazenamento em lote das transformações globais dos objetos
+
+  Deslocamento, ângulo e escala de todos os objetos ficam em um único
+  array estruturado do NumPy, uma linha por objeto. Só as linhas
+  alteradas desde o último quadro (sujas) têm a matriz de transformação
+  recalculada, todas de uma vez, com as rotações empilhadas em arrays
+  (n, 3, 3) multiplicados em lote.
+
+  A matriz de cada objeto é a mesma de TransformControl, na mesma ordem:
+    T(deslocamento) . S(escala) . Rx . Rz . Ry
+  """
+  DTYPE = np.dtype([
+    ('offset', np.float64, 3),
+    ('angle', np.float64, 3),
+    ('scale', np.float64, 3),
+    ('dirty', np.bool_),
+  ])
+
+  def __init__(self, capacity = 32):
+    """
+    Inicialização do armazenamento
+
+    @param
+      capacity: quantidade inicial de linhas (cresce conforme necessário)
+    """
+    self.rows = np.zeros(capacity, self.DTYPE)
+    self.matrices = np.zeros((capacity, 4, 4), np.float32)
+    self.count = 0
+    # há alguma linha suja? evita procurar por elas em quadros sem alterações
+    self.pending = False
+
+  def add(self, offset = (0,0,0), angle = (0,0,0), scale = (1,1,1)):
+    """
+    Adicionar um objeto
+
+    @param
+      offset: deslocamento inicial
+      angle: ângulos iniciais (x, y, z)
+      scale: escala inicial
+    @return
+      índice da linha do objeto
+    """
+    if self.count == len(self.rows):
+      self.grow(2 * len(self.rows))
+    index = self.count
+    self.count += 1
+    self.rows[index] = (offset, angle, scale, True)
+    self.pending = True
+    return index
+
+  def grow(self, capacity):
+    """
+    Aumentar a capacidade dos arrays, preservando as linhas existentes
+    """
+    rows = np.zeros(capacity, self.DTYPE)
+    rows[:self.count] = self.rows[:self.count]
+    matrices = np.zeros((capacity, 4, 4), np.float32)
+    matrices[:self.count] = self.matrices[:self.count]
+    self.rows, self.matrices = rows, matrices
+
+  def set(self, index, offset = None, angle = None, scale = None):
+    """
+    Alterar a transformação de um objeto e marcá-lo como sujo
+
+    @param
+      index: linha do objeto
+      offset: novo deslocamento
+      angle: novos ângulos
+      scale: nova escala
+    """
+    if offset is not None:
+      self.rows['offset'][index] = offset
+    if angle is not None:
+      self.rows['angle'][index] = angle
+    if scale is not None:
+      self.rows['scale'][index] = scale
+    self.rows['dirty'][index] = True
+    self.pending = True
+
+  def offset(self, index):
+    return tuple(self.rows['offset'][index])
+
+  def angle(self, index):
+    return tuple(self.rows['angle'][index])
+
+  def scale(self, index):
+    return tuple(self.rows['scale'][index])
+
+  def update(self):
+    """
+    Recalcular as matrizes das linhas sujas, em lote
+
+    @return
+      quantidade de matrizes recalculadas
+    """
+    if not self.pending:
+      return 0
+    self.pending = False
+
+    dirty = np.flatnonzero(self.rows['dirty'][:self.count])
+    rows = self.rows[dirty]
+    self.matrices[dirty] = self.build_matrices(rows['offset'], rows['angle'], rows['scale'])
+    self.rows['dirty'][dirty] = False
+    return len(dirty)
+
+  @staticmethod
+  def build_matrices(offsets, angles, scales):
+    """
+    Matrizes de transformação de n objetos de uma vez
+
+    @param
+      offsets, angles, scales: arrays (n, 3)
+    @return
+      array (n, 4, 4) float32, matrizes por linha (como TransformControl)
+    """
+    n = len(offsets)
+    c, s = np.cos(angles), np.sin(angles)
+    zero, one = np.zeros(n), np.ones(n)
+
+    rotation_x = np.stack([
+      one, zero, zero,
+      zero, c[:,0], -s[:,0],
+      zero, s[:,0], c[:,0]], axis=1).reshape(n, 3, 3)
+    rotation_y = np.stack([
+      c[:,1], zero, s[:,1],
+      zero, one, zero,
+      -s[:,1], zero, c[:,1]], axis=1).reshape(n, 3, 3)
+    rotation_z = np.stack([
+      c[:,2], -s[:,2], zero,
+      s[:,2], c[:,2], zero,
+      zero, zero, one], axis=1).reshape(n, 3, 3)
+
+    matrices = np.zeros((n, 4, 4), np.float32)
+    # S . Rx . Rz . Ry: a escala multiplica as linhas da rotação
+    # (np.matmul em lote: mais rápido que einsum tanto para 18 quanto para 100 mil objetos)
+    rotation = rotation_x @ rotation_z @ rotation_y
+    matrices[:, :3, :3] = scales[:, :, None] * rotation
+    matrices[:, :3, 3] = offsets
+    matrices[:, 3, 3] = 1.0
+    return matrices
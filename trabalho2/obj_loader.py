@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+
+# number of floats per interleaved vertex: position (3) + texture coords (2)
+VERTEX_STRIDE = 5
+
+# bump whenever the buffers produced by load_indexed_obj_model change, so mesh_cache.py drops old entries
+LOADER_VERSION = 2
+
+def find_diffuse_texture(path):
+    """Returns the first map_Kd texture of the OBJ's material library, if any."""
+    mtl_path = None
+    base_dir = os.path.dirname(path)
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, 'r') as file:
+        for line in file:
+            if line.startswith('mtllib'):
+                mtl_name = ''.join(line.strip().split(' ', 1)[1:])
+                mtl_path = os.path.join(base_dir, mtl_name)
+                break
+
+    if mtl_path and os.path.exists(mtl_path):
+        with open(mtl_path, 'r') as mtl_file:
+            for line in mtl_file:
+                if line.startswith("map_Kd"):
+                    # some of the MTL files were exported on Windows
+                    texture = ''.join(line.strip().split(' ', 1)[1:]).replace('\\', '/')
+                    return os.path.normpath(os.path.join(base_dir, texture))
+    return None
+
+def parse_obj_corners(path):
+    """Parses an OBJ file into its positions, texcoords and one (v, vt) index pair per triangle corner."""
+    positions = []
+    texcoords = []
+    corners = []
+
+    with open(path, 'r') as file:
+        for line in file:
+            if line.startswith('v '):
+                parts = line.strip().split()[1:]
+                positions.append([float(p) for p in parts][:3])
+            elif line.startswith('vt '):
+                parts = line.strip().split()[1:]
+                texcoords.append([float(p) for p in parts][:2])
+            elif line.startswith('f '):
+                parts = line.strip().split()[1:]
+                face = []
+                for part in parts:
+                    v_idx, vt_idx = (part.split('/') + [0, 0])[:2]
+                    face.append((int(v_idx) - 1, int(vt_idx) - 1))
+                # triangles referencing missing positions are skipped
+                if any(abs(v_idx) > len(positions) - 1 for v_idx, _ in face):
+                    continue
+                if len(face) == 3:
+                    corners.extend(face)
+                elif len(face) == 4:
+                    corners.extend([face[0], face[1], face[2], face[0], face[2], face[3]])
+
+    positions = np.array(positions, dtype=np.float32).reshape(-1, 3)
+    texcoords = np.array(texcoords, dtype=np.float32).reshape(-1, 2)
+    corners = np.array(corners, dtype=np.int64).reshape(-1, 2)
+    # negative (relative or missing) indices count from the end, like Python list indexing
+    corners[:, 0] %= max(len(positions), 1)
+    corners[:, 1] %= max(len(texcoords), 1)
+    return positions, texcoords, corners
+
+# collapses the triangle corners that share the same attribute indices into one vertex each.
+# corners is a (count, columns) array of non-negative indices (one column per attribute);
+# returns the corner each unique vertex is built from, numbered in order of first use, and
+# the index buffer: one uint16 vertex number per corner, uint32 past 65536 vertices
+# ------------------------------------------------------------------------------------------
+def index_corners(corners: np.ndarray) -> tuple:
+    if len(corners) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16)
+
+    keys = np.ravel_multi_index(tuple(corners.T), tuple(corners.max(axis=0) + 1))
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # np.unique numbers the vertices in key order; renumber them in the order the triangles use them
+    order = np.argsort(first)
+    number = np.empty(len(order), dtype=np.int64)
+    number[order] = np.arange(len(order))
+
+    index_type = np.uint16 if len(order) <= 65536 else np.uint32
+    return first[order], number[inverse.reshape(-1)].astype(index_type)
+
+def load_indexed_obj_model(path):
+    """Parses an OBJ file for glDrawElements: a flat float32 array of position + texcoord per unique
+    (v, vt) pair and a uint16/uint32 array with the index of that vertex for every triangle corner."""
+    positions, texcoords, corners = parse_obj_corners(path)
+    first, indices = index_corners(corners)
+    unique = corners[first]
+
+    vertices = np.zeros((len(unique), VERTEX_STRIDE), dtype=np.float32)
+    vertices[:, 0:3] = positions[unique[:, 0]]
+    if len(texcoords):
+        vertices[:, 3:5] = texcoords[unique[:, 1]]
+    return vertices.reshape(-1), indices
+
+def load_obj_model(path):
+    """Parses an OBJ file into a flat float32 array of position + texcoord per triangle corner."""
+    vertices, indices = load_indexed_obj_model(path)
+    return vertices.reshape(-1, VERTEX_STRIDE)[indices].reshape(-1)
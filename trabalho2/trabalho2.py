@@ -1,10 +1,25 @@
 import glfw
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram, compileShader
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
 import numpy as np
-from PIL import Image
 import glm
+import functools
 import os
+import sys
+
+# The engine package shared with trabalho3 is at the root of the repository
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from obj_loader import find_diffuse_texture, VERTEX_STRIDE
+from engine.mesh_cache import load_mesh
+from engine.texture_cache import load_texture as load_baked_texture
+from engine.asset_registry import AssetRegistry
+from engine.instancing import InstanceGroup, group_by
+from engine.culling import Bounds, FrustumCuller, mesh_bounds
+from engine.mesh_lod import MeshLod, update_lods
+from engine import vertex_format
+from engine.draw_queue import DrawQueue, GLState
 
 # Camera state
 camera_pos = glm.vec3(0.0, 1.0, 5.0)
@@ -18,6 +33,10 @@ pitch = 0.0
 sensitivity = 0.1
 scaleBuddha = 30
 display_mash = False
+use_instancing = True
+use_frustum_culling = True
+use_mesh_lod = True
+use_state_sorting = True
 
 import math
 
@@ -35,14 +54,139 @@ def compute_model_matrix(angle, r_x, r_y, r_z, t_x, t_y, t_z, s_x, s_y, s_z):
     return matrix_transform
 
 
-class ObjectLoad:
-    def __init__(self, obj_path, texture_file = None):
-        self.vertices = self.load_obj(obj_path, texture_file)
-        self.model = glm.mat4(1.0)
+# Textures and meshes shared by every object loaded from the same files
+assets = AssetRegistry()
+
+# Upload the block compressed (BC1/BC3) texture cache entries instead of RGBA ones
+COMPRESS_TEXTURES = False
+
+# Upload the meshes in the compact vertex format of vertex_format.py (12 instead of 20 bytes per vertex)
+COMPACT_VERTICES = False
+
+COMPRESSED_FORMATS = {"bc1": GL_COMPRESSED_RGB_S3TC_DXT1_EXT, "bc3": GL_COMPRESSED_RGBA_S3TC_DXT5_EXT}
+
+def load_texture(path):
+    texture = glGenTextures(1)
+    # flipped RGBA image and mipmaps, baked once into the texture cache (see texture_cache.py)
+    baked = load_baked_texture(path, rgba=True, compress=COMPRESS_TEXTURES)
+    if baked is None:
+        # a missing texture leaves the object untextured instead of stopping the program
+        print("Texture failed to load at path: " + path)
+        return texture, 0
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for level, (width, height, data) in enumerate(baked.levels):
+        if baked.compressed:
+            glCompressedTexImage2D(GL_TEXTURE_2D, level, COMPRESSED_FORMATS[baked.layout], width, height, 0, data)
+        else:
+            glTexImage2D(GL_TEXTURE_2D, level, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(baked.levels) - 1)
+    # every mip level, as stored in the cache
+    return texture, baked.nbytes
+
+def delete_texture(texture):
+    glDeleteTextures(1, (texture,))
+
+
+class Mesh:
+    def __init__(self, obj_path):
+        try:
+            self.vertices, self.indices, self.lods = load_mesh(obj_path)
+        except OSError:
+            print("Mesh failed to load at path: " + obj_path)
+            self.vertices, self.indices = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.uint16)
+            self.lods = [MeshLod(0, 0, 0, 0, 0.0)]
+        # Drawn with glDrawElements: one index per triangle corner into the unique vertices of
+        # the level of detail, all levels (see mesh_lod.py) sharing the same buffers
+        self.vertex_count = self.lods[0].vertex_count
+        self.index_count = self.lods[0].index_count
+        self.index_type = GL_UNSIGNED_SHORT if self.indices.dtype == np.uint16 else GL_UNSIGNED_INT
+        # Object space bounding box of the full mesh, shared by every object using this mesh
+        self.bounds = mesh_bounds(self.vertices[:self.vertex_count * VERTEX_STRIDE], VERTEX_STRIDE)
+        # The VBO holds the float vertices or their compact packing, whose positions the vertex
+        # shader maps back with position_offset + a_position * position_scale
+        self.compact = COMPACT_VERTICES and vertex_format.can_pack(self.vertices, VERTEX_STRIDE)
+        if self.compact:
+            packed, self.position_offset, self.position_scale = vertex_format.pack_vertices(self.vertices, VERTEX_STRIDE)
+            self.vertex_buffer = packed.view(np.uint8)
+        else:
+            self.vertex_buffer = self.vertices
+            self.position_offset, self.position_scale = np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)
         self.vao = glGenVertexArrays(1)
         self.vbo = glGenBuffers(1)
+        self.ebo = glGenBuffers(1)
+        # Every VAO reading this VBO: the mesh's own and those of its instance groups
+        self.vertex_arrays = [self.vao]
         self.setup_buffers()
 
+    def setup_buffers(self):
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertex_buffer.nbytes, self.vertex_buffer, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        self.bind_attributes()
+
+    # also used by the instance groups, which reuse this VBO and EBO in their own VAO
+    def bind_attributes(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        vertex_format.bind_attributes(VERTEX_STRIDE, self.compact)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+
+    # Sets the uniforms that undo the position quantization (the identity for float vertices)
+    # through state, a draw_queue.GLState
+    def set_position_uniforms(self, state):
+        state.set_vec3("position_scale", glm.vec3(*self.position_scale))
+        state.set_vec3("position_offset", glm.vec3(*self.position_offset))
+
+    @property
+    def nbytes(self):
+        return self.vertex_buffer.nbytes + self.indices.nbytes
+
+    def draw(self, lod=0):
+        glBindVertexArray(self.vao)
+        self.draw_elements(lod)
+
+    # Draws a level of detail with the bound VAO, instanced when instance_count is given;
+    # returns the draw calls issued
+    def draw_elements(self, lod=0, instance_count=None):
+        level = self.lods[min(lod, len(self.lods) - 1)]
+        first = ctypes.c_void_p(level.first_index * self.indices.itemsize)
+        if instance_count is None:
+            glDrawElementsBaseVertex(GL_TRIANGLES, level.index_count, self.index_type, first, level.base_vertex)
+        else:
+            glDrawElementsInstancedBaseVertex(GL_TRIANGLES, level.index_count, self.index_type, first,
+                                              instance_count, level.base_vertex)
+        return 1
+
+    def delete(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        glDeleteBuffers(2, (self.vbo, self.ebo))
+
+def load_mesh_asset(path):
+    mesh = Mesh(path)
+    return mesh, mesh.nbytes
+
+
+class ObjectLoad:
+    def __init__(self, obj_path, texture_file = None):
+        self.obj_path = obj_path
+        self.texture_file = find_diffuse_texture(obj_path) or texture_file
+
+        self.mesh = assets.acquire("mesh", obj_path, load_mesh_asset, Mesh.delete)
+        self.texture = assets.acquire("texture", self.texture_file, load_texture, delete_texture) if self.texture_file else None
+
+        self.vertices = self.mesh.vertices
+        self.vao = self.mesh.vao
+        self.vbo = self.mesh.vbo
+        self.model = glm.mat4(1.0)
+        self.model_version = 0
+        # World space bounding box/sphere for frustum culling, follows the model matrix
+        self.bounds = Bounds(*self.mesh.bounds)
+        # Level of detail drawn, picked every frame from the size on screen
+        self.lod = 0
+
         # Transformation state
         self.angle = 0.0
         self.position = glm.vec3(0.0, 0.0, 0.0)
@@ -56,6 +200,8 @@ class ObjectLoad:
             self.position.x, self.position.y, self.position.z,
             self.scale_factor.x, self.scale_factor.y, self.scale_factor.z
         )
+        self.model_version += 1
+        self.bounds.update(self.model)
 
     def move(self, x=0, y=0, z=0):
         self.position.x += x 
@@ -77,81 +223,40 @@ class ObjectLoad:
         self.update_model_matrix()
         self.update_model_matrix()
 
-    def load_texture(self, path):
-        img = Image.open(path).transpose(Image.FLIP_TOP_BOTTOM)
-        img_data = img.convert("RGBA").tobytes()
-        texture = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, img.width, img.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
-        return texture
-
-    def load_obj(self, path, texture_file):
-        positions = []
-        texcoords = []
-        faces = []
-        mtl_path = None
-
-        base_dir = os.path.dirname(path)
-
-        with open(path, 'r') as file:
-            for line in file:
-                if line.startswith('mtllib'):
-                    mtl_name = ''.join(line.strip().split(' ', 1)[1:])
-                    mtl_path = os.path.join(base_dir, mtl_name)
-                elif line.startswith('v '):
-                    parts = line.strip().split()[1:]
-                    positions.append([float(p) for p in parts])
-                elif line.startswith('vt '):
-                    parts = line.strip().split()[1:]
-                    texcoords.append([float(p) for p in parts])
-                elif line.startswith('f '):
-                    parts = line.strip().split()[1:]
-                    face = []
-                    for part in parts:
-                        v_idx, vt_idx = (part.split('/') + [0, 0])[:2]
-                        face.append((int(v_idx) - 1, int(vt_idx) - 1))
-                    if len(face) == 3:
-                        faces.append(face)
-                    elif len(face) == 4:
-                        faces.append([face[0], face[1], face[2]])
-                        faces.append([face[0], face[2], face[3]])
-   
-        if mtl_path and os.path.exists(mtl_path):
-            with open(mtl_path, 'r') as mtl_file:
-                for line in mtl_file:
-                    if line.startswith("map_Kd"):
-                        texture_file = os.path.join(base_dir, ''.join(line.strip().split(' ', 1)[1:]))
-                        break
-
-        self.texture = self.load_texture(texture_file) if texture_file else None
-
-        vertex_data = []
-        for face in faces:
-            for v_idx, vt_idx in face:
-                if abs(v_idx) > len(positions) - 1: 
-                    break
-                vertex = positions[v_idx]
-                tex = texcoords[vt_idx]
-                vertex_data.extend(vertex[:3] + tex[:2])
-
-        return np.array(vertex_data, dtype=np.float32)
+    def delete(self):
+        assets.release("mesh", self.obj_path)
+        if self.texture_file:
+            assets.release("texture", self.texture_file)
 
+    # The texture bound to unit 0; an object without one leaves the unit as it is
+    @property
+    def textures(self):
+        return (self.texture,) if self.texture else ()
 
-    def setup_buffers(self):
-        glBindVertexArray(self.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * 4, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * 4, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(1)
+    # Queues the object on a draw_queue.DrawQueue, drawn with the shader program
+    def submit(self, queue, shader):
+        queue.submit(shader, self.textures, self.vao, self.issue)
+
+    # The uniforms and draw call of the object, once its program, texture and VAO are bound
+    def issue(self, state):
+        state.set_mat4("model", self.model)
+        self.mesh.set_position_uniforms(state)
+        state.count(self.mesh.draw_elements(self.lod))
 
     def draw(self, shader):
-        glBindTexture(GL_TEXTURE_2D, self.texture)
-        glBindVertexArray(self.vao)
-        glUniformMatrix4fv(glGetUniformLocation(shader, "model"), 1, GL_FALSE, glm.value_ptr(self.model))
-        glDrawArrays(GL_TRIANGLES, 0, len(self.vertices) // 5)
+        queue = DrawQueue(GLState())
+        self.submit(queue, shader)
+        queue.flush()
+
+# One instance group per (mesh, texture): repeated objects such as the trees become one draw call
+def build_instance_groups(objects):
+    groups = group_by(objects, lambda obj: (obj.obj_path, obj.texture))
+    return [InstanceGroup(members[0].mesh, members) for members in groups.values()]
+
+# The uniforms and draw calls of an instance group, once its program, texture and VAO are bound
+def issue_instances(group, members, state):
+    group.mesh.set_position_uniforms(state)
+    state.count(group.draw_instances(members))
 
 # Callbacks
 def scroll_callback(window, xoffset, yoffset):
@@ -189,7 +294,7 @@ def mouse_callback(window, xpos, ypos):
 
 
 def key_callback(window, key, scancode, action, mods):
-    global camera_pos, camera_front, camera_up, scaleBuddha, display_mash
+    global camera_pos, camera_front, camera_up, scaleBuddha, display_mash, use_instancing, use_frustum_culling, use_mesh_lod, use_state_sorting
 
     objects = glfw.get_window_user_pointer(window)
     # obj1 : ObjectLoad = objects["obj1"]
@@ -206,6 +311,18 @@ def key_callback(window, key, scancode, action, mods):
     if action == glfw.PRESS and key == glfw.KEY_P:
         display_mash = not display_mash
 
+    if action == glfw.PRESS and key == glfw.KEY_T:
+        use_instancing = not use_instancing
+
+    if action == glfw.PRESS and key == glfw.KEY_F:
+        use_frustum_culling = not use_frustum_culling
+
+    if action == glfw.PRESS and key == glfw.KEY_H:
+        use_mesh_lod = not use_mesh_lod
+
+    if action == glfw.PRESS and key == glfw.KEY_G:
+        use_state_sorting = not use_state_sorting
+
     if action == glfw.PRESS or action == glfw.REPEAT:
         right = glm.normalize(glm.cross(camera_front, camera_up))
 
@@ -257,6 +374,150 @@ def key_callback(window, key, scancode, action, mods):
         elif key == glfw.KEY_L:
             objects['cat'].move(x=translate_step)
 
+# Shaders, objects and draw state of the scene, independent of the window so that it can
+# also be rendered offscreen
+class Scene:
+    def __init__(self):
+        vShaderFile = open('vertex_shader.vs')
+        vInstancedShaderFile = open('vertex_shader_instanced.vs')
+        fShaderFile = open('fragment_shader.fs')
+
+        # read file's buffer contents into strings
+        vertexCode = vShaderFile.read()
+        vertexInstancedCode = vInstancedShaderFile.read()
+        fragmentCode = fShaderFile.read()
+        # close file handlers
+        vShaderFile.close()
+        vInstancedShaderFile.close()
+        fShaderFile.close()
+
+        self.shader = compileProgram(
+            compileShader(vertexCode, GL_VERTEX_SHADER),
+            compileShader(fragmentCode, GL_FRAGMENT_SHADER)
+        )
+        self.instanced_shader = compileProgram(
+            compileShader(vertexInstancedCode, GL_VERTEX_SHADER),
+            compileShader(fragmentCode, GL_FRAGMENT_SHADER)
+        )
+
+        # view and projection are set once per frame; their locations never change after linking
+        self.matrix_locations = {
+            program: (glGetUniformLocation(program, "view"), glGetUniformLocation(program, "projection"))
+            for program in (self.shader, self.instanced_shader)
+        }
+
+        glUseProgram(self.shader)
+        glEnable(GL_DEPTH_TEST)
+
+        self.objects = objects = {
+            'boxSky': ObjectLoad("objects/caixa/caixa.obj", "objects/skybox/image_part_002.png"),
+            'boxGround': ObjectLoad("objects/caixa/caixa.obj", "objects/grass/Textures/green-grass-texture-background-grass-garden-concept-used-for-making-green-background-football-pitch-grass-golf-green-lawn-pattern-textured-background-photo.jpg"),
+            'obj1': ObjectLoad("objects/desk/Stylized_Desk.obj"),
+            # 'obj2': ObjectLoad("objects/miniDesk/japanschooldesk.obj"),
+            'obj3': ObjectLoad("objects/tableOut/Outdoor Furniture_02_obj.obj"),
+            'obj4': ObjectLoad("objects/plant1/eb_house_plant_01.obj"),
+            'obj5': ObjectLoad("objects/plant2/eb_house_plant_02.obj"),
+            'obj6': ObjectLoad("objects/plant3/eb_house_plant_03.obj"),
+            'cat': ObjectLoad("objects/cat/Cat_v1_l3.obj"),
+            'tree1': ObjectLoad("objects/tree/Tree2.obj"),
+            'tree2': ObjectLoad("objects/tree/Tree2.obj"),
+            'tree3': ObjectLoad("objects/tree/Tree2.obj"),
+            'tree4': ObjectLoad("objects/tree/Tree2.obj"),
+            'tree5': ObjectLoad("objects/tree/Tree2.obj"),
+            'tree6': ObjectLoad("objects/tree/Tree2.obj"),
+            'gate': ObjectLoad("objects/gate2/Japanese_Torii_Gate.obj"),
+            'temple': ObjectLoad("objects/temple/Japanese_Temple.obj"),
+            'buddha': ObjectLoad("objects/buddha/SM_Buddha.obj"),
+        }
+
+        objects['boxSky'].scale(149,149,149)
+        objects['boxSky'].move(y=5)
+        objects['boxGround'].scale(149, 1, 149)
+        objects['boxGround'].move(y=-2)
+        objects['obj1'].scale(0.01, 0.01, 0.01)
+        objects['obj1'].move(x=2, y=12.55, z=-30)
+        #objects['obj2'].move(z=4)
+        objects['obj3'].move(x=4,z=-4)
+        objects['obj3'].scale(0.02, 0.02, 0.02)
+        objects['obj4'].scale(0.04, 0.04, 0.04)
+        objects['obj4'].move(x=2, y=3.3, z=-30)
+        objects['obj5'].scale(0.04, 0.04, 0.04)
+        objects['obj5'].move(x=-2, y=12.55, z=-30)
+        objects['obj6'].scale(0.04, 0.04, 0.04)
+        objects['obj6'].move(y=3.3, z=-33)
+        objects['cat'].scale(0.02, 0.02, 0.02)
+        objects['cat'].rotate(-90, axis='x')
+        objects['cat'].move(y=3.3, z=-30)
+        objects['gate'].scale(15, 15, 15)
+        objects['gate'].move(z=4)
+        objects['temple'].scale(1.5, 1.5, 1.5)
+        objects['temple'].move(z=-30)
+        objects['buddha'].scale(scaleBuddha, scaleBuddha, scaleBuddha)
+        objects['buddha'].rotate(180, axis='y')
+        objects['buddha'].move(z=100)
+
+        objects['tree1'].scale(2, 2, 2)
+        objects['tree2'].scale(2, 2, 2)
+        objects['tree3'].scale(2, 2, 2)
+        objects['tree4'].scale(2, 2, 2)
+        objects['tree5'].scale(2, 2, 2)
+        objects['tree6'].scale(2, 2, 2)
+
+
+        objects['tree1'].move(x=50, z=-10)
+        objects['tree2'].move(x=-50, z=-10)
+        objects['tree3'].move(x=40, z=0)
+        objects['tree4'].move(x=-40, z=0)
+        objects['tree5'].move(x=30, z=15)
+        objects['tree6'].move(x=-30, z=15)
+
+        self.instance_groups = build_instance_groups(objects.values())
+        self.culler = FrustumCuller()
+
+        # Every frame's draws go through one queue sorted by program, texture and VAO, which skips
+        # the binds and uniforms already current; gl_state.calls counts the GL calls issued
+        self.gl_state = GLState()
+        self.draw_queue = DrawQueue(self.gl_state)
+
+    def render(self, view, projection):
+        glClearColor(0.1, 0.1, 0.1, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        program = self.instanced_shader if use_instancing else self.shader
+        glUseProgram(program)
+        view_location, projection_location = self.matrix_locations[program]
+        glUniformMatrix4fv(view_location, 1, GL_FALSE, glm.value_ptr(view))
+        glUniformMatrix4fv(projection_location, 1, GL_FALSE, glm.value_ptr(projection))
+
+        # Skip the objects outside the view frustum
+        self.culler.enabled = use_frustum_culling
+        visible_objects = self.culler.cull(self.objects.values(), projection, view)
+
+        # Simplified meshes for the objects that are small on screen
+        eye = glm.vec3(glm.inverse(view)[3])
+        pixels_per_unit = glGetIntegerv(GL_VIEWPORT)[3] * projection[1][1] / 2
+        update_lods(visible_objects, eye, pixels_per_unit, use_mesh_lod)
+
+        self.gl_state.new_frame()
+        self.gl_state.filter = self.draw_queue.sort = use_state_sorting
+        if use_instancing:
+            visible = set(visible_objects)
+            for group in self.instance_groups:
+                members = [obj for obj in group.objects if obj in visible]
+                if members:
+                    self.draw_queue.submit(program, group.objects[0].textures, group.VAO,
+                                           functools.partial(issue_instances, group, members))
+        else:
+            for obj in visible_objects:
+                obj.submit(self.draw_queue, self.shader)
+        self.draw_queue.flush()
+
+    def delete(self):
+        for group in self.instance_groups:
+            group.delete()
+        for obj in self.objects.values():
+            obj.delete()
+
 # Main
 def main():
     if not glfw.init():
@@ -269,91 +530,11 @@ def main():
     glfw.set_scroll_callback(window, scroll_callback)
     glfw.set_key_callback(window, key_callback)
 
-    vShaderFile = open('vertex_shader.vs')
-    fShaderFile = open('fragment_shader.fs')
-    
-    # read file's buffer contents into strings
-    vertexCode = vShaderFile.read()
-    fragmentCode = fShaderFile.read()
-    # close file handlers
-    vShaderFile.close()
-    fShaderFile.close()
-
-    shader = compileProgram(
-        compileShader(vertexCode, GL_VERTEX_SHADER),
-        compileShader(fragmentCode, GL_FRAGMENT_SHADER)
-    )
-
-    glUseProgram(shader)
-    glEnable(GL_DEPTH_TEST)
-
-    objects = {
-        'boxSky': ObjectLoad("objects/caixa/caixa.obj", "objects/skybox/image_part_002.png"),
-        'boxGround': ObjectLoad("objects/caixa/caixa.obj", "objects/grass/Textures/green-grass-texture-background-grass-garden-concept-used-for-making-green-background-football-pitch-grass-golf-green-lawn-pattern-textured-background-photo.jpg"),
-        'obj1': ObjectLoad("objects/desk/Stylized_Desk.obj"),
-        # 'obj2': ObjectLoad("objects/miniDesk/japanschooldesk.obj"),
-        'obj3': ObjectLoad("objects/tableOut/Outdoor Furniture_02_obj.obj"),
-        'obj4': ObjectLoad("objects/plant1/eb_house_plant_01.obj"),
-        'obj5': ObjectLoad("objects/plant2/eb_house_plant_02.obj"),
-        'obj6': ObjectLoad("objects/plant3/eb_house_plant_03.obj"),
-        'cat': ObjectLoad("objects/cat/Cat_v1_l3.obj"),
-        'tree1': ObjectLoad("objects/tree/Tree2.obj"),
-        'tree2': ObjectLoad("objects/tree/Tree2.obj"),
-        'tree3': ObjectLoad("objects/tree/Tree2.obj"),
-        'tree4': ObjectLoad("objects/tree/Tree2.obj"),
-        'tree5': ObjectLoad("objects/tree/Tree2.obj"),
-        'tree6': ObjectLoad("objects/tree/Tree2.obj"),
-        'gate': ObjectLoad("objects/gate2/Japanese_Torii_Gate.obj"),
-        'temple': ObjectLoad("objects/temple/Japanese_Temple.obj"),
-        'buddha': ObjectLoad("objects/buddha/SM_Buddha.obj"),
-    }
-
-    objects['boxSky'].scale(149,149,149)
-    objects['boxSky'].move(y=5)
-    objects['boxGround'].scale(149, 1, 149)
-    objects['boxGround'].move(y=-2)
-    objects['obj1'].scale(0.01, 0.01, 0.01)
-    objects['obj1'].move(x=2, y=12.55, z=-30)
-    #objects['obj2'].move(z=4)
-    objects['obj3'].move(x=4,z=-4)
-    objects['obj3'].scale(0.02, 0.02, 0.02)
-    objects['obj4'].scale(0.04, 0.04, 0.04)
-    objects['obj4'].move(x=2, y=3.3, z=-30)
-    objects['obj5'].scale(0.04, 0.04, 0.04)
-    objects['obj5'].move(x=-2, y=12.55, z=-30)
-    objects['obj6'].scale(0.04, 0.04, 0.04)
-    objects['obj6'].move(y=3.3, z=-33)
-    objects['cat'].scale(0.02, 0.02, 0.02)
-    objects['cat'].rotate(-90, axis='x')
-    objects['cat'].move(y=3.3, z=-30)
-    objects['gate'].scale(15, 15, 15)
-    objects['gate'].move(z=4)
-    objects['temple'].scale(1.5, 1.5, 1.5)
-    objects['temple'].move(z=-30)
-    objects['buddha'].scale(scaleBuddha, scaleBuddha, scaleBuddha)
-    objects['buddha'].rotate(180, axis='y')
-    objects['buddha'].move(z=100)
-
-    objects['tree1'].scale(2, 2, 2)
-    objects['tree2'].scale(2, 2, 2)
-    objects['tree3'].scale(2, 2, 2)
-    objects['tree4'].scale(2, 2, 2)
-    objects['tree5'].scale(2, 2, 2)
-    objects['tree6'].scale(2, 2, 2)
-
-
-    objects['tree1'].move(x=50, z=-10)
-    objects['tree2'].move(x=-50, z=-10)
-    objects['tree3'].move(x=40, z=0)
-    objects['tree4'].move(x=-40, z=0)
-    objects['tree5'].move(x=30, z=15)
-    objects['tree6'].move(x=-30, z=15)
-
-
-
-
-    
-    glfw.set_window_user_pointer(window, objects)
+    scene = Scene()
+    print(assets.report())
+    title_counts = None
+
+    glfw.set_window_user_pointer(window, scene.objects)
 
     projection = glm.perspective(glm.radians(45.0), 800/600, 0.1, 500.0) #near and far culling
 
@@ -361,23 +542,13 @@ def main():
         glfw.poll_events()
 
         view = glm.lookAt(camera_pos, camera_pos + camera_front, camera_up)
+        scene.render(view, projection)
 
-        glClearColor(0.1, 0.1, 0.1, 1.0)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-        glUseProgram(shader)
-        glUniformMatrix4fv(glGetUniformLocation(shader, "view"), 1, GL_FALSE, glm.value_ptr(view))
-        glUniformMatrix4fv(glGetUniformLocation(shader, "projection"), 1, GL_FALSE, glm.value_ptr(projection))
-
-        for obj in objects.values():
-            model_loc = glGetUniformLocation(shader, "model")
-            glUniformMatrix4fv(model_loc, 1, GL_FALSE, glm.value_ptr(obj.model))
-
-            if obj.texture:  # Ensure texture is bound only if one was loaded
-                glBindTexture(GL_TEXTURE_2D, obj.texture)
-
-            glBindVertexArray(obj.vao)
-            glDrawArrays(GL_TRIANGLES, 0, len(obj.vertices) // 5)
+        culler = scene.culler
+        if (culler.drawn, culler.culled, scene.gl_state.calls) != title_counts:
+            title_counts = (culler.drawn, culler.culled, scene.gl_state.calls)
+            glfw.set_window_title(window, f"ObjectLoad Class Demo - {culler.drawn} drawn, {culler.culled} culled, "
+                                          f"{scene.gl_state.calls} GL calls")
         
         if display_mash:
             glPolygonMode(GL_FRONT_AND_BACK,GL_LINE)
@@ -386,6 +557,7 @@ def main():
         
         glfw.swap_buffers(window)
 
+    scene.delete()
     glfw.terminate()
 
 if __name__ == "__main__":
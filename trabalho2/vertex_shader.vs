@@ -4,8 +4,11 @@ layout(location = 1) in vec2 a_texcoord;
 uniform mat4 model;
 uniform mat4 view;
 uniform mat4 projection;
+// Maps quantized positions (vertex_format.py) back into object space, the identity for float vertices
+uniform vec3 position_scale = vec3(1.0);
+uniform vec3 position_offset = vec3(0.0);
 out vec2 texcoord;
 void main() {
-    gl_Position = projection * view * model * vec4(a_position, 1.0);
+    gl_Position = projection * view * model * vec4(position_offset + a_position * position_scale, 1.0);
     texcoord = a_texcoord;
 }
\ No newline at end of file
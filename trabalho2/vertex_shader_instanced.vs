@@ -0,0 +1,14 @@
+#version 330 core
+layout(location = 0) in vec3 a_position;
+layout(location = 1) in vec2 a_texcoord;
+layout(location = 3) in mat4 a_model; // per-instance model matrix (locations 3..6)
+uniform mat4 view;
+uniform mat4 projection;
+// Maps quantized positions (vertex_format.py) back into object space, the identity for float vertices
+uniform vec3 position_scale = vec3(1.0);
+uniform vec3 position_offset = vec3(0.0);
+out vec2 texcoord;
+void main() {
+    gl_Position = projection * view * a_model * vec4(position_offset + a_position * position_scale, 1.0);
+    texcoord = a_texcoord;
+}
\ No newline at end of file
@@ -15,15 +15,15 @@ struct DirLight {
     vec3 specular;
 };
 
+// members ordered so the std140 layout packs each float into the padding after a vec3
+// (64 bytes per light, see light_manager.py)
 struct PointLight {
     vec3 position;
-    
     float constant;
-    float linear;
-    float quadratic;
-	
     vec3 ambient;
+    float linear;
     vec3 diffuse;
+    float quadratic;
     vec3 specular;
 };
 
@@ -42,7 +42,7 @@ struct SpotLight {
     vec3 specular;       
 };
 
-#define NR_POINT_LIGHTS 13
+#define MAX_POINT_LIGHTS 512
 
 in vec3 FragPos;
 in vec3 Normal;
@@ -50,7 +50,20 @@ in vec2 TexCoords;
 
 uniform vec3 viewPos;
 uniform DirLight dirLight;
-uniform PointLight pointLights[NR_POINT_LIGHTS];
+layout (std140) uniform PointLights {
+    int pointLightCount;
+    PointLight pointLights[MAX_POINT_LIGHTS];
+};
+
+// clustered lighting (see light_clusters.py): the view frustum is split into
+// clusterGrid.x * clusterGrid.y screen tiles and clusterGrid.z exponential depth slices
+layout (std140) uniform ClusterParams {
+    ivec4 clusterGrid;      // tiles x, tiles y, depth slices, enabled
+    vec4 clusterDepth;      // near, far, slices / log(far / near)
+    vec4 clusterViewport;   // viewport width, height
+};
+uniform usamplerBuffer clusterLights;        // (offset, count) into clusterLightIndices per cluster
+uniform usamplerBuffer clusterLightIndices;  // indices into pointLights
 uniform SpotLight spotLight;
 uniform Material material;
 
@@ -58,6 +71,7 @@ uniform Material material;
 vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir);
 vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
 vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
+int ClusterIndex();
 
 void main()
 {    
@@ -73,9 +87,18 @@ void main()
     // == =====================================================
     // phase 1: directional lighting
     vec3 result = CalcDirLight(dirLight, norm, viewDir);
-    // phase 2: point lights
-    for(int i = 0; i < NR_POINT_LIGHTS; i++)
-        result += CalcPointLight(pointLights[i], norm, FragPos, viewDir);    
+    // phase 2: point lights, either only the ones listed for this fragment's cluster or all of them
+    if (clusterGrid.w != 0)
+    {
+        uvec2 cluster = texelFetch(clusterLights, ClusterIndex()).rg;
+        for(uint i = 0u; i < cluster.y; i++)
+            result += CalcPointLight(pointLights[texelFetch(clusterLightIndices, int(cluster.x + i)).r], norm, FragPos, viewDir);
+    }
+    else
+    {
+        for(int i = 0; i < pointLightCount; i++)
+            result += CalcPointLight(pointLights[i], norm, FragPos, viewDir);
+    }
     // phase 3: spot light
     result += CalcSpotLight(spotLight, norm, FragPos, viewDir);    
     
@@ -144,4 +167,17 @@ vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
     diffuse *= attenuation * intensity;
     specular *= attenuation * intensity;
     return (ambient + diffuse + specular);
-}
\ No newline at end of file
+}
+
+// index of the cluster this fragment falls in, from its window position and its linearized depth.
+int ClusterIndex()
+{
+    float zNear = clusterDepth.x;
+    float zFar = clusterDepth.y;
+    float ndcDepth = gl_FragCoord.z * 2.0 - 1.0;
+    float viewDepth = 2.0 * zNear * zFar / (zFar + zNear - ndcDepth * (zFar - zNear));
+
+    int slice = clamp(int(log(viewDepth / zNear) * clusterDepth.z), 0, clusterGrid.z - 1);
+    ivec2 tile = clamp(ivec2(gl_FragCoord.xy / clusterViewport.xy * vec2(clusterGrid.xy)), ivec2(0), clusterGrid.xy - 1);
+    return (slice * clusterGrid.y + tile.y) * clusterGrid.x + tile.x;
+}
@@ -10,10 +10,14 @@ out vec2 TexCoords;
 uniform mat4 model;
 uniform mat4 view;
 uniform mat4 projection;
+// maps quantized positions (vertex_format.py) back into object space, the identity for float vertices
+uniform vec3 positionScale = vec3(1.0);
+uniform vec3 positionOffset = vec3(0.0);
 
 void main()
 {
-    FragPos = vec3(model * vec4(aPos, 1.0));
+    vec3 position = positionOffset + aPos * positionScale;
+    FragPos = vec3(model * vec4(position, 1.0));
     Normal = mat3(transpose(inverse(model))) * aNormal;  
     TexCoords = aTexCoords;
     
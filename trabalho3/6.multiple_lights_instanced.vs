@@ -0,0 +1,25 @@
+#version 330 core
+layout (location = 0) in vec3 aPos;
+layout (location = 1) in vec3 aNormal;
+layout (location = 2) in vec2 aTexCoords;
+layout (location = 3) in mat4 aModel; // per-instance model matrix (locations 3..6)
+
+out vec3 FragPos;
+out vec3 Normal;
+out vec2 TexCoords;
+
+uniform mat4 view;
+uniform mat4 projection;
+// maps quantized positions (vertex_format.py) back into object space, the identity for float vertices
+uniform vec3 positionScale = vec3(1.0);
+uniform vec3 positionOffset = vec3(0.0);
+
+void main()
+{
+    vec3 position = positionOffset + aPos * positionScale;
+    FragPos = vec3(aModel * vec4(position, 1.0));
+    Normal = mat3(transpose(inverse(aModel))) * aNormal;  
+    TexCoords = aTexCoords;
+    
+    gl_Position = projection * view * vec4(FragPos, 1.0);
+}
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Parallel asset loading: the CPU heavy part of every asset (parsing an OBJ or reading it
+from the mesh cache, baking an image or reading it from the texture cache) runs on a worker pool,
+while the calling thread, the only one with the OpenGL context, just takes the finished
+buffers as they come in and uploads them.
+
+    loader = AssetLoader(workers=4)
+    stats = loader.load([("mesh", "a.obj"), ("texture", "a.png")], upload)
+
+upload(kind, path, data, decode_time) is called on the calling thread once per unique
+(kind, path), in the order the workers finish. Nothing here touches OpenGL, so the
+module is cheap to import in worker processes.
+
+AssetStream does the same without blocking: the render loop keeps drawing and calls
+poll() once per frame, which spends at most a time budget on uploads.
+"""
+import collections, concurrent.futures, os, queue, time
+
+from engine import mesh_cache, texture_cache
+
+def parse_mesh(path: str):
+    return mesh_cache.load_mesh(path)
+
+# what each kind of asset is decoded with (texture_cache.load_texture returns None for a
+# missing image); callers may pass their own, e.g. with functools.partial for options
+DECODERS = {"mesh": parse_mesh, "texture": texture_cache.load_texture}
+
+# runs in the workers: the decoded data and the time it took
+def decode(decoder, path: str) -> tuple:
+    start = time.perf_counter()
+    data = decoder(path)
+    return data, time.perf_counter() - start
+
+def unique_requests(requests) -> list:
+    return list(dict.fromkeys((kind, os.path.normpath(path)) for kind, path in requests))
+
+def executor(workers: int, processes: bool):
+    Executor = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    return Executor(max_workers=workers)
+
+class AssetLoader:
+    # workers <= 1 decodes everything on the calling thread. Threads are the default: PIL and
+    # numpy release the GIL while decoding and the pixels need no copy back; processes also
+    # run the pure Python OBJ parser (mesh cache misses) in parallel, at the cost of pickling
+    # every buffer back to the parent.
+    def __init__(self, workers: int = None, processes: bool = False, decoders: dict = None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.processes = processes
+        self.decoders = DECODERS if decoders is None else decoders
+
+    # decodes every requested asset once and hands it to upload(), returns where the time went
+    # -----------------------------------------------------------------------------------------
+    def load(self, requests, upload) -> dict:
+        unique = unique_requests(requests)
+        stats = {"assets": len(unique), "workers": max(self.workers, 1), "decode": 0.0, "upload": 0.0}
+        start = time.perf_counter()
+
+        def finish(kind, path, data, decode_time):
+            uploadStart = time.perf_counter()
+            upload(kind, path, data, decode_time)
+            stats["decode"] += decode_time
+            stats["upload"] += time.perf_counter() - uploadStart
+
+        if self.workers <= 1:
+            for kind, path in unique:
+                finish(kind, path, *decode(self.decoders[kind], path))
+        else:
+            with executor(self.workers, self.processes) as pool:
+                # biggest files first, so the long decodes do not end up alone at the tail
+                ordered = sorted(unique, key=lambda request: -file_size(request[1]))
+                futures = {pool.submit(decode, self.decoders[kind], path): (kind, path) for kind, path in ordered}
+                try:
+                    for future in concurrent.futures.as_completed(futures):
+                        finish(*futures[future], *future.result())
+                except BaseException:
+                    # a failed decode (or upload) ends the load as it does with one worker,
+                    # without first waiting for the decodes still queued behind it
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+        stats["wall"] = time.perf_counter() - start
+        return stats
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# decodes assets in the background (at least one worker, so the caller never blocks) and
+# uploads them a little at a time. upload(kind, path, data, decode_time) returns an iterable
+# of upload steps (typically a generator yielding between chunks); poll() runs steps, in
+# the order the decodes finish, until it has used up its time budget. An asset whose decode
+# raises is reported and skipped, never re-raised into the render loop.
+class AssetStream:
+    def __init__(self, requests, upload, workers: int = None, processes: bool = False, decoders: dict = None):
+        self.upload = upload
+        decoders = DECODERS if decoders is None else decoders
+        self.ready = queue.Queue()
+        self.steps = collections.deque()
+        self.remaining = 0
+        # (kind, path) of the assets whose decode raised, left as they were preloaded
+        self.failed = []
+        self.started = time.perf_counter()
+        self.finished = None
+        self.uploadTime = 0.0
+
+        workers = os.cpu_count() if workers is None else workers
+        self.pool = executor(max(workers, 1), processes)
+
+        # decoded in the order requested (e.g. smallest first, so the scene fills up quickly)
+        for kind, path in unique_requests(requests):
+            future = self.pool.submit(decode, decoders[kind], path)
+            # runs on the worker: hands the decoded data over to the thread calling poll()
+            future.add_done_callback(lambda future, kind=kind, path=path: self.ready.put((kind, path, future)))
+            self.remaining += 1
+
+    # runs upload steps for up to budget seconds (at least one step when work is waiting);
+    # returns the number of assets not completely uploaded yet
+    # --------------------------------------------------------------------------------------
+    def poll(self, budget: float) -> int:
+        start = time.perf_counter()
+        while self.remaining and time.perf_counter() - start < budget:
+            if not self.steps:
+                try:
+                    kind, path, future = self.ready.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    data, decode_time = future.result()
+                except Exception as error:
+                    # the asset keeps its placeholder and the frame goes on
+                    print(f"Asset failed to load at path: {path} ({error!r})")
+                    self.failed.append((kind, path))
+                    self.remaining -= 1
+                    continue
+                self.steps.append(iter(self.upload(kind, path, data, decode_time)))
+
+            if next(self.steps[0], StopIteration) is StopIteration:
+                self.steps.popleft()
+                self.remaining -= 1
+
+        self.uploadTime += time.perf_counter() - start
+        if self.remaining == 0 and self.finished is None:
+            self.finished = time.perf_counter()
+            self.pool.shutdown()
+        return self.remaining
+
+    def done(self) -> bool:
+        return self.remaining == 0
+
+    # stops decoding what has not started yet (e.g. when the window closes while loading)
+    # ------------------------------------------------------------------------------------
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
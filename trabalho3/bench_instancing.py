@@ -0,0 +1,138 @@
+"""
+Stress scene for the instanced draw path: a grid of lanterns rendered
+offscreen (Mesa llvmpipe works) once with one glDrawElements per lantern and
+once with a single glDrawElementsInstanced, reporting draw calls and frame time.
+
+    python ./bench_instancing.py [--count 2000] [--frames 10] [--mesh ./objects/lantern/lantern.obj]
+"""
+import offscreen
+
+from OpenGL.GL import *
+
+import argparse, math, time
+
+import glm
+
+import trabalho3
+from engine.draw_queue import GLState
+from camera import Camera
+from shader_m import Shader
+from light_manager import PointLightManager
+from light_clusters import LightClusterGrid
+
+LANTERN = ("./objects/lantern/lantern.obj",
+           "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png",
+           "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png")
+
+def set_lights(shader, camera, pointLights) -> None:
+    shader.use()
+    shader.setVec3("viewPos", camera.Position)
+    shader.setFloat("material.shininess", 32.0)
+    pointLights.bind(shader)
+
+    # same (switched off) spot light as trabalho3, an unset one divides by zero in the attenuation
+    shader.setVec3("spotLight.ambient", 0.0, 0.0, 0.0)
+    shader.setFloat("spotLight.constant", 1.0)
+
+def add_lights(pointLights, count=13) -> None:
+    for i in range(count):
+        angle = i * 2 * math.pi / count
+        pointLights.add(glm.vec3(60 * math.cos(angle), 20.0, 60 * math.sin(angle)),
+                        glm.vec3(0.05), glm.vec3(0.7), glm.vec3(1.0))
+    pointLights.upload()
+
+def render_frames(frames, draw) -> tuple:
+    cpu_times = []
+    frame_times = []
+    for frame in range(frames + 1):
+        start = time.perf_counter()
+        glClearColor(0.1, 0.1, 0.1, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw_calls = draw()
+        submitted = time.perf_counter()
+        glFinish()
+        end = time.perf_counter()
+
+        # the first frame pays for shader compilation and buffer uploads
+        if frame > 0:
+            cpu_times.append(submitted - start)
+            frame_times.append(end - start)
+
+    return draw_calls, sum(cpu_times) / frames, sum(frame_times) / frames
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="number of lanterns")
+    parser.add_argument("--frames", type=int, default=10, help="frames averaged per mode")
+    parser.add_argument("--mesh", default=LANTERN[0], help="OBJ drawn instead of the lantern")
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 600), metavar=("W", "H"))
+    args = parser.parse_args()
+
+    context = offscreen.OffscreenContext(*args.size)
+
+    glEnable(GL_DEPTH_TEST)
+    lightingShader = Shader("6.multiple_lights.vs", "6.multiple_lights.fs")
+    instancedShader = Shader("6.multiple_lights_instanced.vs", "6.multiple_lights.fs")
+
+    side = math.ceil(math.sqrt(args.count))
+    camera = Camera(glm.vec3(0.0, side * 1.5, side * 3.0), pitch=-25.0)
+    projection = glm.perspective(glm.radians(camera.Zoom), args.size[0] / args.size[1], 0.1, side * 10.0)
+
+    pointLights = PointLightManager()
+    add_lights(pointLights)
+    # few lights reaching everything: every fragment shades all of them
+    lightClusters = LightClusterGrid()
+    lightClusters.enabled = False
+
+    for shader in (lightingShader, instancedShader):
+        shader.use()
+        shader.setInt("material.diffuse", 0)
+        shader.setInt("material.specular", 1)
+        shader.setMat4("projection", projection)
+        shader.setMat4("view", camera.GetViewMatrix())
+        set_lights(shader, camera, pointLights)
+        lightClusters.bind(shader)
+    lightClusters.build(pointLights, camera.GetViewMatrix())
+
+    lanterns = []
+    for i in range(args.count):
+        lantern = trabalho3.LoadObject(args.mesh, LANTERN[1], LANTERN[2])
+        lantern.scale(5, 5, 5)
+        lantern.move(x=(i % side - side / 2) * 4.0, z=(i // side - side / 2) * 4.0)
+        lanterns.append(lantern)
+
+    groups = trabalho3.buildInstanceGroups(lanterns)
+
+    # one tracker for the whole run, as the scene keeps one: the uniform locations are asked once
+    state = GLState()
+
+    def draw_separately():
+        state.reset()
+        for obj in lanterns:
+            obj.draw(lightingShader, obj.model, state)
+        state.bind_vertex_array(0)
+        return len(lanterns)
+
+    def draw_instanced():
+        state.reset()
+        trabalho3.drawInstanced(groups, instancedShader, state)
+        return len(groups)
+
+    print(f"renderer: {context.renderer()}, {args.count} x {args.mesh} "
+          f"({lanterns[0].mesh.index_count * args.count} indices per frame)")
+    print(f"{'mode':<15} {'draw calls':>10} {'cpu ms':>9} {'frame ms':>9}")
+    for name, draw in (("glDrawElements", draw_separately), ("instanced", draw_instanced)):
+        draw_calls, cpu, frame = render_frames(args.frames, draw)
+        print(f"{name:<15} {draw_calls:>10} {cpu * 1000:>9.2f} {frame * 1000:>9.2f}")
+
+    for group in groups:
+        group.delete()
+    for lantern in lanterns:
+        lantern.delete()
+    pointLights.delete()
+    lightClusters.delete()
+    context.destroy()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+"""
+Many-lights scene for the clustered light culling: a field of boxes lit by a grid of
+short-range point lights, rendered offscreen (Mesa llvmpipe works) once with every
+fragment shading every light and once with the per-cluster light lists. Reports the
+cluster build time, the frame times and how far the two images are apart; with --check
+the exit status is 1 when they differ by more than --tolerance on any channel.
+
+    python ./bench_lights.py [--lights 256] [--frames 5] [--check] [--save brute.png clustered.png]
+"""
+import offscreen
+
+from OpenGL.GL import *
+
+import argparse, math, time
+
+import glm
+import numpy as np
+from PIL import Image
+
+import trabalho3
+from engine.draw_queue import GLState
+from camera import Camera
+from shader_m import Shader
+from light_manager import PointLightManager
+from light_clusters import LightClusterGrid
+
+CUBE = ("./objects/cube/cube.obj",
+        "./objects/cube/Textures/container2.png",
+        "./objects/cube/Textures/container2_specular.png")
+
+NEAR, FAR = 0.1, 400.0
+
+def add_lights(pointLights, count, spacing) -> None:
+    side = math.ceil(math.sqrt(count))
+    for i in range(count):
+        # a few colours so overlapping lights are easy to tell apart in the saved images
+        hue = glm.vec3(0.5 + 0.5 * math.cos(i), 0.5 + 0.5 * math.cos(i + 2.1), 0.5 + 0.5 * math.cos(i + 4.2))
+        pointLights.add(glm.vec3((i % side - side / 2) * spacing, 1.0, (i // side - side / 2) * spacing),
+                        glm.vec3(0.0), hue, glm.vec3(0.3),
+                        constant=1.0, linear=0.35, quadratic=0.44)
+    pointLights.upload()
+
+def build_scene(size) -> list:
+    objects = []
+    floor = trabalho3.LoadObject(*CUBE)
+    floor.scale(size, 0.5, size)
+    floor.move(y=-0.25)
+    objects.append(floor)
+
+    side = 12
+    for i in range(side * side):
+        box = trabalho3.LoadObject(*CUBE)
+        box.scale(2, 2 + i % 3, 2)
+        box.move(x=(i % side - side / 2 + 0.5) * size / side, y=1.0, z=(i // side - side / 2 + 0.5) * size / side)
+        objects.append(box)
+    return objects
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lights", type=int, default=256, help="number of point lights")
+    parser.add_argument("--spacing", type=float, default=12.0, help="distance between neighbouring lights")
+    parser.add_argument("--frames", type=int, default=5, help="frames averaged per mode")
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 600), metavar=("W", "H"))
+    parser.add_argument("--check", action="store_true", help="fail when the images differ by more than --tolerance")
+    parser.add_argument("--tolerance", type=int, default=2, help="largest allowed difference per channel (0-255)")
+    parser.add_argument("--save", nargs=2, metavar=("BRUTE", "CLUSTERED"), help="write both images")
+    args = parser.parse_args()
+
+    context = offscreen.OffscreenContext(*args.size)
+    glEnable(GL_DEPTH_TEST)
+
+    shader = Shader("6.multiple_lights.vs", "6.multiple_lights.fs")
+    pointLights = PointLightManager()
+    clusters = LightClusterGrid()
+    add_lights(pointLights, args.lights, args.spacing)
+
+    side = math.ceil(math.sqrt(args.lights)) * args.spacing
+    camera = Camera(glm.vec3(0.0, side * 0.35, side * 0.6), pitch=-30.0)
+    projection = glm.perspective(glm.radians(camera.Zoom), args.size[0] / args.size[1], NEAR, FAR)
+    view = camera.GetViewMatrix()
+
+    shader.use()
+    shader.setInt("material.diffuse", 0)
+    shader.setInt("material.specular", 1)
+    shader.setFloat("material.shininess", 32.0)
+    shader.setVec3("viewPos", camera.Position)
+    shader.setMat4("projection", projection)
+    shader.setMat4("view", view)
+    # the spot light is off, an unset one divides by zero in the attenuation
+    shader.setFloat("spotLight.constant", 1.0)
+    pointLights.bind(shader)
+    clusters.bind(shader)
+    clusters.update_projection(projection, NEAR, FAR)
+
+    objects = build_scene(side)
+    # one tracker for the whole run, as the scene keeps one: the uniform locations are asked once
+    state = GLState()
+
+    images = {}
+    print(f"renderer: {context.renderer()}, {pointLights.count} lights, {len(objects)} objects, "
+          f"{clusters.count()} clusters")
+    print(f"{'mode':<10} {'lights/fragment':>15} {'build ms':>9} {'frame ms':>9}")
+    for name, enabled in (("brute", False), ("clustered", True)):
+        clusters.enabled = enabled
+        build_times = []
+        frame_times = []
+        for frame in range(args.frames + 1):
+            start = time.perf_counter()
+            references = clusters.build(pointLights, view)
+            built = time.perf_counter()
+
+            glClearColor(0.1, 0.1, 0.1, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            shader.use()
+            state.reset()
+            for obj in objects:
+                obj.draw(shader, obj.model, state)
+            state.bind_vertex_array(0)
+            glFinish()
+            end = time.perf_counter()
+
+            # the first frame pays for shader compilation and buffer uploads
+            if frame > 0:
+                build_times.append(built - start)
+                frame_times.append(end - start)
+
+        per_fragment = references / clusters.count() if enabled else pointLights.count
+        print(f"{name:<10} {per_fragment:>15.1f} {sum(build_times) / args.frames * 1000:>9.2f} "
+              f"{sum(frame_times) / args.frames * 1000:>9.2f}")
+        images[name] = context.read_pixels()
+
+    difference = np.abs(images["brute"].astype(np.int16) - images["clustered"].astype(np.int16))
+    print(f"image difference: max {difference.max()}, mean {difference.mean():.4f}, "
+          f"{(difference.max(axis=2) > args.tolerance).mean() * 100:.3f}% pixels above {args.tolerance}")
+
+    if args.save:
+        for name, path in zip(("brute", "clustered"), args.save):
+            Image.fromarray(images[name]).save(path)
+
+    for obj in objects:
+        obj.delete()
+    clusters.delete()
+    pointLights.delete()
+    context.destroy()
+
+    if args.check and difference.max() > args.tolerance:
+        print("FAILED: clustered shading differs from brute force")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
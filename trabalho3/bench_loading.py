@@ -0,0 +1,102 @@
+"""
+Wall-clock startup of the trabalho3 scene (trabalho3.Scene(): shaders, lights and every
+mesh and texture) with the assets decoded on 1, 2, 4 and one-per-CPU workers, rendered
+offscreen (Mesa llvmpipe works). Each configuration is timed --repeat times after one
+untimed warm-up load, and the best run is reported next to how long the decodes and
+the uploads on the GL thread took in total.
+
+    python ./bench_loading.py [--workers 1 2 4 8] [--processes] [--cold] [--repeat 3]
+    python ./bench_loading.py --stream [--budget 4] [--workers 1 2 4 8]
+
+--cold clears the mesh cache before every load, so the OBJ files are parsed again.
+--stream times trabalho3.Scene(stream=True) instead: how long until the first frame,
+how long until every asset is on the GPU while rendering with --budget ms of uploads per
+frame, and the slowest of those frames.
+"""
+import offscreen
+
+from OpenGL.GL import *
+
+import argparse, os, time
+
+import trabalho3
+from engine import mesh_cache
+
+def load(workers: int, processes: bool, cold: bool) -> tuple:
+    if cold:
+        mesh_cache.clear_cache()
+
+    start = time.perf_counter()
+    scene = trabalho3.Scene(loadWorkers=workers, loadProcesses=processes)
+    glFinish()
+    elapsed = time.perf_counter() - start
+
+    stats = scene.loadStats
+    scene.delete()
+    return elapsed, stats
+
+def stream(workers: int, processes: bool, cold: bool, budget: float) -> tuple:
+    if cold:
+        mesh_cache.clear_cache()
+
+    start = time.perf_counter()
+    scene = trabalho3.Scene(loadWorkers=workers, loadProcesses=processes, stream=True)
+    scene.render(trabalho3.camera, 1.0)
+    glFinish()
+    firstFrame = time.perf_counter() - start
+
+    frames, slowest = 0, 0.0
+    loaded = False
+    while not loaded:
+        frameStart = time.perf_counter()
+        loaded = scene.streamAssets(budget)
+        scene.render(trabalho3.camera, 1.0)
+        glFinish()
+        frames += 1
+        slowest = max(slowest, time.perf_counter() - frameStart)
+    elapsed = time.perf_counter() - start
+
+    scene.delete()
+    return firstFrame, elapsed, frames, slowest
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count()}))
+    parser.add_argument("--processes", action="store_true", help="decode in worker processes instead of threads")
+    parser.add_argument("--cold", action="store_true", help="clear the mesh cache before every load")
+    parser.add_argument("--repeat", type=int, default=3, help="timed loads per configuration (best one is reported)")
+    parser.add_argument("--stream", action="store_true", help="time the streaming startup instead")
+    parser.add_argument("--budget", type=float, default=trabalho3.UPLOAD_BUDGET_MS, help="upload ms per frame with --stream")
+    args = parser.parse_args()
+
+    context = offscreen.OffscreenContext(64, 64)
+    glEnable(GL_DEPTH_TEST)
+
+    # the first load warms the OS file cache (and the mesh cache, unless --cold)
+    load(1, False, args.cold)
+
+    print(f"renderer: {context.renderer()}, {os.cpu_count()} CPUs, "
+          f"{'processes' if args.processes else 'threads'}, mesh cache {'cold' if args.cold else 'warm'}")
+    if args.stream:
+        print(f"{'workers':>7} {'first frame s':>14} {'loaded s':>9} {'frames':>7} {'max frame ms':>13}")
+        for workers in args.workers:
+            runs = [stream(workers, args.processes, args.cold, args.budget / 1000) for _ in range(args.repeat)]
+            firstFrame, elapsed, frames, slowest = min(runs, key=lambda run: run[1])
+            print(f"{workers:>7} {firstFrame:>14.3f} {elapsed:>9.3f} {frames:>7} {slowest * 1000:>13.1f}")
+        context.destroy()
+        return 0
+
+    print(f"{'workers':>7} {'startup s':>10} {'assets s':>9} {'decode s':>9} {'upload s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        runs = [load(workers, args.processes, args.cold) for _ in range(args.repeat)]
+        elapsed, stats = min(runs, key=lambda run: run[0])
+        baseline = baseline or elapsed
+        print(f"{workers:>7} {elapsed:>10.3f} {stats['wall']:>9.3f} {stats['decode']:>9.3f} "
+              f"{stats['upload']:>9.3f} {baseline / elapsed:>7.2f}x")
+
+    context.destroy()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
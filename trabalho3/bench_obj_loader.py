@@ -0,0 +1,88 @@
+"""
+Compares the original line-by-line OBJ parser with the vectorized one in
+obj_loader.py on the OBJ files shipped in ./objects.
+
+    python ./bench_obj_loader.py [--repeat N]
+"""
+import argparse, glob, time, tracemalloc
+
+import glm
+import numpy as np
+
+from obj_loader import load_obj_model
+
+# the loader trabalho3.py used before obj_loader.py, kept as the reference implementation
+# ---------------------------------------------------------------------------------------
+def legacy_load_obj_model(filepath):
+    positions = []
+    texcoords = []
+    normals = []
+    vertices = []
+
+    def parse_vertex(v_str):
+        vals = v_str.split('/')
+        v_idx = int(vals[0]) - 1
+        vt_idx = int(vals[1]) - 1 if len(vals) > 1 and vals[1] else 0
+        vn_idx = int(vals[2]) - 1 if len(vals) > 2 and vals[2] else 0
+        return v_idx, vt_idx, vn_idx
+
+    with open(filepath, "r") as f:
+        for line in f:
+            if line.startswith("v "):
+                parts = line.strip().split()[1:]
+                positions.append([float(p) for p in parts])
+            elif line.startswith("vt "):
+                parts = line.strip().split()[1:]
+                texcoords.append([float(p) for p in parts])
+            elif line.startswith("vn "):
+                parts = line.strip().split()[1:]
+                normals.append([float(p) for p in parts])
+            elif line.startswith("f "):
+                face = line.strip().split()[1:]
+                face_indices = [parse_vertex(v) for v in face]
+
+                for i in range(1, len(face_indices) - 1):
+                    tri = [face_indices[0], face_indices[i], face_indices[i + 1]]
+                    for v_idx, vt_idx, vn_idx in tri:
+                        pos = positions[v_idx]
+                        tex = texcoords[vt_idx] if texcoords else [0.0, 0.0]
+                        norm = normals[vn_idx] if normals else [0.0, 0.0, 0.0]
+                        vertices.extend(pos + norm + tex)
+
+    return glm.array(glm.float32, *vertices)
+
+def measure(loader, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = loader(path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    loader(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, best, peak
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per file (best one is reported)")
+    args = parser.parse_args()
+
+    print(f"{'file':<45} {'floats':>10} {'legacy s':>9} {'numpy s':>9} {'speedup':>8} {'legacy MB':>10} {'numpy MB':>9}")
+    for path in sorted(glob.glob("./objects/*/*.obj")):
+        old, old_time, old_peak = measure(legacy_load_obj_model, path, args.repeat)
+        new, new_time, new_peak = measure(load_obj_model, path, args.repeat)
+
+        old = np.array(old, dtype=np.float32)
+        if old.shape != new.shape or not np.allclose(old, new):
+            print(f"{path}: vertex buffers differ")
+            return 1
+
+        print(f"{path:<45} {len(new):>10} {old_time:>9.3f} {new_time:>9.3f} {old_time / new_time:>7.1f}x "
+              f"{old_peak / 2**20:>10.1f} {new_peak / 2**20:>9.1f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
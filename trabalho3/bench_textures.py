@@ -0,0 +1,98 @@
+"""
+Load time and memory of textures uploaded three ways, rendered offscreen (Mesa llvmpipe
+works): decoded with PIL and mipmapped with glGenerateMipmap (the loader before the
+texture cache), read from a baked texture_cache entry, and read from a block compressed
+one. Each way is timed --repeat times with a warm cache and the best run is reported.
+
+    python ./bench_textures.py [image ...] [--repeat 3]
+
+The default images are the 4k sconce maps and the 4k temple maps of trabalho2.
+"""
+import offscreen
+
+from OpenGL.GL import *
+
+import argparse, glob, os, time
+
+from PIL import Image
+
+import trabalho3
+from engine import texture_cache
+
+DEFAULT_IMAGES = sorted(glob.glob("./objects/Wall_Sconce/Textures/*_4k.png") +
+                        glob.glob("../trabalho2/objects/temple/Textures/*.png"))
+
+# the PIL path trabalho3 used before the texture cache: decode, flip, upload level 0, glGenerateMipmap
+# ---------------------------------------------------------------------------------------------------
+def load_pil(path: str) -> tuple:
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        img = img.transpose(Image.FLIP_TOP_BOTTOM)
+        components, pixels = len(img.getbands()), img.tobytes()
+    decoded = time.perf_counter()
+
+    format = GL_RED if components == 1 else GL_RGB if components == 3 else GL_RGBA
+    textureID = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, format, img.width, img.height, 0, format, GL_UNSIGNED_BYTE, pixels)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    glGenerateMipmap(GL_TEXTURE_2D)
+    glFinish()
+    return textureID, decoded - start, time.perf_counter() - decoded, 0
+
+def load_baked(path: str, compress: bool) -> tuple:
+    start = time.perf_counter()
+    texture = texture_cache.load_texture(path, compress=compress)
+    decoded = time.perf_counter()
+
+    textureID = trabalho3.uploadTexture(path, texture)
+    glFinish()
+    disk = os.path.getsize(texture_cache.cache_path(texture_cache.cache_key(path, False, compress)))
+    return textureID, decoded - start, time.perf_counter() - decoded, disk
+
+def measure(load, repeat: int) -> tuple:
+    runs = []
+    for _ in range(repeat):
+        textureID, decode, upload, disk = load()
+        runs.append((decode + upload, decode, upload, trabalho3.textureMemory(textureID), disk))
+        trabalho3.deleteTexture(textureID)
+    return min(runs)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=DEFAULT_IMAGES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed loads per image and way (best one is reported)")
+    args = parser.parse_args()
+
+    context = offscreen.OffscreenContext(64, 64)
+    print(f"renderer: {context.renderer()}")
+
+    ways = [("PIL + glGenerateMipmap", load_pil),
+            ("baked", lambda path: load_baked(path, False)),
+            ("baked BC", lambda path: load_baked(path, True))]
+
+    for path in args.images:
+        # bakes the cache entries (untimed), so every way below reads a warm cache
+        for compress in (False, True):
+            start = time.perf_counter()
+            texture = texture_cache.load_texture(path, compress=compress)
+            if texture is None:
+                break
+            print(f"{path}: {texture.layout} {texture.width}x{texture.height}, "
+                  f"ready in {time.perf_counter() - start:.2f} s")
+        if texture is None:
+            print(f"{path}: not an image")
+            continue
+
+        print(f"  {'':<24} {'total ms':>9} {'decode ms':>10} {'upload ms':>10} {'GPU MB':>7} {'disk MB':>8}")
+        for name, load in ways:
+            total, decode, upload, memory, disk = measure(lambda: load(path), args.repeat)
+            print(f"  {name:<24} {total * 1000:>9.1f} {decode * 1000:>10.1f} {upload * 1000:>10.1f} "
+                  f"{memory / 2**20:>7.1f} {disk / 2**20:>8.1f}")
+
+    context.destroy()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
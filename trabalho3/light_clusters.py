@@ -0,0 +1,203 @@
+from OpenGL.GL import *
+
+import glm
+import numpy as np
+
+import light_manager
+
+# tiles across x, tiles across y and depth slices the view frustum is split into
+CLUSTER_GRID = (16, 9, 24)
+
+# uniform buffer binding point of the "ClusterParams" block in 6.multiple_lights.fs
+CLUSTER_PARAMS_BINDING = 1
+
+# texture units of the two buffer textures read by the fragment shader
+# (0 and 1 hold the material's diffuse and specular maps)
+CLUSTER_LIGHTS_UNIT = 2
+LIGHT_INDICES_UNIT = 3
+
+# a light is left out of a cluster once it cannot add more than this to a colour channel there
+ATTENUATION_CUTOFF = 1.0 / 512.0
+
+# distance at which each light's contribution falls below cutoff, solving
+# intensity / (constant + linear * d + quadratic * d^2) = cutoff for d, where intensity is the
+# largest sum of ambient + diffuse + specular over the colour channels (textures and the
+# diffuse/specular terms are all at most 1)
+# ----------------------------------------------------------------------------------------------
+def light_radii(lights: np.ndarray, cutoff: float = ATTENUATION_CUTOFF) -> np.ndarray:
+    intensity = (lights[:, light_manager.AMBIENT] + lights[:, light_manager.DIFFUSE] + lights[:, light_manager.SPECULAR]).max(axis=1)
+    constant = lights[:, light_manager.CONSTANT].astype(np.float64)
+    linear = lights[:, light_manager.LINEAR].astype(np.float64)
+    quadratic = lights[:, light_manager.QUADRATIC].astype(np.float64)
+
+    rest = constant - intensity / cutoff
+    with np.errstate(divide="ignore", invalid="ignore"):
+        radii = np.where(quadratic > 0,
+                         (-linear + np.sqrt(np.maximum(linear * linear - 4 * quadratic * rest, 0))) / (2 * quadratic),
+                         np.where(linear > 0, -rest / linear, np.inf))
+    return np.maximum(radii, 0)
+
+# view space bounding boxes of every cluster, shaped (slices, tiles y * tiles x, 3) for the min
+# and max corners. slices are spaced exponentially between near and far, the same way the
+# fragment shader derives its slice from the depth buffer.
+# --------------------------------------------------------------------------------------------
+def cluster_bounds(projection: glm.mat4, near: float, far: float, grid: tuple = CLUSTER_GRID) -> tuple:
+    tilesX, tilesY, slices = grid
+    inverse = np.array(glm.inverse(projection), dtype=np.float64)
+
+    # direction through every tile corner, scaled so that its depth (-z) is 1
+    x, y = np.meshgrid(np.linspace(-1, 1, tilesX + 1), np.linspace(-1, 1, tilesY + 1))
+    corners = np.stack([x, y, -np.ones_like(x), np.ones_like(x)], axis=-1) @ inverse.T
+    rays = corners[..., :3] / -corners[..., 2:3]
+
+    # the 4 corner rays of each tile, (tiles y * tiles x, 4, 3)
+    tileRays = np.stack([rays[:-1, :-1], rays[:-1, 1:], rays[1:, :-1], rays[1:, 1:]], axis=2).reshape(-1, 4, 3)
+
+    depths = near * (far / near) ** (np.arange(slices + 1) / slices)
+    # (slices, tiles, 8, 3): the corners at the near and far depth of each slice
+    points = np.concatenate([tileRays[None] * depths[:-1, None, None, None],
+                             tileRays[None] * depths[1:, None, None, None]], axis=2)
+    return points.min(axis=2), points.max(axis=2)
+
+# CPU side clustered light culling: every frame build() sorts the point lights of a
+# light_manager.PointLightManager into the clusters their range overlaps, and uploads
+#   - a (offset, count) pair per cluster   -> usamplerBuffer clusterLights
+#   - the light indices of all clusters    -> usamplerBuffer clusterLightIndices
+# so each fragment only shades the lights listed for its own cluster.
+class LightClusterGrid:
+    def __init__(self, grid: tuple = CLUSTER_GRID, cutoff: float = ATTENUATION_CUTOFF, binding: int = CLUSTER_PARAMS_BINDING):
+        self.grid = tuple(grid)
+        self.cutoff = cutoff
+        self.binding = binding
+        self.enabled = True
+        self.bounds = None
+        self.projectionKey = None
+        self.params = None
+        self.lightReferences = 0
+
+        self.clusterBuffer, self.indexBuffer, self.paramsUBO = glGenBuffers(3)
+        self.clusterTexture, self.indexTexture = glGenTextures(2)
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.paramsUBO)
+        glBufferData(GL_UNIFORM_BUFFER, 48, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.paramsUBO)
+
+        # start out with every cluster empty
+        self.upload(np.zeros((self.count(), 2), dtype=np.uint32), np.zeros(1, dtype=np.uint32))
+
+    def count(self) -> int:
+        return self.grid[0] * self.grid[1] * self.grid[2]
+
+    # connects the sampler uniforms and the "ClusterParams" block of a shader to this grid
+    # ------------------------------------------------------------------------------------
+    def bind(self, shader) -> None:
+        shader.use()
+        shader.setInt("clusterLights", CLUSTER_LIGHTS_UNIT)
+        shader.setInt("clusterLightIndices", LIGHT_INDICES_UNIT)
+        blockIndex = glGetUniformBlockIndex(shader.ID, "ClusterParams")
+        if blockIndex != GL_INVALID_INDEX:
+            glUniformBlockBinding(shader.ID, blockIndex, self.binding)
+
+    # recomputes the cluster bounding boxes, only when the projection actually changed
+    # --------------------------------------------------------------------------------
+    def update_projection(self, projection: glm.mat4, near: float, far: float) -> None:
+        key = (tuple(glm.value_ptr(projection)[i] for i in range(16)), near, far)
+        if key == self.projectionKey:
+            return
+
+        self.bounds = cluster_bounds(projection, near, far, self.grid)
+        self.near = near
+        self.far = far
+        self.projectionKey = key
+
+    # assigns the point lights to clusters for the current camera, returns the number of (cluster, light) pairs
+    # ----------------------------------------------------------------------------------------------------------
+    def build(self, pointLights, view: glm.mat4) -> int:
+        self.update_params()
+        if not self.enabled or self.bounds is None:
+            return 0
+
+        lights = pointLights.lights[:pointLights.count]
+        radii = light_radii(lights, self.cutoff)
+
+        # light positions in view space, the camera looks down -z
+        viewMatrix = np.array(view, dtype=np.float64)
+        centers = lights[:, light_manager.POSITION] @ viewMatrix[:3, :3].T + viewMatrix[:3, 3]
+        depths = -centers[:, 2]
+
+        tiles = self.grid[0] * self.grid[1]
+        slices = self.grid[2]
+        sliceDepths = self.near * (self.far / self.near) ** (np.arange(slices + 1) / slices)
+
+        clusterIds = []
+        lightIds = []
+        for s in range(slices):
+            # only the lights whose sphere reaches this slice's depth range are tested against its tiles
+            candidates = np.nonzero((depths + radii >= sliceDepths[s]) & (depths - radii <= sliceDepths[s + 1]))[0]
+            if len(candidates) == 0:
+                continue
+
+            low, high = self.bounds[0][s], self.bounds[1][s]
+            c = centers[candidates]
+            # squared distance from each light center to each tile's box, (tiles, candidates)
+            gap = np.maximum(np.maximum(low[:, None, :] - c[None], c[None] - high[:, None, :]), 0)
+            inside = (gap * gap).sum(axis=2) <= (radii[candidates] ** 2)[None]
+
+            tile, light = np.nonzero(inside)
+            clusterIds.append(s * tiles + tile)
+            lightIds.append(candidates[light])
+
+        if clusterIds:
+            clusterIds = np.concatenate(clusterIds)
+            indices = np.concatenate(lightIds).astype(np.uint32)
+        else:
+            clusterIds = np.zeros(0, dtype=np.int64)
+            indices = np.zeros(0, dtype=np.uint32)
+
+        counts = np.bincount(clusterIds, minlength=self.count()).astype(np.uint32)
+        clusters = np.empty((self.count(), 2), dtype=np.uint32)
+        clusters[:, 1] = counts
+        clusters[:, 0] = np.cumsum(counts) - counts
+
+        self.upload(clusters, indices if len(indices) else np.zeros(1, dtype=np.uint32))
+        self.lightReferences = len(clusterIds)
+        return self.lightReferences
+
+    # re-specifies both buffer textures and binds them to their texture units
+    # ------------------------------------------------------------------------
+    def upload(self, clusters: np.ndarray, indices: np.ndarray) -> None:
+        for buffer, texture, unit, internalFormat, data in (
+                (self.clusterBuffer, self.clusterTexture, CLUSTER_LIGHTS_UNIT, GL_RG32UI, clusters),
+                (self.indexBuffer, self.indexTexture, LIGHT_INDICES_UNIT, GL_R32UI, indices)):
+            glBindBuffer(GL_TEXTURE_BUFFER, buffer)
+            glBufferData(GL_TEXTURE_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+            glActiveTexture(GL_TEXTURE0 + unit)
+            glBindTexture(GL_TEXTURE_BUFFER, texture)
+            glTexBuffer(GL_TEXTURE_BUFFER, internalFormat, buffer)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+        glActiveTexture(GL_TEXTURE0)
+
+    # std140 "ClusterParams": ivec4 (tiles x, tiles y, slices, enabled), vec4 (near, far, slices / log(far / near), 0),
+    # vec4 (viewport width, height, 0, 0); uploaded only when one of them changes
+    # ----------------------------------------------------------------------------------------------------------------
+    def update_params(self) -> None:
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        near, far = (self.near, self.far) if self.bounds is not None else (0.1, 100.0)
+
+        params = np.zeros(12, dtype=np.float32)
+        params[0:4].view(np.int32)[:] = (*self.grid, int(self.enabled and self.bounds is not None))
+        params[4:7] = (near, far, self.grid[2] / np.log(far / near))
+        params[8:10] = (viewport[2], viewport[3])
+
+        if self.params is not None and np.array_equal(params.view(np.int32), self.params.view(np.int32)):
+            return
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.paramsUBO)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, params.nbytes, params)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.params = params
+
+    def delete(self) -> None:
+        glDeleteTextures(2, (self.clusterTexture, self.indexTexture))
+        glDeleteBuffers(3, (self.clusterBuffer, self.indexBuffer, self.paramsUBO))
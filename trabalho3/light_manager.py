@@ -0,0 +1,132 @@
+from OpenGL.GL import *
+
+import glm
+import numpy as np
+
+# uniform buffer binding point of the "PointLights" block in 6.multiple_lights.fs
+POINT_LIGHTS_BINDING = 0
+
+# must match MAX_POINT_LIGHTS in 6.multiple_lights.fs (512 * 64 bytes = 32 KB, desktop drivers allow at least 64 KB per block)
+MAX_POINT_LIGHTS = 512
+
+# std140 layout of the block: int pointLightCount padded to 16 bytes, then one 64 byte
+# PointLight per light, packed as 16 floats:
+#   position.xyz constant | ambient.rgb linear | diffuse.rgb quadratic | specular.rgb (padding)
+HEADER_SIZE = 16
+LIGHT_FLOATS = 16
+LIGHT_SIZE = LIGHT_FLOATS * 4
+
+POSITION = slice(0, 3)
+AMBIENT = slice(4, 7)
+DIFFUSE = slice(8, 11)
+SPECULAR = slice(12, 15)
+CONSTANT, LINEAR, QUADRATIC = 3, 7, 11
+
+# point lights kept in a std140 uniform buffer shared by every shader that binds it.
+# changes only mark the touched lights as dirty; upload() then sends each run of
+# consecutive dirty lights with one glBufferSubData, so a frame where a single light
+# moves uploads 64 bytes instead of re-setting 7 uniforms per light in every shader.
+class PointLightManager:
+    def __init__(self, capacity: int = MAX_POINT_LIGHTS, binding: int = POINT_LIGHTS_BINDING):
+        self.capacity = capacity
+        self.binding = binding
+        self.lights = np.zeros((capacity, LIGHT_FLOATS), dtype=np.float32)
+        self.count = 0
+        self.colors = None
+        self.dirty = set()
+        self.count_dirty = True
+
+        if HEADER_SIZE + self.lights.nbytes > glGetIntegerv(GL_MAX_UNIFORM_BLOCK_SIZE):
+            raise RuntimeError(f"ERROR::LIGHTS::UNIFORM_BLOCK_TOO_LARGE ({capacity} lights)")
+
+        self.UBO = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.UBO)
+        glBufferData(GL_UNIFORM_BUFFER, HEADER_SIZE + self.lights.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.UBO)
+
+    # connects the "PointLights" block of a shader to this buffer
+    # -----------------------------------------------------------
+    def bind(self, shader) -> None:
+        blockIndex = glGetUniformBlockIndex(shader.ID, "PointLights")
+        if blockIndex != GL_INVALID_INDEX:
+            glUniformBlockBinding(shader.ID, blockIndex, self.binding)
+
+    # appends a light and returns its index
+    # -------------------------------------
+    def add(self, position: glm.vec3, ambient: glm.vec3, diffuse: glm.vec3, specular: glm.vec3,
+            constant: float = 1.0, linear: float = 0.09, quadratic: float = 0.032) -> int:
+        if self.count == self.capacity:
+            raise ValueError(f"ERROR::LIGHTS::TOO_MANY_POINT_LIGHTS (max {self.capacity})")
+
+        index = self.count
+        light = self.lights[index]
+        light[POSITION] = position
+        light[AMBIENT] = ambient
+        light[DIFFUSE] = diffuse
+        light[SPECULAR] = specular
+        light[CONSTANT] = constant
+        light[LINEAR] = linear
+        light[QUADRATIC] = quadratic
+
+        self.count += 1
+        self.count_dirty = True
+        self.dirty.add(index)
+        return index
+
+    def set_position(self, index: int, position: glm.vec3) -> None:
+        light = self.lights[index]
+        if tuple(light[POSITION]) != tuple(glm.vec3(position)):
+            light[POSITION] = position
+            self.dirty.add(index)
+
+    # gives every light the same colours; only marks the buffer dirty when they actually changed
+    # ------------------------------------------------------------------------------------------
+    def set_colors(self, ambient: glm.vec3, diffuse: glm.vec3, specular: glm.vec3) -> None:
+        colors = (tuple(ambient), tuple(diffuse), tuple(specular))
+        if colors == self.colors:
+            return
+
+        self.colors = colors
+        self.lights[:self.count, AMBIENT] = colors[0]
+        self.lights[:self.count, DIFFUSE] = colors[1]
+        self.lights[:self.count, SPECULAR] = colors[2]
+        self.dirty.update(range(self.count))
+
+    # sends the dirty lights to the GPU, returns the number of bytes uploaded
+    # -----------------------------------------------------------------------
+    def upload(self) -> int:
+        if not self.dirty and not self.count_dirty:
+            return 0
+
+        uploaded = 0
+        glBindBuffer(GL_UNIFORM_BUFFER, self.UBO)
+
+        if self.count_dirty:
+            header = np.array([self.count, 0, 0, 0], dtype=np.int32)
+            glBufferSubData(GL_UNIFORM_BUFFER, 0, header.nbytes, header)
+            uploaded += header.nbytes
+            self.count_dirty = False
+
+        for first, last in dirty_ranges(self.dirty):
+            data = self.lights[first:last]
+            glBufferSubData(GL_UNIFORM_BUFFER, HEADER_SIZE + first * LIGHT_SIZE, data.nbytes, data)
+            uploaded += data.nbytes
+        self.dirty.clear()
+
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        return uploaded
+
+    def delete(self) -> None:
+        glDeleteBuffers(1, (self.UBO,))
+
+# merges a set of indices into sorted [first, last) runs of consecutive indices
+# ------------------------------------------------------------------------------
+def dirty_ranges(indices) -> list:
+    ranges = []
+    for index in sorted(indices):
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+    return [tuple(r) for r in ranges]
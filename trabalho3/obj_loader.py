@@ -0,0 +1,153 @@
+import numpy as np
+
+# number of floats per interleaved vertex: position (3) + normal (3) + texture coords (2)
+VERTEX_STRIDE = 8
+
+# bump whenever the buffers produced by load_indexed_obj_model change, so mesh_cache.py drops old entries
+LOADER_VERSION = 2
+
+# reads a block of "v"/"vt"/"vn" records into a (count, width) float32 array
+# --------------------------------------------------------------------------
+def _parse_records(lines: list, width: int) -> np.ndarray:
+    if not lines:
+        return np.zeros((0, width), dtype=np.float32)
+
+    values = np.fromstring(b" ".join(lines), dtype=np.float32, sep=" ")
+
+    # every exporter we use writes a fixed number of components per record
+    # ("vt u v" or "vt u v w"), so the whole block can be reshaped at once
+    for components in (width, width + 1, width + 3):
+        if len(values) == len(lines) * components:
+            return np.ascontiguousarray(values.reshape(len(lines), components)[:, :width])
+
+    # mixed record widths: fall back to splitting line by line
+    rows = [(line.split() + [b"0"] * width)[:width] for line in lines]
+    return np.array(rows).astype(np.float32)
+
+# splits the "v/vt/vn" corners of every face into three index columns
+# -------------------------------------------------------------------
+def _parse_corners(lines: list, count: int) -> np.ndarray:
+    sample = lines[0].split()[0]
+    joined = b" ".join(lines)
+    if b"//" in sample:
+        joined = joined.replace(b"//", b" ")
+        columns = [0, 2]
+    else:
+        columns = [0, 1, 2][:sample.count(b"/") + 1]
+        joined = joined.replace(b"/", b" ")
+
+    indices = np.zeros((count, 3), dtype=np.int64)
+    values = np.fromstring(joined, dtype=np.int64, sep=" ")
+
+    if len(values) == count * len(columns):
+        indices[:, columns] = values.reshape(count, len(columns))
+        return indices
+
+    # corners written in different formats inside the same file
+    corners = b" ".join(lines).split()
+    for i, corner in enumerate(corners):
+        for j, value in enumerate(corner.split(b"/")[:3]):
+            if value:
+                indices[i, j] = int(value)
+    return indices
+
+# converts 1-based (or negative, relative) OBJ indices into 0-based array indices
+# -------------------------------------------------------------------------------
+def _resolve_indices(indices: np.ndarray, count: int) -> np.ndarray:
+    # missing indices are stored as 0 and, like the original loader, fall back to the first element
+    return np.where(indices < 0, indices + count, np.maximum(indices - 1, 0))
+
+# triangulates every face with a fan (0, i, i+1) and returns the corner numbers of each triangle
+# ---------------------------------------------------------------------------------------------
+def triangulate_faces(face_sizes: np.ndarray) -> np.ndarray:
+    face_sizes = np.asarray(face_sizes, dtype=np.int64)
+    face_starts = np.cumsum(face_sizes) - face_sizes
+    tri_counts = np.maximum(face_sizes - 2, 0)
+
+    tri_face = np.repeat(np.arange(len(face_sizes)), tri_counts)
+    tri_first = np.cumsum(tri_counts) - tri_counts
+    fan_step = np.arange(len(tri_face)) - tri_first[tri_face] + 1
+
+    first = face_starts[tri_face]
+    return np.stack((first, first + fan_step, first + fan_step + 1), axis=1)
+
+# reads the whole OBJ file at once and returns its attribute tables plus one
+# (position, texcoord, normal) index triple per triangle corner
+# ---------------------------------------------------------------------------
+def parse_obj(filepath: str) -> dict:
+    with open(filepath, "rb") as f:
+        lines = f.read().splitlines()
+
+    v_lines = [line[2:] for line in lines if line[:2] == b"v "]
+    vt_lines = [line[3:] for line in lines if line[:3] == b"vt "]
+    vn_lines = [line[3:] for line in lines if line[:3] == b"vn "]
+    f_lines = [line[2:] for line in lines if line[:2] == b"f "]
+
+    positions = _parse_records(v_lines, 3)
+    texcoords = _parse_records(vt_lines, 2)
+    normals = _parse_records(vn_lines, 3)
+
+    face_sizes = np.fromiter((len(line.split()) for line in f_lines), dtype=np.int64, count=len(f_lines))
+    if len(f_lines):
+        indices = _parse_corners(f_lines, int(face_sizes.sum()))
+    else:
+        indices = np.zeros((0, 3), dtype=np.int64)
+
+    indices[:, 0] = _resolve_indices(indices[:, 0], len(positions))
+    indices[:, 1] = _resolve_indices(indices[:, 1], len(texcoords))
+    indices[:, 2] = _resolve_indices(indices[:, 2], len(normals))
+
+    triangles = triangulate_faces(face_sizes)
+
+    return {
+        "positions": positions,
+        "texcoords": texcoords,
+        "normals": normals,
+        "corners": indices[triangles.reshape(-1)],
+    }
+
+# collapses the triangle corners that share the same attribute indices into one vertex each.
+# corners is a (count, columns) array of non-negative indices (one column per attribute);
+# returns the corner each unique vertex is built from, numbered in order of first use, and
+# the index buffer: one uint16 vertex number per corner, uint32 past 65536 vertices
+# ------------------------------------------------------------------------------------------
+def index_corners(corners: np.ndarray) -> tuple:
+    if len(corners) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16)
+
+    keys = np.ravel_multi_index(tuple(corners.T), tuple(corners.max(axis=0) + 1))
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # np.unique numbers the vertices in key order; renumber them in the order the triangles use them
+    order = np.argsort(first)
+    number = np.empty(len(order), dtype=np.int64)
+    number[order] = np.arange(len(order))
+
+    index_type = np.uint16 if len(order) <= 65536 else np.uint32
+    return first[order], number[inverse.reshape(-1)].astype(index_type)
+
+# interleaves position (3) + normal (3) + texture coords (2) for every corner in corners
+# --------------------------------------------------------------------------------------
+def _build_vertices(mesh: dict, corners: np.ndarray) -> np.ndarray:
+    vertices = np.zeros((len(corners), VERTEX_STRIDE), dtype=np.float32)
+    vertices[:, 0:3] = mesh["positions"][corners[:, 0]]
+    if len(mesh["normals"]):
+        vertices[:, 3:6] = mesh["normals"][corners[:, 2]]
+    if len(mesh["texcoords"]):
+        vertices[:, 6:8] = mesh["texcoords"][corners[:, 1]]
+    return vertices.reshape(-1)
+
+# loads an OBJ file into a flat, contiguous float32 buffer laid out as
+# position (3) + normal (3) + texture coords (2) per triangle corner
+# -------------------------------------------------------------------
+def load_obj_model(filepath: str) -> np.ndarray:
+    mesh = parse_obj(filepath)
+    return _build_vertices(mesh, mesh["corners"])
+
+# loads an OBJ file for glDrawElements: one interleaved vertex (laid out like in load_obj_model)
+# per unique (v, vt, vn) triple, and the index of that vertex for every triangle corner
+# ---------------------------------------------------------------------------------------------
+def load_indexed_obj_model(filepath: str) -> tuple:
+    mesh = parse_obj(filepath)
+    first, indices = index_corners(mesh["corners"])
+    return _build_vertices(mesh, mesh["corners"][first]), indices
@@ -0,0 +1,139 @@
+"""
+Offscreen OpenGL 3.3 core context for running the renderer without a window
+(CI machines, software rendering through Mesa llvmpipe, benchmarks).
+
+The context is created through EGL with no surface and everything is drawn
+into a framebuffer object. PyOpenGL picks its platform on first import, so
+this module must be imported before anything imports OpenGL.GL:
+
+    import offscreen
+    context = offscreen.OffscreenContext(800, 600)
+    import trabalho3
+"""
+import os, ctypes, collections
+
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+from OpenGL import EGL
+from OpenGL.GL import *
+
+import numpy as np
+
+class OffscreenContext:
+    # compatibility=True asks for a compatibility profile instead, for code written against
+    # the fixed function era API (GLSL 1.10 shaders, drawing without a VAO)
+    def __init__(self, width: int, height: int, compatibility: bool = False):
+        self.width = width
+        self.height = height
+
+        # 1. EGL display and an OpenGL (not GLES) 3.3 context without any surface
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise RuntimeError("ERROR::OFFSCREEN::EGL_INITIALIZE_FAILED")
+
+        config_attribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                          EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                          EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        num_configs = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, config_attribs, ctypes.pointer(config), 1, ctypes.pointer(num_configs))
+        if num_configs.value == 0:
+            raise RuntimeError("ERROR::OFFSCREEN::NO_EGL_CONFIG")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+                                           EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                                           EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                                           EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT if compatibility else EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                                           EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("ERROR::OFFSCREEN::EGL_CONTEXT_CREATION_FAILED")
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+        # 2. framebuffer with a color and a depth attachment standing in for the window
+        self.FBO = glGenFramebuffers(1)
+        self.colorRBO, self.depthRBO = glGenRenderbuffers(2)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.colorRBO)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depthRBO)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, width, height)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.FBO)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.colorRBO)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.depthRBO)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("ERROR::OFFSCREEN::FRAMEBUFFER_INCOMPLETE")
+
+        glViewport(0, 0, width, height)
+
+    def renderer(self) -> str:
+        return glGetString(GL_RENDERER).decode()
+
+    # reads the current frame back as a (height, width, 3) uint8 image, top row first
+    # --------------------------------------------------------------------------------
+    def read_pixels(self) -> np.ndarray:
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.FBO)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+    def pixel_reader(self, buffers: int = 2) -> "PixelReader":
+        return PixelReader(self, buffers)
+
+    def destroy(self) -> None:
+        glDeleteFramebuffers(1, (self.FBO,))
+        glDeleteRenderbuffers(2, (self.colorRBO, self.depthRBO))
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+# asynchronous readback through a ring of pixel buffer objects. read() only queues the copy of the
+# current frame into the next PBO and hands back the frame queued buffers - 1 calls earlier, which
+# the GPU has finished by then, so rendering frame N overlaps with downloading frame N - 1.
+class PixelReader:
+    def __init__(self, context: OffscreenContext, buffers: int = 2):
+        self.context = context
+        self.size = context.width * context.height * 3
+        self.PBOs = list(glGenBuffers(buffers)) if buffers > 1 else [glGenBuffers(1)]
+        self.pending = collections.deque()
+        self.next = 0
+
+        for PBO in self.PBOs:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, PBO)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    # queues the current frame, returns an older (height, width, 3) frame or None while the ring fills up
+    # ---------------------------------------------------------------------------------------------------
+    def read(self):
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.context.FBO)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.PBOs[self.next])
+        glReadPixels(0, 0, self.context.width, self.context.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        self.pending.append(self.next)
+        self.next = (self.next + 1) % len(self.PBOs)
+        return self.collect() if len(self.pending) == len(self.PBOs) else None
+
+    # the frames still queued, oldest first
+    # -------------------------------------
+    def flush(self) -> list:
+        frames = []
+        while self.pending:
+            frames.append(self.collect())
+        return frames
+
+    def collect(self) -> np.ndarray:
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.PBOs[self.pending.popleft()])
+        address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.size, GL_MAP_READ_BIT)
+        data = np.ctypeslib.as_array((ctypes.c_ubyte * self.size).from_address(address)).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return data.reshape(self.context.height, self.context.width, 3)[::-1]
+
+    def delete(self) -> None:
+        glDeleteBuffers(len(self.PBOs), self.PBOs)
@@ -0,0 +1,312 @@
+from OpenGL.GL import *
+
+import collections, contextlib, ctypes, json, time
+
+import glm
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from shader_m import Shader
+
+# frames kept for the frame time percentiles, the histogram and the Chrome trace
+HISTORY_FRAMES = 600
+
+# frames the per scope averages of the overlay are taken over
+AVERAGE_FRAMES = 60
+
+# query objects per scope: frame n reuses the query of frame n - QUERY_BUFFERS, whose result is
+# long available by then, so reading it never waits for the GPU
+QUERY_BUFFERS = 2
+
+HISTOGRAM_BINS = 32
+
+# result of a GL_TIME_ELAPSED query in seconds (PyOpenGL has no numpy type for the 64 bit
+# output array, so it is read through a ctypes value)
+def query_seconds(query: int) -> float:
+    elapsed = ctypes.c_uint64(0)
+    glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+    return elapsed.value / 1e9
+
+# one named scope of a frame: CPU start and duration (perf_counter seconds) and its GPU time in
+# seconds, filled in once its query is read back (None until then, and for nested scopes)
+class ScopeTiming:
+    __slots__ = ("name", "depth", "start", "cpu", "gpu")
+
+    def __init__(self, name: str, depth: int, start: float):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.cpu = 0.0
+        self.gpu = None
+
+# named CPU scopes per frame, each also timed on the GPU with a GL_TIME_ELAPSED query. Only one
+# GL_TIME_ELAPSED query can be active at a time, so scopes nested inside another scope are timed
+# on the CPU only. Queries are double buffered per scope name: the result of frame n is read when
+# the scope runs again in frame n + QUERY_BUFFERS. Works with any GL 3.3 driver, llvmpipe included
+# (there the GPU time is the time the software rasterizer spent on the scope's commands).
+#
+#     profiler.begin_frame()
+#     with profiler.scope("input"): ...
+#     profiler.end_frame()
+class FrameProfiler:
+    def __init__(self, history: int = HISTORY_FRAMES, gpu: bool = True):
+        self.gpu = gpu
+        # (frame number, start, duration, [ScopeTiming]) of the last history frames
+        self.frames = collections.deque(maxlen=history)
+        self.frame = 0
+        self.frameStart = None
+        self.scopes = []
+        self.depth = 0
+        self.gpuActive = False
+        # scope name -> its QUERY_BUFFERS query ids, and query id -> the ScopeTiming it measures
+        self.queries = {}
+        self.pending = {}
+        self.origin = time.perf_counter()
+
+    def begin_frame(self) -> None:
+        self.frameStart = time.perf_counter()
+        self.scopes = []
+
+    def end_frame(self) -> None:
+        if self.frameStart is None:
+            return
+        self.frames.append((self.frame, self.frameStart, time.perf_counter() - self.frameStart, self.scopes))
+        self.frame += 1
+        self.frameStart = None
+        self.scopes = []
+
+    # times the block on the CPU and, when no other query is running, on the GPU
+    # ---------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def scope(self, name: str):
+        timing = ScopeTiming(name, self.depth, time.perf_counter())
+        self.scopes.append(timing)
+        query = self.begin_query(name, timing) if self.gpu and not self.gpuActive else None
+
+        self.depth += 1
+        try:
+            yield timing
+        finally:
+            self.depth -= 1
+            if query is not None:
+                glEndQuery(GL_TIME_ELAPSED)
+                self.gpuActive = False
+            timing.cpu = time.perf_counter() - timing.start
+
+    def begin_query(self, name: str, timing: ScopeTiming) -> int:
+        if name not in self.queries:
+            self.queries[name] = [int(query) for query in np.atleast_1d(glGenQueries(QUERY_BUFFERS))]
+        query = self.queries[name][self.frame % QUERY_BUFFERS]
+
+        previous = self.pending.pop(query, None)
+        if previous is not None:
+            if previous in self.scopes:
+                # the same name twice in one frame: its query is still in use
+                self.pending[query] = previous
+                return None
+            self.read_query(query, previous)
+
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self.gpuActive = True
+        self.pending[query] = timing
+        return query
+
+    # reads the query results that are already available, without waiting for the others
+    # ------------------------------------------------------------------------------------
+    def collect(self) -> None:
+        for query, timing in list(self.pending.items()):
+            if timing not in self.scopes and glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                self.read_query(query, timing)
+                del self.pending[query]
+
+    # a result longer than the time since the scope started cannot be right (llvmpipe returns one
+    # for the very first query of a context): it is dropped
+    def read_query(self, query: int, timing: ScopeTiming) -> None:
+        seconds = query_seconds(query)
+        timing.gpu = seconds if seconds <= time.perf_counter() - timing.start else None
+
+    # frame time statistics in milliseconds, over the kept frames
+    # -----------------------------------------------------------
+    def frame_times(self) -> np.ndarray:
+        return np.array([duration for _, _, duration, _ in self.frames]) * 1000
+
+    def percentiles(self, ranks=(50, 95, 99)) -> np.ndarray:
+        times = self.frame_times()
+        return np.percentile(times, ranks) if len(times) else np.zeros(len(ranks))
+
+    # (counts, bin edges) of the frame times, up to the 99th percentile so one hitch does not
+    # squeeze every other frame into the first bin; slower frames are counted in the last bin
+    def histogram(self, bins: int = HISTOGRAM_BINS) -> tuple:
+        times = self.frame_times()
+        if not len(times):
+            return np.zeros(bins, dtype=np.int64), np.zeros(bins + 1)
+        high = max(np.percentile(times, 99), times.min() + 1e-3)
+        return np.histogram(np.minimum(times, high), bins=bins, range=(times.min(), high))
+
+    # name -> (mean CPU ms, mean GPU ms or None) of every scope over the last frames, in the order
+    # the scopes first ran
+    # --------------------------------------------------------------------------------------------
+    def scope_averages(self, frames: int = AVERAGE_FRAMES) -> dict:
+        cpu, gpu = {}, {}
+        for _, _, _, scopes in list(self.frames)[-frames:]:
+            for timing in scopes:
+                cpu.setdefault(timing.name, []).append(timing.cpu)
+                if timing.gpu is not None:
+                    gpu.setdefault(timing.name, []).append(timing.gpu)
+        return {name: (np.mean(times) * 1000, np.mean(gpu[name]) * 1000 if name in gpu else None)
+                for name, times in cpu.items()}
+
+    # text lines of the percentiles and per scope averages (the overlay and render_headless.py print them)
+    # ----------------------------------------------------------------------------------------------------
+    def summary(self) -> list:
+        return [self.percentile_line()] + [f"{name:<16}{cpu:>8}{gpu:>8}" for name, cpu, gpu in self.scope_table()]
+
+    def percentile_line(self) -> str:
+        p50, p95, p99 = self.percentiles()
+        return f"frame ms  p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}  ({len(self.frames)} frames)"
+
+    # header and one (name, cpu ms, gpu ms) row of text per scope
+    def scope_table(self) -> list:
+        return [("scope", "cpu ms", "gpu ms")] + [
+            (name, f"{cpu:.2f}", "-" if gpu is None else f"{gpu:.2f}") for name, (cpu, gpu) in self.scope_averages().items()]
+
+    # Chrome trace (chrome://tracing, Perfetto) of the kept frames: the frames and their scopes on a
+    # "CPU" track and the GPU times on a "GPU" track. The queries only measure durations, so each GPU
+    # scope is drawn from when its CPU scope started, or right after the previous GPU scope
+    # ------------------------------------------------------------------------------------------------
+    def write_trace(self, path: str) -> int:
+        self.collect()
+        microseconds = lambda seconds: (seconds - self.origin) * 1e6
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "CPU"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 2, "args": {"name": "GPU"}},
+        ]
+        for frame, start, duration, scopes in self.frames:
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": microseconds(start), "dur": duration * 1e6, "args": {"frame": frame}})
+            gpuEnd = start
+            for timing in scopes:
+                events.append({"name": timing.name, "cat": "cpu", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": microseconds(timing.start), "dur": timing.cpu * 1e6})
+                if timing.gpu is not None:
+                    gpuStart = max(timing.start, gpuEnd)
+                    gpuEnd = gpuStart + timing.gpu
+                    events.append({"name": timing.name, "cat": "gpu", "ph": "X", "pid": 1, "tid": 2,
+                                   "ts": microseconds(gpuStart), "dur": timing.gpu * 1e6})
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(self.frames)
+
+    def delete(self) -> None:
+        for queries in self.queries.values():
+            glDeleteQueries(len(queries), queries)
+        self.queries = {}
+        self.pending = {}
+
+# the profiler summary and frame time histogram drawn over the top left corner of the frame.
+# The text is rendered with PIL into a texture, redrawn every refresh seconds rather than every
+# frame, and drawn as one alpha blended quad. Two textures take turns, so that an update never
+# overwrites the texture the previous frame, maybe not rendered yet, is drawing from. update()
+# belongs at the start of a frame: a texture upload after the frame's draws makes llvmpipe
+# rasterize them on the spot, which would show up as the overlay's time
+#
+#     overlay.update()   # before the frame's draws
+#     ...
+#     overlay.draw()     # after them
+class ProfilerOverlay:
+    def __init__(self, profiler: FrameProfiler, refresh: float = 0.25, width: int = 320, histogramHeight: int = 48):
+        self.profiler = profiler
+        self.refresh = refresh
+        self.width = width
+        self.histogramHeight = histogramHeight
+        self.font = ImageFont.load_default()
+        self.lastUpdate = None
+        self.size = (0, 0)
+
+        self.shader = Shader("profiler_overlay.vs", "profiler_overlay.fs")
+        self.shader.use()
+        self.shader.setInt("overlay", 0)
+        # the quad corners come from gl_VertexID, but core profile still wants a VAO bound
+        self.VAO = glGenVertexArrays(1)
+        self.textures = [int(texture) for texture in glGenTextures(2)]
+        self.texture = self.textures[0]
+        for texture in self.textures:
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+
+    # the overlay as an RGBA image: summary lines, then the histogram with the percentiles marked
+    # -------------------------------------------------------------------------------------------
+    def render_image(self) -> Image.Image:
+        table = self.profiler.scope_table()
+        lineHeight = 12
+        height = 8 + lineHeight * (1 + len(table)) + self.histogramHeight + 8
+        image = Image.new("RGBA", (self.width, height), (0, 0, 0, 170))
+        draw = ImageDraw.Draw(image)
+        white = (255, 255, 255, 255)
+        draw.text((6, 4), self.profiler.percentile_line(), fill=white, font=self.font)
+        # the default font is proportional: the numbers are right aligned at fixed columns
+        for i, (name, cpu, gpu) in enumerate(table):
+            y = 4 + (i + 1) * lineHeight
+            draw.text((6, y), name, fill=white, font=self.font)
+            for text, right in ((cpu, self.width - 66), (gpu, self.width - 6)):
+                draw.text((right - draw.textlength(text, font=self.font), y), text, fill=white, font=self.font)
+
+        counts, edges = self.profiler.histogram()
+        top, bottom = height - 4 - self.histogramHeight, height - 4
+        if counts.max(initial=0) > 0:
+            barWidth = (self.width - 12) / len(counts)
+            for i, count in enumerate(counts):
+                barHeight = round(count / counts.max() * self.histogramHeight)
+                if barHeight:
+                    draw.rectangle((6 + i * barWidth, bottom - barHeight, 6 + (i + 1) * barWidth - 2, bottom),
+                                   fill=(120, 200, 255, 255))
+            span = max(edges[-1] - edges[0], 1e-6)
+            for value, color in zip(self.profiler.percentiles(), ((120, 255, 120), (255, 220, 80), (255, 90, 90))):
+                x = 6 + min((value - edges[0]) / span, 1.0) * (self.width - 12)
+                draw.line((x, top, x, bottom), fill=color + (255,))
+        return image
+
+    # redraws the overlay image when it is older than refresh seconds
+    # ----------------------------------------------------------------
+    def update(self) -> None:
+        now = time.perf_counter()
+        if self.lastUpdate is not None and now - self.lastUpdate < self.refresh:
+            return
+        self.lastUpdate = now
+        self.profiler.collect()
+
+        image = self.render_image()
+        self.size = image.size
+        self.texture = self.textures[1] if self.texture == self.textures[0] else self.textures[0]
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, image.tobytes())
+
+    # draws the overlay over whatever is in the framebuffer; changes the program, VAO, texture unit 0
+    # binding, blending and depth test, and restores the last two
+    # -----------------------------------------------------------------------------------------------
+    def draw(self) -> None:
+        if self.lastUpdate is None:
+            self.update()
+
+        _, _, viewportWidth, viewportHeight = glGetIntegerv(GL_VIEWPORT)
+        width, height = 2 * self.size[0] / viewportWidth, 2 * self.size[1] / viewportHeight
+
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.shader.use()
+        self.shader.setVec4("rect", glm.vec4(-1.0, 1.0 - height, width, height))
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glBindVertexArray(self.VAO)
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+        glBindVertexArray(0)
+        glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+
+    def delete(self) -> None:
+        glDeleteVertexArrays(1, (self.VAO,))
+        glDeleteTextures(2, self.textures)
@@ -0,0 +1,11 @@
+#version 330 core
+out vec4 FragColor;
+
+in vec2 TexCoords;
+
+uniform sampler2D overlay;
+
+void main()
+{
+    FragColor = texture(overlay, TexCoords);
+}
\ No newline at end of file
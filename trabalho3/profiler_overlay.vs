@@ -0,0 +1,14 @@
+#version 330 core
+out vec2 TexCoords;
+
+// x, y of the bottom left corner and width, height, in normalized device coordinates
+uniform vec4 rect;
+
+void main()
+{
+    // triangle strip over the 4 corners: (0,0) (1,0) (0,1) (1,1)
+    vec2 corner = vec2(gl_VertexID & 1, gl_VertexID >> 1);
+    // the overlay image is stored top row first
+    TexCoords = vec2(corner.x, 1.0 - corner.y);
+    gl_Position = vec4(rect.xy + corner * rect.zw, 0.0, 1.0);
+}
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Renders the trabalho3 scene without a window (EGL, works with Mesa llvmpipe on
+machines without a GPU or display) from a scripted list of camera poses, and
+writes the frames as PNG files or as one raw RGB24 stream.
+
+The poses file is a JSON list; every field is optional:
+
+    [{"position": [0, 5, 3], "yaw": -90, "pitch": 0, "zoom": 45, "light_angle": 0.0}, ...]
+
+Without a poses file the camera circles the scene (--orbit frames).
+
+    python ./render_headless.py [poses.json] [--orbit 36] [--out ./frames] [--size 800 600]
+    python ./render_headless.py poses.json --raw - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -i - out.mp4
+    python ./render_headless.py --profile trace.json [--overlay]   # Chrome trace of the frames (profiler.py)
+"""
+import offscreen
+
+from OpenGL.GL import *
+
+import argparse, json, math, os, sys, time
+
+import glm
+from PIL import Image
+
+import trabalho3
+from camera import Camera
+from profiler import FrameProfiler, ProfilerOverlay
+
+# poses looking at the scene centre from a circle around it
+# ---------------------------------------------------------
+def orbit_poses(frames: int, radius: float = 70.0, height: float = 25.0, target=(0.0, 8.0, 10.0)) -> list:
+    poses = []
+    for i in range(frames):
+        angle = 2 * math.pi * i / frames
+        position = (target[0] + radius * math.sin(angle), height, target[2] + radius * math.cos(angle))
+        direction = glm.normalize(glm.vec3(target) - glm.vec3(position))
+        poses.append({
+            "position": position,
+            "yaw": math.degrees(math.atan2(direction.z, direction.x)),
+            "pitch": math.degrees(math.asin(direction.y)),
+            "light_angle": angle,
+        })
+    return poses
+
+def pose_camera(pose: dict) -> Camera:
+    camera = Camera(glm.vec3(*pose.get("position", (0.0, 5.0, 3.0))),
+                    yaw=pose.get("yaw", -90.0), pitch=pose.get("pitch", 0.0))
+    camera.Zoom = pose.get("zoom", camera.Zoom)
+    return camera
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("poses", nargs="?", help="JSON file with the camera poses")
+    parser.add_argument("--orbit", type=int, default=36, help="frames around the scene when no poses file is given")
+    parser.add_argument("--out", default="./frames", help="directory for frame_0000.png, ...")
+    parser.add_argument("--raw", metavar="FILE", help="write one raw RGB24 stream instead of PNG files ('-' for stdout)")
+    parser.add_argument("--size", type=int, nargs=2, default=(trabalho3.SCR_WIDTH, trabalho3.SCR_HEIGHT), metavar=("W", "H"))
+    parser.add_argument("--buffers", type=int, default=2, help="pixel buffer objects in the readback ring")
+    parser.add_argument("--profile", metavar="TRACE", help="time the frames and write them as a Chrome trace JSON file")
+    parser.add_argument("--overlay", action="store_true", help="draw the profiler overlay into the frames")
+    args = parser.parse_args()
+
+    if args.poses:
+        with open(args.poses) as f:
+            poses = json.load(f)
+    else:
+        poses = orbit_poses(args.orbit)
+
+    if args.raw == "-":
+        # stdout only carries frames, anything else printed (e.g. texture load errors) goes to stderr
+        stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+    elif args.raw:
+        stream = open(args.raw, "wb")
+    else:
+        os.makedirs(args.out, exist_ok=True)
+
+    # progress goes to stderr so that --raw - can be piped
+    log = lambda *values: print(*values, file=sys.stderr)
+
+    context = offscreen.OffscreenContext(*args.size)
+    log(f"renderer: {context.renderer()}")
+
+    glEnable(GL_DEPTH_TEST)
+
+    start = time.perf_counter()
+    scene = trabalho3.Scene()
+    log(f"scene loaded in {time.perf_counter() - start:.2f} s")
+
+    reader = context.pixel_reader(args.buffers)
+    aspect = args.size[0] / args.size[1]
+
+    profiler = overlay = None
+    if args.profile or args.overlay:
+        profiler = scene.profiler = FrameProfiler()
+        if args.overlay:
+            overlay = ProfilerOverlay(profiler)
+
+    written = 0
+    write_time = 0.0
+
+    def write(frame) -> None:
+        nonlocal written, write_time
+        started = time.perf_counter()
+        if args.raw:
+            stream.write(frame.tobytes())
+        else:
+            Image.fromarray(frame).save(os.path.join(args.out, f"frame_{written:04d}.png"))
+        written += 1
+        write_time += time.perf_counter() - started
+
+    start = time.perf_counter()
+    for pose in poses:
+        if profiler is not None:
+            profiler.begin_frame()
+        if overlay is not None:
+            with profiler.scope("overlay update"):
+                overlay.update()
+        scene.orbitLight(pose.get("light_angle", 0.0))
+        scene.render(pose_camera(pose), aspect)
+        if overlay is not None:
+            with profiler.scope("overlay"):
+                overlay.draw()
+
+        with scene.profileScope("readback"):
+            frame = reader.read()
+        if frame is not None:
+            write(frame)
+        if profiler is not None:
+            profiler.end_frame()
+
+    for frame in reader.flush():
+        write(frame)
+    glFinish()
+    total = time.perf_counter() - start
+
+    if args.raw and args.raw != "-":
+        stream.close()
+    elif args.raw:
+        stream.flush()
+
+    render_time = total - write_time
+    log(f"{written} frames of {args.size[0]}x{args.size[1]}: {written / render_time:.2f} fps rendered, "
+        f"{written / total:.2f} fps including {'raw output' if args.raw else 'PNG encoding'}")
+
+    if profiler is not None:
+        if args.profile:
+            profiler.write_trace(args.profile)
+            log(f"trace written to {args.profile}")
+        log("\n".join(profiler.summary()))
+        if overlay is not None:
+            overlay.delete()
+        profiler.delete()
+
+    reader.delete()
+    scene.delete()
+    context.destroy()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,7 @@
 from OpenGL.GL import *
 
 import glm
+import numpy as np
 
 class Shader:
     def __init__(self, vertexPath: str, fragmentPath: str):
@@ -34,11 +35,14 @@ class Shader:
             glAttachShader(self.ID, fragment)
             glLinkProgram(self.ID)
             self.checkCompileErrors(self.ID, "PROGRAM")
+            # 3. look up every active uniform once, so the setters never have to ask the driver
+            self.uniforms = self.introspectUniforms()
             # delete the shaders as they're linked into our program now and no longer necessary
             glDeleteShader(vertex)
             glDeleteShader(fragment)
         
         except IOError:
+            self.uniforms = {}
             print("ERROR::SHADER::FILE_NOT_SUCCESFULLY_READ")
             
         
@@ -47,44 +51,111 @@ class Shader:
     # ------------------------------------------------------------------------
     def use(self) -> None:
         glUseProgram(self.ID)
+
+    # name -> location table of the active uniforms of the linked program; arrays are
+    # registered by their bare name and by every element ("offsets", "offsets[0]", "offsets[1]", ...)
+    # ------------------------------------------------------------------------
+    def introspectUniforms(self) -> dict:
+        uniforms = {}
+        count = glGetProgramiv(self.ID, GL_ACTIVE_UNIFORMS)
+        if count == 0:
+            return uniforms
+
+        # members of uniform blocks (hundreds with the point light block) have no location:
+        # ask for every block index in one call and only look at the rest
+        indices = np.arange(count, dtype=np.uint32)
+        blockIndices = np.zeros(count, dtype=np.int32)
+        glGetActiveUniformsiv(self.ID, count, indices, GL_UNIFORM_BLOCK_INDEX, blockIndices)
+
+        for index in np.nonzero(blockIndices == -1)[0]:
+            name, size, type = glGetActiveUniform(self.ID, int(index))
+            name = name.decode()
+            location = glGetUniformLocation(self.ID, name)
+            if location == -1:
+                continue
+
+            uniforms[name] = location
+            if name.endswith("[0]"):
+                base = name[:-3]
+                uniforms[base] = location
+                for element in range(1, int(size)):
+                    uniforms[f"{base}[{element}]"] = glGetUniformLocation(self.ID, f"{base}[{element}]")
+        return uniforms
+
+    # cached uniform location; names the linker dropped are asked once and remembered as -1
+    # ------------------------------------------------------------------------
+    def getUniformLocation(self, name: str) -> int:
+        location = self.uniforms.get(name)
+        if location is None:
+            location = glGetUniformLocation(self.ID, name)
+            self.uniforms[name] = location
+        return location
         
     # utility uniform functions
     # ------------------------------------------------------------------------
     def setBool(self, name: str, value: bool) -> None:
-        glUniform1i(glGetUniformLocation(self.ID, name), int(value))
+        glUniform1i(self.getUniformLocation(name), int(value))
     # ------------------------------------------------------------------------
     def setInt(self, name: str, value: int) -> None:
-        glUniform1i(glGetUniformLocation(self.ID, name), value)
+        glUniform1i(self.getUniformLocation(name), value)
     # ------------------------------------------------------------------------
     def setFloat(self, name: str, value: float) -> None:
-        glUniform1f(glGetUniformLocation(self.ID, name), value)
+        glUniform1f(self.getUniformLocation(name), value)
     # ------------------------------------------------------------------------
     def setVec2(self, name: str, *args) -> None:
         if (len(args) == 1 and type(args[0]) == glm.vec2):
-            glUniform2fv(glGetUniformLocation(self.ID, name), 1, glm.value_ptr(args[0]))
+            glUniform2fv(self.getUniformLocation(name), 1, glm.value_ptr(args[0]))
         elif (len(args) == 2 and all(map(lambda x: type(x) == float, args))):
-            glUniform2f(glGetUniformLocation(self.ID, name), *args)
+            glUniform2f(self.getUniformLocation(name), *args)
     # ------------------------------------------------------------------------
     def setVec3(self, name: str, *args) -> None:
         if (len(args) == 1 and type(args[0]) == glm.vec3):
-            glUniform3fv(glGetUniformLocation(self.ID, name), 1, glm.value_ptr(args[0]))
+            glUniform3fv(self.getUniformLocation(name), 1, glm.value_ptr(args[0]))
         elif (len(args) == 3 and all(map(lambda x: type(x) == float, args))):
-            glUniform3f(glGetUniformLocation(self.ID, name), *args)
+            glUniform3f(self.getUniformLocation(name), *args)
     # ------------------------------------------------------------------------
     def setVec4(self, name: str, *args) -> None:
         if (len(args) == 1 and type(args[0]) == glm.vec4):
-            glUniform4fv(glGetUniformLocation(self.ID, name), 1, glm.value_ptr(args[0]))
-        elif (len(args) == 3 and all(map(lambda x: type(x) == float, args))):
-            glUniform4f(glGetUniformLocation(self.ID, name), *args)
+            glUniform4fv(self.getUniformLocation(name), 1, glm.value_ptr(args[0]))
+        elif (len(args) == 4 and all(map(lambda x: type(x) == float, args))):
+            glUniform4f(self.getUniformLocation(name), *args)
     # ------------------------------------------------------------------------
     def setMat2(self, name: str, mat: glm.mat2) -> None:
-        glUniformMatrix2fv(glGetUniformLocation(self.ID, name), 1, GL_FALSE, glm.value_ptr(mat))
+        glUniformMatrix2fv(self.getUniformLocation(name), 1, GL_FALSE, glm.value_ptr(mat))
     # ------------------------------------------------------------------------
     def setMat3(self, name: str, mat: glm.mat3) -> None:
-        glUniformMatrix3fv(glGetUniformLocation(self.ID, name), 1, GL_FALSE, glm.value_ptr(mat))
+        glUniformMatrix3fv(self.getUniformLocation(name), 1, GL_FALSE, glm.value_ptr(mat))
     # ------------------------------------------------------------------------
     def setMat4(self, name: str, mat: glm.mat4) -> None:
-        glUniformMatrix4fv(glGetUniformLocation(self.ID, name), 1, GL_FALSE, glm.value_ptr(mat))
+        glUniformMatrix4fv(self.getUniformLocation(name), 1, GL_FALSE, glm.value_ptr(mat))
+
+    # uniform array functions: the whole array (e.g. "offsets" for vec3 offsets[N])
+    # is uploaded with a single call; values may be a list of floats/glm vectors or a numpy array
+    # ------------------------------------------------------------------------
+    def setIntArray(self, name: str, values) -> None:
+        data = np.ascontiguousarray(values, dtype=np.int32).reshape(-1)
+        glUniform1iv(self.getUniformLocation(name), len(data), data)
+    # ------------------------------------------------------------------------
+    def setFloatArray(self, name: str, values) -> None:
+        data = np.ascontiguousarray(values, dtype=np.float32).reshape(-1)
+        glUniform1fv(self.getUniformLocation(name), len(data), data)
+    # ------------------------------------------------------------------------
+    def setVec2Array(self, name: str, values) -> None:
+        data = np.ascontiguousarray(values, dtype=np.float32).reshape(-1, 2)
+        glUniform2fv(self.getUniformLocation(name), len(data), data)
+    # ------------------------------------------------------------------------
+    def setVec3Array(self, name: str, values) -> None:
+        data = np.ascontiguousarray(values, dtype=np.float32).reshape(-1, 3)
+        glUniform3fv(self.getUniformLocation(name), len(data), data)
+    # ------------------------------------------------------------------------
+    def setVec4Array(self, name: str, values) -> None:
+        data = np.ascontiguousarray(values, dtype=np.float32).reshape(-1, 4)
+        glUniform4fv(self.getUniformLocation(name), len(data), data)
+    # ------------------------------------------------------------------------
+    def setMat4Array(self, name: str, mats: list) -> None:
+        # numpy reads glm matrices row by row, GL expects them column by column
+        data = np.ascontiguousarray(np.array(mats, dtype=np.float32).reshape(-1, 4, 4).transpose(0, 2, 1))
+        glUniformMatrix4fv(self.getUniformLocation(name), len(data), GL_FALSE, data)
 
     # utility function for checking shader compilation/linking errors.
     # ------------------------------------------------------------------------
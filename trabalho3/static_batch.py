@@ -0,0 +1,97 @@
+from OpenGL.GL import *
+
+import functools
+
+import glm
+import numpy as np
+
+from engine import vertex_format
+from engine.instancing import group_by
+
+# world space copy of a float vertex buffer of the given stride (position, then normal when the
+# stride has one): positions go through model, normals through its inverse transpose
+# ----------------------------------------------------------------------------------------------
+def transform_vertices(vertices: np.ndarray, stride: int, model: np.ndarray) -> np.ndarray:
+    table = vertices.reshape(-1, stride).astype(np.float64)
+    table[:, 0:3] = table[:, 0:3] @ model[:3, :3].T + model[:3, 3]
+    if stride >= 8:
+        normals = table[:, 3:6] @ np.linalg.inv(model[:3, :3])
+        table[:, 3:6] = normals / np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    return table.astype(np.float32).reshape(-1)
+
+# objects that never move after setup, pre-transformed into world space and appended into one VBO
+# and one EBO, grouped by texture_key(obj) so that the visible objects of a group are drawn with
+# one glMultiDrawElements call. Every object keeps its levels of detail (see mesh_lod.py) as one
+# index range per level. Each object only has to provide mesh (vertices, indices and lods),
+# model and lod. The batch stays in the float vertex format: quantized in a box the size of the
+# whole scene, the positions would lose too much precision (see vertex_format.py).
+class StaticBatch:
+    def __init__(self, objects: list, stride: int, texture_key):
+        self.objects = list(objects)
+        # (first index, index count) of every level of every object
+        self.ranges = {}
+
+        vertices, indices, base, first = [], [], 0, 0
+        groups = group_by(self.objects, texture_key)
+        self.groups = list(groups.values())
+        for members in self.groups:
+            for obj in members:
+                mesh = obj.mesh
+                model = np.array(obj.model, dtype=np.float64)
+                vertices.append(transform_vertices(mesh.vertices, stride, model))
+
+                levels = []
+                for lod in mesh.lods:
+                    level = mesh.indices[lod.first_index:lod.first_index + lod.index_count].astype(np.uint32)
+                    indices.append(level + np.uint32(base + lod.base_vertex))
+                    levels.append((first, lod.index_count))
+                    first += lod.index_count
+                self.ranges[id(obj)] = levels
+                base += len(mesh.vertices) // stride
+
+        self.vertices = np.concatenate(vertices) if vertices else np.zeros(0, dtype=np.float32)
+        self.indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.uint32)
+
+        self.VAO = glGenVertexArrays(1)
+        self.VBO, self.EBO = glGenBuffers(2)
+
+        glBindVertexArray(self.VAO)
+        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        vertex_format.bind_attributes(stride, compact=False)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindVertexArray(0)
+
+    # GPU memory of the batched vertex and index buffers
+    @property
+    def nbytes(self) -> int:
+        return self.vertices.nbytes + self.indices.nbytes
+
+    # queues the draws of objects (e.g. the batched ones left after culling) at their lod on a
+    # draw_queue.DrawQueue: one glMultiDrawElements per texture group, textures(obj) giving the
+    # texture ids of the group obj belongs to
+    # -------------------------------------------------------------------------------------------
+    def submit(self, queue, program: int, objects, textures) -> None:
+        visible = set(id(obj) for obj in objects)
+        for members in self.groups:
+            ranges = [self.ranges[id(obj)][min(obj.lod, len(self.ranges[id(obj)]) - 1)]
+                      for obj in members if id(obj) in visible]
+            if ranges:
+                first, counts = np.array(ranges, dtype=np.int64).T
+                offsets = (first * self.indices.itemsize).astype(np.uintp)
+                queue.submit(program, textures(members[0]), self.VAO,
+                             functools.partial(self.draw_group, counts.astype(np.int32), offsets))
+
+    # the vertices are already in world space: the model matrix and position decoding are the identity
+    # --------------------------------------------------------------------------------------------------
+    def draw_group(self, counts: np.ndarray, offsets: np.ndarray, state) -> None:
+        state.set_mat4("model", glm.mat4(1.0))
+        state.set_vec3("positionScale", glm.vec3(1.0))
+        state.set_vec3("positionOffset", glm.vec3(0.0))
+        glMultiDrawElements(GL_TRIANGLES, counts, GL_UNSIGNED_INT, offsets, len(counts))
+        state.count()
+
+    def delete(self) -> None:
+        glDeleteVertexArrays(1, (self.VAO,))
+        glDeleteBuffers(2, (self.VBO, self.EBO))
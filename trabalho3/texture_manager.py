@@ -0,0 +1,161 @@
+from OpenGL.GL import *
+
+import math
+
+import numpy as np
+
+# the coarsest resident level of a texture is never dropped: its largest side stays at most this
+MIN_RESIDENT_SIZE = 64
+
+# one texture whose finer mip levels come and go: levels base..count-1 are on the GPU
+class ManagedTexture:
+    def __init__(self, texture_id: int, baked, name: str):
+        self.texture_id = texture_id
+        self.baked = baked
+        self.name = name
+        self.level_bytes = [len(data) for _, _, data in baked.levels]
+
+        # finest level that may be dropped to make room
+        self.floor = next(level for level, (width, height, _) in enumerate(baked.levels)
+                          if max(width, height) <= MIN_RESIDENT_SIZE)
+        self.base = 0
+        self.wanted = self.floor
+        self.last_used = -1
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self.level_bytes[self.base:])
+
+    def size(self, level: int) -> tuple:
+        return self.baked.levels[level][:2]
+
+# keeps the textures of a scene within a memory budget. Every frame, update() works out from
+# the on-screen size of the visible objects which mip level each of their textures needs
+# (the wanted level), uploads the missing finer levels (at most upload_bytes per frame) and,
+# while the resident levels add up to more than budget_bytes, drops the finest level of:
+#   1. textures holding finer levels than they want, least recently used first
+#   2. textures not seen this frame, least recently used first (down to MIN_RESIDENT_SIZE)
+#   3. the biggest textures seen this frame, which then look blurrier than wanted
+# the levels stay in the memory mapped texture_cache entries, so paging one back in is a
+# single glTexImage2D; GL_TEXTURE_BASE_LEVEL always points at the finest resident level.
+class TextureManager:
+    # upload_level(baked, level) uploads one level of a texture_cache.BakedTexture into the
+    # bound texture; lod_bias keeps that many levels finer than the estimate asks for
+    def __init__(self, upload_level, budget_bytes: int, upload_bytes: int, lod_bias: int = 1):
+        self.upload_level = upload_level
+        self.budget_bytes = budget_bytes
+        self.upload_bytes = upload_bytes
+        self.lod_bias = lod_bias
+        self.textures = {}
+        self.frame = 0
+        self.uploaded = 0
+        self.dropped = 0
+
+    # starts managing a texture whose whole mip chain was just uploaded
+    # -----------------------------------------------------------------
+    def add(self, texture_id: int, baked, name: str = "") -> None:
+        self.textures[texture_id] = ManagedTexture(texture_id, baked, name)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(texture.resident_bytes for texture in self.textures.values())
+
+    # the mip level that gives about one texel per pixel for an object of the given radius
+    # seen at distance, where pixels_per_unit is the screen height / (2 tan(fov / 2))
+    # ------------------------------------------------------------------------------------
+    def wanted_level(self, texture: ManagedTexture, radius: float, distance: float, pixels_per_unit: float) -> int:
+        if distance <= radius:
+            return 0
+        on_screen = max(2 * radius * pixels_per_unit / (distance - radius), 1.0)
+        level = math.floor(math.log2(max(texture.size(0)) / on_screen)) - self.lod_bias
+        return min(max(level, 0), texture.floor)
+
+    # objects need bounds (culling.Bounds) and textures (texture ids) attributes; visible are
+    # the ones drawn this frame
+    # ---------------------------------------------------------------------------------------
+    def update(self, visible, eye, pixels_per_unit: float) -> None:
+        self.frame += 1
+        self.uploaded = self.dropped = 0
+        eye = np.asarray(eye, dtype=np.float64)
+
+        used = []
+        for obj in visible:
+            distance = np.linalg.norm(obj.bounds.center - eye)
+            for texture_id in obj.textures:
+                texture = self.textures.get(texture_id)
+                if texture is None:
+                    continue
+                level = self.wanted_level(texture, obj.bounds.radius, distance, pixels_per_unit)
+                if texture.last_used != self.frame:
+                    texture.last_used = self.frame
+                    texture.wanted = level
+                    used.append(texture)
+                else:
+                    texture.wanted = min(texture.wanted, level)
+
+        # page in the missing levels, the textures that need the finest ones first
+        for texture in sorted(used, key=lambda texture: texture.wanted):
+            while texture.base > texture.wanted and self.uploaded < self.upload_bytes:
+                size = texture.level_bytes[texture.base - 1]
+                if not self.make_room(size, texture):
+                    break
+                self.load_level(texture)
+                self.uploaded += size
+
+        self.make_room(0)
+
+    # drops levels until size more bytes fit in the budget; visible textures are only dropped
+    # below their wanted level when nothing is being paged in (keep is None)
+    # ---------------------------------------------------------------------------------------
+    def make_room(self, size: int, keep: ManagedTexture = None) -> bool:
+        usage = self.resident_bytes
+        while usage + size > self.budget_bytes:
+            victim = self.victim(keep)
+            if victim is None:
+                return False
+            usage -= victim.level_bytes[victim.base]
+            self.drop_level(victim)
+        return True
+
+    def victim(self, keep: ManagedTexture = None):
+        candidates = [texture for texture in self.textures.values() if texture is not keep and texture.base < texture.floor]
+
+        unneeded = [texture for texture in candidates if texture.base < texture.wanted]
+        if unneeded:
+            return min(unneeded, key=lambda texture: texture.last_used)
+
+        unseen = [texture for texture in candidates if texture.last_used != self.frame]
+        if unseen:
+            return min(unseen, key=lambda texture: texture.last_used)
+
+        if keep is None and candidates:
+            return max(candidates, key=lambda texture: texture.level_bytes[texture.base])
+        return None
+
+    def load_level(self, texture: ManagedTexture) -> None:
+        texture.base -= 1
+        glBindTexture(GL_TEXTURE_2D, texture.texture_id)
+        self.upload_level(texture.baked, texture.base)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, texture.base)
+
+    # moves the base level up and frees the level below it (a 0x0 image has no storage)
+    def drop_level(self, texture: ManagedTexture) -> None:
+        glBindTexture(GL_TEXTURE_2D, texture.texture_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, texture.base + 1)
+        glTexImage2D(GL_TEXTURE_2D, texture.base, GL_R8, 0, 0, 0, GL_RED, GL_UNSIGNED_BYTE, None)
+        texture.base += 1
+        self.dropped += 1
+
+    # resident and wanted size of every texture, plus the budget usage
+    # ----------------------------------------------------------------
+    def report(self) -> str:
+        lines = [f"{'resident':>11} {'wanted':>11} {'MB':>7} {'last':>6}  texture"]
+        for texture in sorted(self.textures.values(), key=lambda texture: -texture.resident_bytes):
+            resident, wanted = texture.size(texture.base), texture.size(texture.wanted)
+            lines.append(f"{resident[0]:>5}x{resident[1]:<5} {wanted[0]:>5}x{wanted[1]:<5} "
+                         f"{texture.resident_bytes / 2**20:>7.2f} {self.frame - texture.last_used:>6}  {texture.name}")
+        lines.append(self.usage())
+        return "\n".join(lines)
+
+    def usage(self) -> str:
+        return f"textures {self.resident_bytes / 2**20:.1f}/{self.budget_bytes / 2**20:.0f} MB"
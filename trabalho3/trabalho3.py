@@ -1,4 +1,5 @@
 from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
 from glfw.GLFW import *
 
 from glfw import _GLFWwindow as GLFWwindow
@@ -6,52 +7,32 @@ from PIL import Image
 
 import glm
 
+import platform, contextlib, ctypes, functools, os, sys, time
+
+# the engine package shared with trabalho2 is at the root of the repository
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from shader_m import Shader
 from camera import Camera, Camera_Movement
+from obj_loader import VERTEX_STRIDE
+from engine.mesh_cache import load_mesh
+from engine.asset_registry import AssetRegistry
+from asset_loader import AssetLoader, AssetStream, file_size, parse_mesh, unique_requests
+from engine.texture_cache import load_texture, row_bytes
+from engine.instancing import InstanceGroup, group_by
+from static_batch import StaticBatch
+from engine.draw_queue import DrawQueue, GLState
+from engine.mesh_lod import MeshLod, update_lods
+from engine import vertex_format
+from texture_manager import TextureManager
+from light_manager import PointLightManager
+from light_clusters import LightClusterGrid
+from engine.culling import Bounds, FrustumCuller, mesh_bounds
+from profiler import FrameProfiler, ProfilerOverlay
 
-import platform, ctypes, os
 import math
 import numpy as np
 
-def load_obj_model(filepath):
-    positions = []
-    texcoords = []
-    normals = []
-    vertices = []
-
-    def parse_vertex(v_str):
-        vals = v_str.split('/')
-        v_idx = int(vals[0]) - 1
-        vt_idx = int(vals[1]) - 1 if len(vals) > 1 and vals[1] else 0
-        vn_idx = int(vals[2]) - 1 if len(vals) > 2 and vals[2] else 0
-        return v_idx, vt_idx, vn_idx
-
-    with open(filepath, "r") as f:
-        for line in f:
-            if line.startswith("v "):  # Vertex position
-                parts = line.strip().split()[1:]
-                positions.append([float(p) for p in parts])
-            elif line.startswith("vt "):  # Texture coordinate
-                parts = line.strip().split()[1:]
-                texcoords.append([float(p) for p in parts])
-            elif line.startswith("vn "):  # Vertex normal
-                parts = line.strip().split()[1:]
-                normals.append([float(p) for p in parts])
-            elif line.startswith("f "):  # Face
-                face = line.strip().split()[1:]
-                face_indices = [parse_vertex(v) for v in face]
-
-                # Triangulate face using fan method: (0, i, i+1)
-                for i in range(1, len(face_indices) - 1):
-                    tri = [face_indices[0], face_indices[i], face_indices[i + 1]]
-                    for v_idx, vt_idx, vn_idx in tri:
-                        pos = positions[v_idx]
-                        tex = texcoords[vt_idx] if texcoords else [0.0, 0.0]
-                        norm = normals[vn_idx] if normals else [0.0, 0.0, 0.0]
-                        vertices.extend(pos + norm + tex)
-
-    return glm.array(glm.float32, *vertices)
-
 def compute_model_matrix(angle, r_x, r_y, r_z, t_x, t_y, t_z, s_x, s_y, s_z):
     angle = math.radians(angle)
     matrix_transform = glm.mat4(1.0)
@@ -65,34 +46,166 @@ def compute_model_matrix(angle, r_x, r_y, r_z, t_x, t_y, t_z, s_x, s_y, s_z):
 
     return matrix_transform
 
-class LoadObject:
-    def __init__(self, obj_path: str, diffuse_path: str, specular_path: str):
-        self.vertices = load_obj_model(obj_path)
-        self.diffuseMap = loadTexture(diffuse_path)
-        self.specularMap = loadTexture(specular_path)
-
+# GPU copy of an OBJ mesh (VAO + VBO + EBO), shared through the asset registry by every object that uses it
+class Mesh:
+    # geometry, the (vertices, indices, lods) of mesh_cache.load_mesh, may come already loaded (e.g.
+    # by a background loader), otherwise it is read here. a pending mesh starts empty and is filled
+    # in later by set_geometry() and stream_upload()
+    def __init__(self, obj_path: str, geometry: tuple = None, pending: bool = False):
         self.VAO = glGenVertexArrays(1)
         self.VBO = glGenBuffers(1)
+        self.EBO = glGenBuffers(1)
+        # every VAO reading this VBO: the mesh's own and those of the instance groups using it
+        self.vertex_arrays = [self.VAO]
+        self.compact = None
+
+        if pending:
+            self.set_geometry(np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.uint16))
+            self.decoded = False
+        else:
+            self.set_geometry(*(load_mesh(obj_path) if geometry is None else geometry))
 
         glBindVertexArray(self.VAO)
+        if not pending:
+            glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+            glBufferData(GL_ARRAY_BUFFER, self.vertex_buffer.nbytes, self.vertex_buffer, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, self.EBO)
+            glBufferData(GL_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        self.bind_attributes()
+        glBindVertexArray(0)
+
+        # indices of the full mesh on the GPU, stays 0 until a pending mesh is uploaded
+        self.loaded = not pending
+        self.index_count = 0 if pending else self.lods[0].index_count
+
+    # lods (mesh_lod.MeshLod, level 0 first) default to a single level with all the indices
+    def set_geometry(self, vertices: np.ndarray, indices: np.ndarray, lods: list = None) -> None:
+        self.vertices = vertices
+        self.indices = indices
+        # what goes into the VBO: the float vertices, or their vertex_format.py packing, whose
+        # positions the vertex shader maps back with positionOffset + aPos * positionScale. A
+        # pending mesh starts out as float; when the decoded geometry turns out to pack, every
+        # VAO reading the VBO gets the compact layout
+        compact = COMPACT_VERTICES and vertex_format.can_pack(vertices, VERTEX_STRIDE)
+        layoutChanged = self.compact is not None and compact != self.compact
+        self.compact = compact
+        if self.compact:
+            packed, self.position_offset, self.position_scale = vertex_format.pack_vertices(vertices, VERTEX_STRIDE)
+            self.vertex_buffer = packed.view(np.uint8)
+        else:
+            self.vertex_buffer = vertices
+            self.position_offset, self.position_scale = np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)
+        self.index_type = GL_UNSIGNED_SHORT if indices.dtype == np.uint16 else GL_UNSIGNED_INT
+        self.lods = lods or [MeshLod(0, len(indices), 0, len(vertices) // VERTEX_STRIDE, 0.0)]
+        self.decoded = True
+
+        # object space bounding box of the full mesh, computed once and shared by every object using it
+        self.bounds = mesh_bounds(self.vertices[:self.lods[0].vertex_count * VERTEX_STRIDE], VERTEX_STRIDE)
+        # maps the unit cube onto that box, to draw it in place of a mesh still being uploaded
+        center, size = (self.bounds[0] + self.bounds[1]) / 2, np.maximum(self.bounds[1] - self.bounds[0], 1e-4)
+        self.box = glm.scale(glm.translate(glm.mat4(1.0), glm.vec3(*center)), glm.vec3(*size))
+
+        if layoutChanged:
+            for vertexArray in self.vertex_arrays:
+                glBindVertexArray(vertexArray)
+                self.bind_attributes()
+            glBindVertexArray(0)
+
+    # GPU memory of the vertex and index buffers
+    @property
+    def nbytes(self) -> int:
+        return self.vertex_buffer.nbytes + self.indices.nbytes
+
+    # uploads the vertices and indices set by set_geometry() in chunks of about chunk_bytes, yielding
+    # between them; the mesh is drawn (index_count > 0) only once all of them are on the GPU. Both
+    # buffers are filled through GL_ARRAY_BUFFER, so no VAO has to be bound meanwhile
+    # -----------------------------------------------------------------------------------------------
+    def stream_upload(self, chunk_bytes: int):
+        for buffer, data in ((self.VBO, self.vertex_buffer), (self.EBO, self.indices)):
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, None, GL_STATIC_DRAW)
+
+            chunk = max(chunk_bytes // (VERTEX_STRIDE * data.itemsize), 1) * VERTEX_STRIDE
+            for start in range(0, len(data), chunk):
+                yield
+                part = np.ascontiguousarray(data[start:start + chunk])
+                glBindBuffer(GL_ARRAY_BUFFER, buffer)
+                glBufferSubData(GL_ARRAY_BUFFER, start * data.itemsize, part.nbytes, part)
+
+        self.index_count = self.lods[0].index_count
+        self.loaded = True
+
+    # draws level lod (clamped to the levels the mesh has) with the bound VAO, instance_count times
+    # when given; a mesh still being uploaded draws nothing. Returns the draw calls issued
+    # ---------------------------------------------------------------------------------------------
+    def draw_elements(self, lod: int = 0, instance_count: int = None) -> int:
+        if not self.loaded:
+            return 0
+        level = self.lods[min(lod, len(self.lods) - 1)]
+        first = ctypes.c_void_p(level.first_index * self.indices.itemsize)
+        if instance_count is None:
+            glDrawElementsBaseVertex(GL_TRIANGLES, level.index_count, self.index_type, first, level.base_vertex)
+        else:
+            glDrawElementsInstancedBaseVertex(GL_TRIANGLES, level.index_count, self.index_type, first,
+                                              instance_count, level.base_vertex)
+        return 1
+
+    # binds the VBO and EBO and describes the vertex layout to the currently bound VAO (also used by instance groups)
+    def bind_attributes(self) -> None:
         glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices.ptr, GL_STATIC_DRAW)
+        vertex_format.bind_attributes(VERTEX_STRIDE, self.compact)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
 
-        stride = 8 * glm.sizeof(glm.float32)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(3 * glm.sizeof(glm.float32)))
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(6 * glm.sizeof(glm.float32)))
-        glEnableVertexAttribArray(2)
+    # sets the uniforms that turn the VBO positions into object space positions (the identity for
+    # float vertices) through state, a draw_queue.GLState
+    def set_position_uniforms(self, state: GLState) -> None:
+        state.set_vec3("positionScale", glm.vec3(*self.position_scale))
+        state.set_vec3("positionOffset", glm.vec3(*self.position_offset))
 
-        glBindVertexArray(0)
+    def delete(self) -> None:
+        glDeleteVertexArrays(1, (self.VAO,))
+        glDeleteBuffers(2, (self.VBO, self.EBO))
+
+class LoadObject:
+    def __init__(self, obj_path: str, diffuse_path: str, specular_path: str):
+        self.obj_path = obj_path
+        self.diffuse_path = diffuse_path
+        self.specular_path = specular_path
+
+        self.mesh = assets.acquire("mesh", obj_path, loadMeshAsset, Mesh.delete)
+        self.diffuseMap = assets.acquire("texture", diffuse_path, loadTextureAsset, deleteTexture)
+        self.specularMap = assets.acquire("texture", specular_path, loadTextureAsset, deleteTexture)
+
+        self.VAO = self.mesh.VAO
+        self.VBO = self.mesh.VBO
 
         self.angle = 0.0
         self.position = glm.vec3(0.0, 0.0, 0.0)
         self.scale_factor = glm.vec3(1.0, 1.0, 1.0)
         self.rotate_coords = glm.vec3(0.0, 0.0, 0.0)
         self.model = glm.mat4(1.0)
+        # bumped on every model change so instance groups know when to re-upload their matrices
+        self.model_version = 0
+        # world space bounding box/sphere used for frustum culling, follows the model matrix
+        self.bounds = Bounds(*self.mesh.bounds)
+        # level of detail of the mesh drawn, picked every frame by mesh_lod.update_lods
+        self.lod = 0
+
+    # the texture ids a texture manager pages mip levels in and out for
+    @property
+    def textures(self) -> tuple:
+        return (self.diffuseMap, self.specularMap)
+
+    # the mesh's vertices, which a streamed mesh only gets once it is decoded
+    @property
+    def vertices(self) -> np.ndarray:
+        return self.mesh.vertices
+
+    # rebuilds the world bounds once a streamed mesh is decoded (its box was empty until then)
+    # ----------------------------------------------------------------------------------------
+    def refresh_bounds(self) -> None:
+        self.bounds = Bounds(*self.mesh.bounds)
+        self.bounds.update(self.model)
 
     def update_model_matrix(self):
         self.model = compute_model_matrix(
@@ -101,6 +214,8 @@ class LoadObject:
             self.position.x, self.position.y, self.position.z,
             self.scale_factor.x, self.scale_factor.y, self.scale_factor.z
         )
+        self.model_version += 1
+        self.bounds.update(self.model)
 
     def move(self, x=0, y=0, z=0):
         self.position.x += x 
@@ -121,18 +236,66 @@ class LoadObject:
         if axis == 'z': self.rotate_coords.z = 1
         self.update_model_matrix()
 
-    def draw(self, shader: Shader, model_matrix: glm.mat4):
-        shader.setMat4("model", model_matrix)
+    # gives the shared mesh and textures back to the registry
+    def delete(self) -> None:
+        assets.release("mesh", self.obj_path)
+        assets.release("texture", self.diffuse_path)
+        assets.release("texture", self.specular_path)
 
+    def bind_textures(self) -> None:
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D, self.diffuseMap)
 
         glActiveTexture(GL_TEXTURE1)
         glBindTexture(GL_TEXTURE_2D, self.specularMap)
 
-        glBindVertexArray(self.VAO)
-        glDrawArrays(GL_TRIANGLES, 0, len(self.vertices) // 8)
-        glBindVertexArray(0)
+    # queues the object on a draw_queue.DrawQueue, drawn with shader at model_matrix (default: its own)
+    # -------------------------------------------------------------------------------------------------
+    def submit(self, queue: DrawQueue, shader: Shader, model_matrix: glm.mat4 = None) -> None:
+        model_matrix = self.model if model_matrix is None else model_matrix
+        queue.submit(shader.ID, self.textures, self.VAO, functools.partial(self.issue, model_matrix))
+
+    # the uniforms and draw call of the object, once its program, textures and VAO are bound
+    def issue(self, model_matrix: glm.mat4, state: GLState) -> None:
+        state.set_mat4("model", model_matrix)
+        self.mesh.set_position_uniforms(state)
+        state.count(self.mesh.draw_elements(self.lod))
+
+    # draws the object right away, outside a frame's queue, through state: a GLState kept by the
+    # caller across draws, so the uniform locations are asked once and the program, textures and VAO
+    # are only bound when they change (the VAO stays bound; call state.reset() after binding elsewhere)
+    # --------------------------------------------------------------------------------------------------
+    def draw(self, shader: Shader, model_matrix: glm.mat4, state: GLState) -> None:
+        state.use_program(shader.ID)
+        state.bind_textures(self.textures)
+        state.bind_vertex_array(self.VAO)
+        self.issue(model_matrix, state)
+
+# builds one instance group per (mesh, diffuse, specular) combination used by the objects
+# ---------------------------------------------------------------------------------------
+def buildInstanceGroups(objects) -> list:
+    groups = group_by(objects, lambda obj: (obj.obj_path, obj.diffuseMap, obj.specularMap))
+    return [InstanceGroup(members[0].mesh, members) for members in groups.values()]
+
+# queues every object (or only the visible ones) through its instance group: one instanced draw per group and level of detail
+# ---------------------------------------------------------------------------------------------------------------------------
+def submitInstanced(queue: DrawQueue, instanceGroups: list, shader: Shader, visibleObjects: list = None) -> None:
+    visible = None if visibleObjects is None else set(visibleObjects)
+    for group in instanceGroups:
+        members = group.objects if visible is None else [obj for obj in group.objects if obj in visible]
+        if members:
+            queue.submit(shader.ID, group.objects[0].textures, group.VAO, functools.partial(issueInstances, group, members))
+
+# the uniforms and draw calls of an instance group, once its program, textures and VAO are bound
+def issueInstances(group: InstanceGroup, members: list, state: GLState) -> None:
+    group.mesh.set_position_uniforms(state)
+    state.count(group.draw_instances(members))
+
+# draws the instance groups right away through state, a GLState kept by the caller across draws
+def drawInstanced(instanceGroups: list, shader: Shader, state: GLState, visibleObjects: list = None) -> None:
+    queue = DrawQueue(state)
+    submitInstanced(queue, instanceGroups, shader, visibleObjects)
+    queue.flush()
 
 
 # the relative path where the textures are located
@@ -141,10 +304,36 @@ IMAGE_RESOURCE_PATH = "./texturas/"
 # function that loads and automatically flips an image vertically
 LOAD_IMAGE = lambda name: Image.open(name).transpose(Image.FLIP_TOP_BOTTOM)
 
+# meshes and textures shared between objects loaded from the same files
+assets = AssetRegistry()
+
 # settings
 SCR_WIDTH = 800
 SCR_HEIGHT = 600
 
+# streaming startup: time per frame spent uploading assets, and the size of one upload step
+UPLOAD_BUDGET_MS = 4.0
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+# upload the block compressed (BC1/BC3/BC4) texture cache entries, when the driver supports S3TC
+COMPRESS_TEXTURES = False
+
+# upload the meshes in the compact vertex format of vertex_format.py (16 instead of 32 bytes per vertex)
+COMPACT_VERTICES = False
+
+# memory the resident texture mip levels may use, and how much of them may be paged in per frame
+TEXTURE_BUDGET_MB = 32
+TEXTURE_UPLOAD_MB = 8
+
+# GL internal format and pixel format of every texture_cache layout
+TEXTURE_FORMATS = {
+    "r8": (GL_R8, GL_RED),
+    "rgba8": (GL_RGBA8, GL_RGBA),
+    "bc1": (GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_RGBA),
+    "bc3": (GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, GL_RGBA),
+    "bc4": (GL_COMPRESSED_RED_RGTC1, GL_RED),
+}
+
 # camera
 camera = Camera(glm.vec3(0.0, 5.0, 3.0))
 lastX = SCR_WIDTH / 2.0
@@ -170,12 +359,465 @@ enable_ambient = True
 enable_diffuse = True
 enable_specular = True
 
+# draw repeated objects with one instanced draw call per mesh (toggled with T)
+use_instancing = True
+
+# shade each fragment only with the point lights of its cluster (toggled with G)
+use_light_clusters = True
+
+# skip objects outside the view frustum (toggled with F)
+use_frustum_culling = True
+
+# draw distant meshes with their simplified levels of detail (toggled with H)
+use_mesh_lod = True
+
+# draw the objects that never move from one pre-transformed buffer, one multi-draw per texture set (toggled with Y)
+use_static_batching = True
+
+# issue the draws sorted by shader, textures and VAO, skipping the binds already current (toggled with E)
+use_state_sorting = True
+
+# print the resident mip levels of every texture on the next frame (P)
+printTextures = False
+
+# show the frame profiler overlay (F1); F2 writes the profiled frames to PROFILE_TRACE
+show_profiler = False
+writeTrace = False
+PROFILE_TRACE = "profile_trace.json"
+
 rotation_angle = 0.0
 light_radius = 10.0
 light_height = 50.0 
 
+# everything trabalho3 draws: shaders, the light cubes, the point lights and the loaded objects.
+# shared by the GLFW window in main() and the offscreen renderer in render_headless.py
+# mesh, diffuse and specular map of every object in the scene
+SCENE_OBJECTS = {
+    'boxSky': ("./objects/cube/cube.obj", "./objects/cube/Textures/sky.png", "./objects/cube/Textures/container2_specular.png"),
+    'boxFloor': ("./objects/cube/cube.obj", "./objects/cube/Textures/container2.png", "./objects/cube/Textures/container2_specular.png"),
+    'boxGround': ("./objects/cube/cube.obj", "./objects/cube/Textures/grama.jpg","./objects/cube/Textures/green_grass_specular.jpg"),
+    'temple': ("./objects/temple/Japanese_Temple.obj", './objects/temple/Textures/Japanese_Temple_Paint2.png', './objects/temple/Textures/Japanese_Temple_Paint2_specular.png'),
+    'gate': ("./objects/gate/Japanese_Torii_Gate.obj", "./objects/gate/Textures/Material.001_Base_color.png","./objects/gate/Textures/internal_ground_ao_texture.jpeg"),
+    'buddha': ("./objects/buddha/SM_Buddha.obj", "./objects/buddha/Textures/Buddha_low_DefaultMaterial_BaseColor.png","./objects/buddha/Textures/Buddha_low_DefaultMaterial_Roughness.png"),
+    'sconce': ("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
+    'sconce2': ("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
+    'sconce3': ("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
+    'sconce4': ("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
+    'table': ("./objects/table/simple-table.obj", "./objects/table/Textures/lambert1_Base_Color.png","./objects/table/Textures/lambert1_Roughness.png"),
+    'pillow': ("./objects/pillow/Pillow1.obj", "./objects/pillow/Textures/FabricDenim001_COL_VAR1_1K.jpg","./objects/pillow/Textures/GraphicDesignWallpaperEclectic26_VAR2_1K.png"),
+    'lantern': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+    'lantern2': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+    'lantern3': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+    'lantern4': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+    'lantern5': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+    'lantern6': ("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
+}
+
+# objects moved after setup, which stay out of the static batch
+DYNAMIC_OBJECTS = ('buddha', 'table', 'pillow')
+
+class Scene:
+    # loadWorkers: size of the asset decoding pool (None: one per CPU, 1: decode on this thread).
+    # stream: return right away with placeholder assets and load the real ones in the background,
+    # a little every frame (see streamAssets). textureBudget: bytes of texture mip levels kept
+    # on the GPU (default TEXTURE_BUDGET_MB), see texture_manager.py
+    def __init__(self, loadWorkers: int = None, loadProcesses: bool = False, stream: bool = False,
+                 textureBudget: int = None):
+        # build and compile our shader zprogram
+        # ------------------------------------
+        self.lightingShader = Shader("6.multiple_lights.vs", "6.multiple_lights.fs")
+        self.instancedShader = Shader("6.multiple_lights_instanced.vs", "6.multiple_lights.fs")
+        self.lightCubeShader = Shader("6.light_cube.vs", "6.light_cube.fs")
+        # set up vertex data (and buffer(s)) and configure vertex attributes
+        # ------------------------------------------------------------------
+        vertices = glm.array(glm.float32,
+            # positions          # normals           # texture coords
+            -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  0.0,
+             0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  0.0,
+             0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  1.0,
+             0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  1.0,
+            -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  1.0,
+            -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  0.0,
+
+            -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  0.0,
+             0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  0.0,
+             0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  1.0,
+             0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  1.0,
+            -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  1.0,
+            -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  0.0,
+
+            -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,  1.0,  0.0,
+            -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,  1.0,  1.0,
+            -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,  0.0,  1.0,
+            -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,  0.0,  1.0,
+            -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,  0.0,  0.0,
+            -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,  1.0,  0.0,
+
+             0.5,  0.5,  0.5,  1.0,  0.0,  0.0,  1.0,  0.0,
+             0.5,  0.5, -0.5,  1.0,  0.0,  0.0,  1.0,  1.0,
+             0.5, -0.5, -0.5,  1.0,  0.0,  0.0,  0.0,  1.0,
+             0.5, -0.5, -0.5,  1.0,  0.0,  0.0,  0.0,  1.0,
+             0.5, -0.5,  0.5,  1.0,  0.0,  0.0,  0.0,  0.0,
+             0.5,  0.5,  0.5,  1.0,  0.0,  0.0,  1.0,  0.0,
+
+            -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  0.0,  1.0,
+             0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  1.0,  1.0,
+             0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  1.0,  0.0,
+             0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  1.0,  0.0,
+            -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  0.0,  0.0,
+            -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  0.0,  1.0,
+
+            -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  0.0,  1.0,
+             0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  1.0,  1.0,
+             0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  1.0,  0.0,
+             0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  1.0,  0.0,
+            -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  0.0,  0.0,
+            -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  0.0,  1.0
+        )
+
+        # positions of the point lights
+        self.pointLightPositions = [
+            # ambient
+            glm.vec3( 140,  140, 140),
+            glm.vec3( -140,  140,  140),
+            glm.vec3( 140,  140,  -140),
+            glm.vec3( -140,  140,  -140),
+
+            # buddha
+            glm.vec3( 65,  50.0,  65),
+
+            # templo
+            glm.vec3( 4.49172, 9, -24.85),
+            glm.vec3( -4.49172, 9, -24.85),
+
+            glm.vec3( 5, 19.3, -24.3),
+            glm.vec3( -5, 19.3, -24.3),
+
+            # entrada
+
+            glm.vec3( -3.8,  4.2, -5.0),
+            glm.vec3( 3.8,  4.2, -5.0),
+
+            glm.vec3( -6.5,  17.2, 20.0),
+            glm.vec3( 6.5,  17.2, 20.0),
+
+            glm.vec3( -3.8,  4.2, 14),
+            glm.vec3( 3.8,  4.2, 14),
+
+            glm.vec3( -3.8,  4.2, 30.0),
+            glm.vec3( 3.8,  4.2, 30.0),
+        ]
+
+        # first, configure the cube's VAO (and VBO)
+        self.cubeVAO = glGenVertexArrays(1)
+        self.VBO = glGenBuffers(1)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices.ptr, GL_STATIC_DRAW)
+
+        glBindVertexArray(self.cubeVAO)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), None)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), ctypes.c_void_p(3 * glm.sizeof(glm.float32)))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), ctypes.c_void_p(6 * glm.sizeof(glm.float32)))
+        glEnableVertexAttribArray(2)
+
+        # second, configure the light's VAO (VBO stays the same the vertices are the same for the light object which is also a 3D cube)
+        self.lightCubeVAO = glGenVertexArrays(1)
+        glBindVertexArray(self.lightCubeVAO)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+        # note that we update the lamp's position attribute's stride to reflect the updated buffer data
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), None)
+        glEnableVertexAttribArray(0)
+
+        # load textures (we now use a utility function to keep the code more organized)
+        # -----------------------------------------------------------------------------
+
+        # point lights live in a uniform buffer shared by both lighting shaders
+        # ---------------------------------------------------------------------
+        self.pointLights = PointLightManager()
+        for position in self.pointLightPositions:
+            self.pointLights.add(position, ambient_light_color, diffuse_light_color, specular_light_color)
+        self.lightClusters = LightClusterGrid()
+
+        # shader configuration
+        # --------------------
+        for shader in (self.lightingShader, self.instancedShader):
+            shader.use()
+            shader.setInt("material.diffuse", 0)
+            shader.setInt("material.specular", 1)
+            shader.setFloat("material.shininess", 32.0)
+            self.pointLights.bind(shader)
+            self.lightClusters.bind(shader)
+
+            # spotLight (switched off, its values never change)
+            # shader.setVec3("spotLight.position", camera.Position)
+            # shader.setVec3("spotLight.direction", camera.Front)
+            shader.setVec3("spotLight.ambient", 0.0, 0.0, 0.0)
+            shader.setVec3("spotLight.diffuse", 1.0, 1.0, 1.0)
+            shader.setVec3("spotLight.specular", 1.0, 1.0, 1.0)
+            shader.setFloat("spotLight.constant", 1.0)
+            shader.setFloat("spotLight.linear", 0.09)
+            shader.setFloat("spotLight.quadratic", 0.032)
+            shader.setFloat("spotLight.cutOff", glm.cos(glm.radians(12.5)))
+            shader.setFloat("spotLight.outerCutOff", glm.cos(glm.radians(15.0)))
+
+        # every loaded texture is handed to the texture manager, which keeps only the mip levels
+        # the visible objects need once the budget is exceeded
+        textureBudget = TEXTURE_BUDGET_MB << 20 if textureBudget is None else textureBudget
+        self.textures = TextureManager(uploadTextureLevel, textureBudget, TEXTURE_UPLOAD_MB << 20)
+
+        # decode every mesh and image on a worker pool while this thread uploads them,
+        # the LoadObjects below then find them all in the asset registry
+        if stream:
+            self.loadStats = None
+            self.loadStream = streamSceneAssets(SCENE_OBJECTS.values(), self.meshDecoded, self.textureLoaded,
+                                                loadWorkers, loadProcesses)
+        else:
+            self.loadStats = preloadAssets(SCENE_OBJECTS.values(), self.textureLoaded, loadWorkers, loadProcesses)
+            self.loadStream = None
+        self.objects = {name: LoadObject(*paths) for name, paths in SCENE_OBJECTS.items()}
+
+
+        self.objects['table'].move(y=3.2,z=-31)
+        self.objects['table'].scale(.02,.02,.02)
+        self.objects['pillow'].move(y=3.8,z=-33)
+
+        self.objects['lantern'].scale(5, 5, 5)
+        self.objects['lantern'].move(x=-3.8, z=-5.0)
+        self.objects['lantern2'].scale(5, 5, 5)
+        self.objects['lantern2'].move(x=3.8, z=-5.0)
+        self.objects['lantern3'].scale(5, 5, 5)
+        self.objects['lantern3'].move(x=-3.8, z=14)
+        self.objects['lantern4'].scale(5, 5, 5)
+        self.objects['lantern4'].move(x=3.8, z=14)
+        self.objects['lantern5'].scale(5, 5, 5)
+        self.objects['lantern5'].move(x=-3.8, z=30)
+        self.objects['lantern6'].scale(5, 5, 5)
+        self.objects['lantern6'].move(x=3.8, z=30)
+
+        self.objects['sconce'].scale(2,2,2)
+        self.objects['sconce'].move(x=-4.49172, y=8,z=-24.85)
+        self.objects['sconce'].rotate(90, axis='y')
+
+        self.objects['sconce2'].scale(2,2,2)
+        self.objects['sconce2'].move(x=4.49172, y=8,z=-24.85)
+        self.objects['sconce2'].rotate(90, axis='y')
+
+        self.objects['sconce3'].scale(2,2,2)
+        self.objects['sconce3'].move(x=-5, y=18.3,z=-24.3)
+        self.objects['sconce3'].rotate(-90, axis='y')
+
+        self.objects['sconce4'].scale(2,2,2)
+        self.objects['sconce4'].move(x=5, y=18.3,z=-24.3)
+        self.objects['sconce4'].rotate(-90, axis='y')
+
+        self.objects['boxFloor'].scale(20,.5,20)
+        self.objects['boxFloor'].move(y=3.3,x=0.1,z=-30)
+        self.objects['boxGround'].scale(149, 0.01, 149)
+        self.objects['boxSky'].scale(150, 150, 150)
+
+        self.objects['gate'].scale(15, 15, 15)
+        self.objects['gate'].move(z=20)
+        self.objects['temple'].scale(1.5, 1.5, 1.5)
+        self.objects['temple'].move(z=-30)
+        self.objects['buddha'].scale(20, 20, 20)
+        self.objects['buddha'].rotate(180, axis='y')
+        self.objects['buddha'].move(z=60)
+
+        self.instanceGroups = buildInstanceGroups(self.objects.values())
+        self.culler = FrustumCuller()
+
+        # every frame's draws go through one queue, glState.calls counts the GL calls they issue
+        self.glState = GLState()
+        self.drawQueue = DrawQueue(self.glState)
+
+        # the static objects are batched once their meshes are decoded (right away unless streaming)
+        self.staticObjects = [obj for name, obj in self.objects.items() if name not in DYNAMIC_OBJECTS]
+        self.staticBatch = None
+        if not stream:
+            self.buildStaticBatch()
+
+        # a profiler.FrameProfiler set here times the steps of render() as its scopes
+        self.profiler = None
+
+    # a profiler scope around a step of render(), or nothing without a profiler
+    # -------------------------------------------------------------------------
+    def profileScope(self, name: str):
+        return self.profiler.scope(name) if self.profiler is not None else contextlib.nullcontext()
+
+    # pre-transforms the static objects into one buffer, now that their final positions are known
+    # --------------------------------------------------------------------------------------------
+    def buildStaticBatch(self) -> None:
+        self.staticBatch = StaticBatch(self.staticObjects, VERTEX_STRIDE, lambda obj: obj.textures)
+
+    # uploads streamed assets for up to budget seconds, returns True once everything is loaded
+    # ----------------------------------------------------------------------------------------
+    def streamAssets(self, budget: float) -> bool:
+        loaded = self.loadStream is None or self.loadStream.poll(budget) == 0
+        if loaded and self.staticBatch is None:
+            self.buildStaticBatch()
+        return loaded
+
+    # a streamed mesh was decoded: the objects using it now know their bounds (and show them)
+    def meshDecoded(self, mesh: Mesh) -> None:
+        for obj in self.objects.values():
+            if obj.mesh is mesh:
+                obj.refresh_bounds()
+
+    # a texture has all its mip levels on the GPU (texture is None when its image failed to load)
+    def textureLoaded(self, path: str, textureID: int, texture) -> None:
+        if texture is not None:
+            self.textures.add(textureID, texture, path)
+
+    # moves the point light circling the buddha to the given angle (radians) on its orbit
+    # ------------------------------------------------------------------------------------
+    def orbitLight(self, angle: float) -> None:
+        buddha_center = 65
+        x = light_radius * math.sin(angle)
+        z = buddha_center + light_radius * math.cos(angle)
+
+        self.pointLightPositions[0] = glm.vec3(x, light_height, z)
+
+    # renders one frame seen from camera into the current framebuffer
+    # ---------------------------------------------------------------
+    def render(self, camera: Camera, aspect: float) -> None:
+        with self.profileScope("clear"):
+            glClearColor(0.1, 0.1, 0.1, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        with self.profileScope("light uniforms"):
+            # the shader the objects are drawn with (the static batch always uses the non instanced one)
+            shader = self.instancedShader if use_instancing else self.lightingShader
+
+            #   The point lights are kept in a uniform buffer object (see light_manager.py): only the lights that
+            #   changed since the last frame are re-uploaded, which here is the one circling the buddha, plus the
+            #   colours of every light when they are toggled/changed in key_callback.
+
+            # # directional light
+            # shader.setVec3("dirLight.direction", -0.2, -1.0, -0.3)
+            # shader.setVec3("dirLight.ambient", 0.05, 0.05, 0.05)
+            # shader.setVec3("dirLight.diffuse", 0.4, 0.4, 0.4)
+            # shader.setVec3("dirLight.specular", 0.5, 0.5, 0.5)
+
+        
+            ambient_color = glm.vec3(0.0) 
+            if enable_ambient:
+                ambient_color = ambient_light_color
+        
+            diffuse_color = glm.vec3(0.0)
+            if enable_diffuse:
+                diffuse_color = diffuse_light_color
+        
+            specular_color = glm.vec3(0) 
+            if enable_specular:
+                specular_color = specular_light_color
+
+            # point lights
+            self.pointLights.set_position(0, self.pointLightPositions[0])
+            self.pointLights.set_colors(ambient_color, diffuse_color, specular_color)
+            self.pointLights.upload()
+
+            # view/projection transformations
+            projection = glm.perspective(glm.radians(camera.Zoom), aspect, 0.1, 150.0) # near and far culling
+            view = camera.GetViewMatrix()
+
+            # sort the point lights into the view frustum clusters
+            self.lightClusters.enabled = use_light_clusters
+            self.lightClusters.update_projection(projection, 0.1, 150.0)
+            self.lightClusters.build(self.pointLights, view)
+
+            # be sure to activate shader when setting uniforms/drawing objects
+            for lightingShader in (self.lightingShader, self.instancedShader):
+                lightingShader.use()
+                lightingShader.setVec3("viewPos", camera.Position)
+                lightingShader.setMat4("projection", projection)
+                lightingShader.setMat4("view", view)
+
+        with self.profileScope("visibility"):
+            # only the objects inside the view frustum are drawn
+            self.culler.enabled = use_frustum_culling
+            visibleObjects = self.culler.cull(self.objects.values(), projection, view)
+
+            # page the mip levels the visible objects need in (and others out, when over budget)
+            viewportHeight = glGetIntegerv(GL_VIEWPORT)[3]
+            pixelsPerUnit = viewportHeight / (2 * math.tan(glm.radians(camera.Zoom) / 2))
+            self.textures.update(visibleObjects, camera.Position, pixelsPerUnit)
+
+            # and the level of detail of their meshes, from their size on screen
+            update_lods(visibleObjects, camera.Position, pixelsPerUnit, use_mesh_lod)
+
+        with self.profileScope("object draws"):
+            # queue the draws, the static objects through the batch and the others one by one (or
+            # instanced), then issue them sorted by shader, textures and VAO
+            self.glState.new_frame()
+            self.glState.filter = self.drawQueue.sort = use_state_sorting
+
+            batched = set(self.staticBatch.objects) if use_static_batching and self.staticBatch is not None else set()
+            dynamicObjects = [obj for obj in visibleObjects if obj not in batched]
+            if use_instancing:
+                submitInstanced(self.drawQueue, self.instanceGroups, shader, dynamicObjects)
+            else:
+                for obj in dynamicObjects:
+                    obj.submit(self.drawQueue, shader)
+
+            staticObjects = [obj for obj in visibleObjects if obj in batched]
+            if staticObjects:
+                self.staticBatch.submit(self.drawQueue, self.lightingShader.ID, staticObjects, lambda obj: obj.textures)
+            self.drawQueue.flush()
+
+            # streamed meshes that are not on the GPU yet are drawn as their bounding boxes
+            placeholders = [obj for obj in visibleObjects if obj.mesh.decoded and not obj.mesh.loaded]
+            if placeholders:
+                self.lightingShader.use()
+                self.lightingShader.setVec3("viewPos", camera.Position)
+                self.lightingShader.setMat4("projection", projection)
+                self.lightingShader.setMat4("view", view)
+                self.lightingShader.setVec3("positionScale", glm.vec3(1.0))
+                self.lightingShader.setVec3("positionOffset", glm.vec3(0.0))
+
+                glBindVertexArray(self.cubeVAO)
+                for obj in placeholders:
+                    self.lightingShader.setMat4("model", obj.model * obj.mesh.box)
+                    obj.bind_textures()
+                    glDrawArrays(GL_TRIANGLES, 0, 36)
+
+        with self.profileScope("lamp cubes"):
+            # also draw the lamp object(s)
+            self.lightCubeShader.use()
+            self.lightCubeShader.setMat4("projection", projection)
+            self.lightCubeShader.setMat4("view", view)
+
+            # we now draw as many light bulbs as we have point lights.
+            glBindVertexArray(self.lightCubeVAO)
+            for i in range(len(self.pointLightPositions)):
+                model = glm.mat4(1.0)
+                model = glm.translate(model, self.pointLightPositions[i])
+                model = glm.scale(model, glm.vec3(0.2)) # Make it a smaller cube
+                self.lightCubeShader.setMat4("model", model)
+                glDrawArrays(GL_TRIANGLES, 0, 36)
+
+    # optional: de-allocate all resources once they've outlived their purpose:
+    # ------------------------------------------------------------------------
+    def delete(self) -> None:
+        if self.loadStream is not None:
+            self.loadStream.close()
+        glDeleteVertexArrays(1, (self.cubeVAO,))
+        glDeleteVertexArrays(1, (self.lightCubeVAO,))
+        glDeleteBuffers(1, (self.VBO,))
+        self.pointLights.delete()
+        self.lightClusters.delete()
+        for group in self.instanceGroups:
+            group.delete()
+        if self.staticBatch is not None:
+            self.staticBatch.delete()
+        for obj in self.objects.values():
+            obj.delete()
+
 def main() -> int:
-    global deltaTime, lastFrame, rotation_angle, light_radius
+    global deltaTime, lastFrame, rotation_angle, light_radius, printTextures, writeTrace
 
     # glfw: initialize and configure
     # ------------------------------
@@ -208,195 +850,20 @@ def main() -> int:
     # -----------------------------
     glEnable(GL_DEPTH_TEST)
 
-    # build and compile our shader zprogram
-    # ------------------------------------
-    lightingShader = Shader("6.multiple_lights.vs", "6.multiple_lights.fs")
-    lightCubeShader = Shader("6.light_cube.vs", "6.light_cube.fs")
-    # set up vertex data (and buffer(s)) and configure vertex attributes
-    # ------------------------------------------------------------------
-    vertices = glm.array(glm.float32,
-        # positions          # normals           # texture coords
-        -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  0.0,
-         0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  0.0,
-         0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  1.0,
-         0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  1.0,  1.0,
-        -0.5,  0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  1.0,
-        -0.5, -0.5, -0.5,  0.0,  0.0, -1.0,  0.0,  0.0,
-
-        -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  0.0,
-         0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  0.0,
-         0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  1.0,
-         0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  1.0,  1.0,
-        -0.5,  0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  1.0,
-        -0.5, -0.5,  0.5,  0.0,  0.0,  1.0,  0.0,  0.0,
-
-        -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,  1.0,  0.0,
-        -0.5,  0.5, -0.5, -1.0,  0.0,  0.0,  1.0,  1.0,
-        -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,  0.0,  1.0,
-        -0.5, -0.5, -0.5, -1.0,  0.0,  0.0,  0.0,  1.0,
-        -0.5, -0.5,  0.5, -1.0,  0.0,  0.0,  0.0,  0.0,
-        -0.5,  0.5,  0.5, -1.0,  0.0,  0.0,  1.0,  0.0,
-
-         0.5,  0.5,  0.5,  1.0,  0.0,  0.0,  1.0,  0.0,
-         0.5,  0.5, -0.5,  1.0,  0.0,  0.0,  1.0,  1.0,
-         0.5, -0.5, -0.5,  1.0,  0.0,  0.0,  0.0,  1.0,
-         0.5, -0.5, -0.5,  1.0,  0.0,  0.0,  0.0,  1.0,
-         0.5, -0.5,  0.5,  1.0,  0.0,  0.0,  0.0,  0.0,
-         0.5,  0.5,  0.5,  1.0,  0.0,  0.0,  1.0,  0.0,
-
-        -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  0.0,  1.0,
-         0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  1.0,  1.0,
-         0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  1.0,  0.0,
-         0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  1.0,  0.0,
-        -0.5, -0.5,  0.5,  0.0, -1.0,  0.0,  0.0,  0.0,
-        -0.5, -0.5, -0.5,  0.0, -1.0,  0.0,  0.0,  1.0,
-
-        -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  0.0,  1.0,
-         0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  1.0,  1.0,
-         0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  1.0,  0.0,
-         0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  1.0,  0.0,
-        -0.5,  0.5,  0.5,  0.0,  1.0,  0.0,  0.0,  0.0,
-        -0.5,  0.5, -0.5,  0.0,  1.0,  0.0,  0.0,  1.0
-    )
-
-    # positions of the point lights
-    pointLightPositions = [
-        # ambient
-        glm.vec3( 140,  140, 140),
-        glm.vec3( -140,  140,  140),
-        glm.vec3( 140,  140,  -140),
-        glm.vec3( -140,  140,  -140),
-
-        # buddha
-        glm.vec3( 65,  50.0,  65),
-
-        # templo
-        glm.vec3( 4.49172, 9, -24.85),
-        glm.vec3( -4.49172, 9, -24.85),
-
-        glm.vec3( 5, 19.3, -24.3),
-        glm.vec3( -5, 19.3, -24.3),
-
-        # entrada
-
-        glm.vec3( -3.8,  4.2, -5.0),
-        glm.vec3( 3.8,  4.2, -5.0),
-
-        glm.vec3( -6.5,  17.2, 20.0),
-        glm.vec3( 6.5,  17.2, 20.0),
-
-        glm.vec3( -3.8,  4.2, 14),
-        glm.vec3( 3.8,  4.2, 14),
-
-        glm.vec3( -3.8,  4.2, 30.0),
-        glm.vec3( 3.8,  4.2, 30.0),
-    ]
-
-    # first, configure the cube's VAO (and VBO)
-    cubeVAO = glGenVertexArrays(1)
-    VBO = glGenBuffers(1)
-
-    glBindBuffer(GL_ARRAY_BUFFER, VBO)
-    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices.ptr, GL_STATIC_DRAW)
-
-    glBindVertexArray(cubeVAO)
-    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), None)
-    glEnableVertexAttribArray(0)
-    glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), ctypes.c_void_p(3 * glm.sizeof(glm.float32)))
-    glEnableVertexAttribArray(1)
-    glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), ctypes.c_void_p(6 * glm.sizeof(glm.float32)))
-    glEnableVertexAttribArray(2)
-
-    # second, configure the light's VAO (VBO stays the same the vertices are the same for the light object which is also a 3D cube)
-    lightCubeVAO = glGenVertexArrays(1)
-    glBindVertexArray(lightCubeVAO)
-
-    glBindBuffer(GL_ARRAY_BUFFER, VBO)
-    # note that we update the lamp's position attribute's stride to reflect the updated buffer data
-    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 8 * glm.sizeof(glm.float32), None)
-    glEnableVertexAttribArray(0)
-
-    # load textures (we now use a utility function to keep the code more organized)
-    # -----------------------------------------------------------------------------
-
-    # shader configuration
-    # --------------------
-    lightingShader.use()
-    lightingShader.setInt("material.diffuse", 0)
-    lightingShader.setInt("material.specular", 1)
-
-    objects = {
-        'boxSky': LoadObject("./objects/cube/cube.obj", "./objects/cube/Textures/sky.png", "./objects/cube/Textures/container2_specular.png"),
-        'boxFloor': LoadObject("./objects/cube/cube.obj", "./objects/cube/Textures/container2.png", "./objects/cube/Textures/container2_specular.png"),
-        'boxGround': LoadObject("./objects/cube/cube.obj", "./objects/cube/Textures/grama.jpg","./objects/cube/Textures/green_grass_specular.jpg"),
-        'temple': LoadObject("./objects/temple/Japanese_Temple.obj", './objects/temple/Textures/Japanese_Temple_Paint2.png', './objects/temple/Textures/Japanese_Temple_Paint2_specular.png'),
-        'gate': LoadObject("./objects/gate/Japanese_Torii_Gate.obj", "./objects/gate/Textures/Material.001_Base_color.png","./objects/gate/Textures/internal_ground_ao_texture.jpeg"),
-        'buddha': LoadObject("./objects/buddha/SM_Buddha.obj", "./objects/buddha/Textures/Buddha_low_DefaultMaterial_BaseColor.png","./objects/buddha/Textures/Buddha_low_DefaultMaterial_Roughness.png"),
-        'sconce': LoadObject("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
-        'sconce2': LoadObject("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
-        'sconce3': LoadObject("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
-        'sconce4': LoadObject("./objects/Wall_Sconce/Wall_Sconce.obj", "./objects/Wall_Sconce/Textures/Wall_Sconce_BaseColor_4k.png","./objects/Wall_Sconce/Textures/Wall_Sconce_Roughness_4k.png"),
-        'table': LoadObject("./objects/table/simple-table.obj", "./objects/table/Textures/lambert1_Base_Color.png","./objects/table/Textures/lambert1_Roughness.png"),
-        'pillow': LoadObject("./objects/pillow/Pillow1.obj", "./objects/pillow/Textures/FabricDenim001_COL_VAR1_1K.jpg","./objects/pillow/Textures/GraphicDesignWallpaperEclectic26_VAR2_1K.png"),
-        'lantern': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        'lantern2': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        'lantern3': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        'lantern4': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        'lantern5': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        'lantern6': LoadObject("./objects/lantern/lantern.obj", "./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_BaseColor.png","./objects/lantern/Textures/Stone_Lantern_Stone_Lantern_OcclusionRoughnessMetallic.png"),
-        }
-
-
-    objects['table'].move(y=3.2,z=-31)
-    objects['table'].scale(.02,.02,.02)
-    objects['pillow'].move(y=3.8,z=-33)
-
-    objects['lantern'].scale(5, 5, 5)
-    objects['lantern'].move(x=-3.8, z=-5.0)
-    objects['lantern2'].scale(5, 5, 5)
-    objects['lantern2'].move(x=3.8, z=-5.0)
-    objects['lantern3'].scale(5, 5, 5)
-    objects['lantern3'].move(x=-3.8, z=14)
-    objects['lantern4'].scale(5, 5, 5)
-    objects['lantern4'].move(x=3.8, z=14)
-    objects['lantern5'].scale(5, 5, 5)
-    objects['lantern5'].move(x=-3.8, z=30)
-    objects['lantern6'].scale(5, 5, 5)
-    objects['lantern6'].move(x=3.8, z=30)
-
-    objects['sconce'].scale(2,2,2)
-    objects['sconce'].move(x=-4.49172, y=8,z=-24.85)
-    objects['sconce'].rotate(90, axis='y')
-
-    objects['sconce2'].scale(2,2,2)
-    objects['sconce2'].move(x=4.49172, y=8,z=-24.85)
-    objects['sconce2'].rotate(90, axis='y')
-
-    objects['sconce3'].scale(2,2,2)
-    objects['sconce3'].move(x=-5, y=18.3,z=-24.3)
-    objects['sconce3'].rotate(-90, axis='y')
-
-    objects['sconce4'].scale(2,2,2)
-    objects['sconce4'].move(x=5, y=18.3,z=-24.3)
-    objects['sconce4'].rotate(-90, axis='y')
-
-    objects['boxFloor'].scale(20,.5,20)
-    objects['boxFloor'].move(y=3.3,x=0.1,z=-30)
-    objects['boxGround'].scale(149, 0.01, 149)
-    objects['boxSky'].scale(150, 150, 150)
-
-    objects['gate'].scale(15, 15, 15)
-    objects['gate'].move(z=20)
-    objects['temple'].scale(1.5, 1.5, 1.5)
-    objects['temple'].move(z=-30)
-    objects['buddha'].scale(20, 20, 20)
-    objects['buddha'].rotate(180, axis='y')
-    objects['buddha'].move(z=60)
+    # the first frame shows up right away, the assets are filled in while rendering
+    scene = Scene(stream=True)
+    loaded = False
+    windowTitle = None
 
+    # CPU and GPU time of every step of the frame, see profiler.py
+    profiler = FrameProfiler()
+    overlay = ProfilerOverlay(profiler)
+    scene.profiler = profiler
 
     # render loop
     # -----------
     while (not glfwWindowShouldClose(window)):
+        profiler.begin_frame()
 
         # per-frame time logic
         # --------------------
@@ -404,115 +871,64 @@ def main() -> int:
         deltaTime = currentFrame - lastFrame
         lastFrame = currentFrame
 
-        buddha_center = 65
         rotation_angle += deltaTime * 0.5  
-        x = light_radius * math.sin(rotation_angle)
-        z = buddha_center + light_radius * math.cos(rotation_angle)
+        scene.orbitLight(rotation_angle)
+        #print(scene.pointLightPositions[0])
 
-        pointLightPositions[0] = glm.vec3(x, light_height, z)
-        #print(pointLightPositions[0])
+        # the overlay's text texture is re-uploaded before this frame's draws, see profiler.py
+        if show_profiler:
+            with profiler.scope("overlay update"):
+                overlay.update()
 
         # input
         # -----
-        processInput(window)
-        glfwSetKeyCallback(window, key_callback)
+        with profiler.scope("input"):
+            processInput(window)
+            glfwSetKeyCallback(window, key_callback)
+
+        # upload what the background loader has finished, within this frame's budget
+        # ---------------------------------------------------------------------------
+        if not loaded:
+            with profiler.scope("asset streaming"):
+                if scene.streamAssets(UPLOAD_BUDGET_MS / 1000):
+                    loaded = True
+                    print(assets.report())
 
         # render
         # ------
-        glClearColor(0.1, 0.1, 0.1, 1.0)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        scene.render(camera, SCR_WIDTH / SCR_HEIGHT)
 
-        # be sure to activate shader when setting uniforms/drawing objects
-        lightingShader.use()
-        lightingShader.setVec3("viewPos", camera.Position)
-        lightingShader.setFloat("material.shininess", 32.0)
+        title = (f"LearnOpenGL - {scene.culler.drawn} drawn, {scene.culler.culled} culled, "
+                 f"{scene.glState.calls} GL calls, {scene.textures.usage()}")
+        if title != windowTitle:
+            windowTitle = title
+            glfwSetWindowTitle(window, title)
 
-        
-        #   Here we set all the uniforms for the 5/6 types of lights we have. We have to set them manually and index 
-        #   the proper PointLight struct in the array to set each uniform variable. This can be done more code-friendly
-        #   by defining light types as classes and set their values in there, or by using a more efficient uniform approach
-        #   by using 'Uniform buffer objects', but that is something we'll discuss in the 'Advanced GLSL' tutorial.
-           
-        # # directional light
-        # lightingShader.setVec3("dirLight.direction", -0.2, -1.0, -0.3)
-        # lightingShader.setVec3("dirLight.ambient", 0.05, 0.05, 0.05)
-        # lightingShader.setVec3("dirLight.diffuse", 0.4, 0.4, 0.4)
-        # lightingShader.setVec3("dirLight.specular", 0.5, 0.5, 0.5)
+        if printTextures:
+            printTextures = False
+            print(scene.textures.report())
 
-        
-        ambient_color = glm.vec3(0.0) 
-        if enable_ambient:
-            ambient_color = ambient_light_color
-        
-        diffuse_color = glm.vec3(0.0)
-        if enable_diffuse:
-            diffuse_color = diffuse_light_color
-        
-        specular_color = glm.vec3(0) 
-        if enable_specular:
-            specular_color = specular_light_color
-
-        # point light 1
-        for i in range(len(pointLightPositions)):
-            lightingShader.setVec3(f"pointLights[{i}].position", pointLightPositions[i])
-            lightingShader.setVec3(f"pointLights[{i}].ambient", ambient_color)
-            lightingShader.setVec3(f"pointLights[{i}].diffuse", diffuse_color)
-            lightingShader.setVec3(f"pointLights[{i}].specular", specular_color)
-            lightingShader.setFloat(f"pointLights[{i}].constant", 1.0)
-            lightingShader.setFloat(f"pointLights[{i}].linear", 0.09)
-            lightingShader.setFloat(f"pointLights[{i}].quadratic", 0.032)
-        
-        # spotLight
-        # lightingShader.setVec3("spotLight.position", camera.Position)
-        # lightingShader.setVec3("spotLight.direction", camera.Front)
-        lightingShader.setVec3("spotLight.ambient", 0.0, 0.0, 0.0)
-        lightingShader.setVec3("spotLight.diffuse", 1.0, 1.0, 1.0)
-        lightingShader.setVec3("spotLight.specular", 1.0, 1.0, 1.0)
-        lightingShader.setFloat("spotLight.constant", 1.0)
-        lightingShader.setFloat("spotLight.linear", 0.09)
-        lightingShader.setFloat("spotLight.quadratic", 0.032)
-        lightingShader.setFloat("spotLight.cutOff", glm.cos(glm.radians(12.5)))
-        lightingShader.setFloat("spotLight.outerCutOff", glm.cos(glm.radians(15.0)))     
-
-        # view/projection transformations
-        projection = glm.perspective(glm.radians(camera.Zoom), SCR_WIDTH / SCR_HEIGHT, 0.1, 150.0) # near and far culling
-        view = camera.GetViewMatrix()
-        lightingShader.setMat4("projection", projection)
-        lightingShader.setMat4("view", view)
-
-        # world transformation
-        model = glm.mat4(1.0)
-        lightingShader.setMat4("model", model)
-
-        for obj in objects.values():
-            model = obj.model
-            lightingShader.setMat4("model", model)
-            obj.draw(lightingShader, model)
-
-        # also draw the lamp object(s)
-        lightCubeShader.use()
-        lightCubeShader.setMat4("projection", projection)
-        lightCubeShader.setMat4("view", view)
-
-        # we now draw as many light bulbs as we have point lights.
-        glBindVertexArray(lightCubeVAO)
-        for i in range(len(pointLightPositions)):
-            model = glm.mat4(1.0)
-            model = glm.translate(model, pointLightPositions[i])
-            model = glm.scale(model, glm.vec3(0.2)) # Make it a smaller cube
-            lightCubeShader.setMat4("model", model)
-            glDrawArrays(GL_TRIANGLES, 0, 36)
+        if show_profiler:
+            with profiler.scope("overlay"):
+                overlay.draw()
+
+        if writeTrace:
+            writeTrace = False
+            frames = profiler.write_trace(PROFILE_TRACE)
+            print(f"{frames} frames written to {PROFILE_TRACE}")
+            print("\n".join(profiler.summary()))
 
         # glfw: swap buffers and poll IO events (keys pressed/released, mouse moved etc.)
         # -------------------------------------------------------------------------------
-        glfwSwapBuffers(window)
-        glfwPollEvents()
+        with profiler.scope("swap"):
+            glfwSwapBuffers(window)
+            glfwPollEvents()
 
-    # optional: de-allocate all resources once they've outlived their purpose:
-    # ------------------------------------------------------------------------
-    glDeleteVertexArrays(1, (cubeVAO,))
-    glDeleteVertexArrays(1, (lightCubeVAO,))
-    glDeleteBuffers(1, (VBO,))
+        profiler.end_frame()
+
+    overlay.delete()
+    profiler.delete()
+    scene.delete()
 
     # glfw: terminate, clearing all previously allocated GLFW resources.
     # ------------------------------------------------------------------
@@ -575,37 +991,211 @@ def scroll_callback(window: GLFWwindow, xoffset: float, yoffset: float) -> None:
 # utility function for loading a 2D texture from file
 # ---------------------------------------------------
 def loadTexture(path: str) -> int:
+    return uploadTexture(path, load_texture(path, compress=compressTextures()))
+
+# whether textures are read from the compressed texture cache entries
+def compressTextures() -> bool:
+    if not COMPRESS_TEXTURES:
+        return False
+    extensions = {glGetStringi(GL_EXTENSIONS, i).decode() for i in range(glGetIntegerv(GL_NUM_EXTENSIONS))}
+    return "GL_EXT_texture_compression_s3tc" in extensions
+
+# how the asset loaders decode meshes and textures: both come from their on-disk caches
+def assetDecoders() -> dict:
+    return {"mesh": parse_mesh, "texture": functools.partial(load_texture, compress=compressTextures())}
+
+# creates the texture object for a texture_cache.BakedTexture (None if the image failed to load),
+# uploading its baked mip levels as they are
+# -----------------------------------------------------------------------------------------------
+def uploadTexture(path: str, texture) -> int:
 
     textureID = glGenTextures(1)
-    
-    try:
-        img = LOAD_IMAGE(path)
 
-        nrComponents = len(img.getbands())
+    if texture is None:
+        print("Texture failed to load at path: " + path)
+        return textureID
 
-        format = GL_RED if nrComponents == 1 else \
-                 GL_RGB if nrComponents == 3 else \
-                 GL_RGBA 
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    for level in range(len(texture.levels)):
+        uploadTextureLevel(texture, level)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(texture.levels) - 1)
 
-        glBindTexture(GL_TEXTURE_2D, textureID)
-        glTexImage2D(GL_TEXTURE_2D, 0, format, img.width, img.height, 0, format, GL_UNSIGNED_BYTE, img.tobytes())
-        glGenerateMipmap(GL_TEXTURE_2D)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    return textureID
 
-        img.close()
+# uploads a mip level of a texture_cache.BakedTexture into the bound texture: the whole level,
+# or only its rows [row, row + rows) when the level is already allocated (multiples of 4 rows
+# for the compressed layouts, which are stored in 4x4 blocks)
+# --------------------------------------------------------------------------------------------
+def uploadTextureLevel(texture, level: int, row: int = 0, rows: int = None) -> None:
+    width, height, data = texture.levels[level]
+    internalFormat, format = TEXTURE_FORMATS[texture.layout]
+
+    # rows of the smaller levels are not 4 byte aligned
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    if rows is None and texture.compressed:
+        glCompressedTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, data)
+    elif rows is None:
+        glTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, format, GL_UNSIGNED_BYTE, data)
+    elif texture.compressed:
+        rowBytes = row_bytes(texture.layout, width)
+        glCompressedTexSubImage2D(GL_TEXTURE_2D, level, 0, row, width, rows, internalFormat,
+                                  data[row // 4 * rowBytes:(row + rows + 3) // 4 * rowBytes])
+    else:
+        rowBytes = row_bytes(texture.layout, width)
+        glTexSubImage2D(GL_TEXTURE_2D, level, 0, row, width, rows, format, GL_UNSIGNED_BYTE,
+                        data[row * rowBytes:(row + rows) * rowBytes])
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+# a 1x1 grey texture, shown until the streamed image replaces it
+# ---------------------------------------------------------------
+def placeholderTexture() -> int:
+    textureID = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 1, 1, 0, GL_RGB, GL_UNSIGNED_BYTE, bytes((128, 128, 128)))
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)
+
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    return textureID
 
-    except:
+# uploads a texture_cache.BakedTexture into textureID, smallest level first, yielding after
+# every level and every UPLOAD_CHUNK_BYTES band of rows: GL_TEXTURE_BASE_LEVEL follows the
+# uploaded levels, so the texture is sampled (blurry at first) from the very first step
+# -----------------------------------------------------------------------------------------
+def streamTexture(textureID: int, path: str, texture):
+    glBindTexture(GL_TEXTURE_2D, textureID)
 
+    if texture is None:
         print("Texture failed to load at path: " + path)
+        # no image at all, like uploadTexture does
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 0, 0, 0, GL_RGB, GL_UNSIGNED_BYTE, None)
+        return
+
+    internalFormat, format = TEXTURE_FORMATS[texture.layout]
+    for level in reversed(range(len(texture.levels))):
+        width, height, _ = texture.levels[level]
+        bandRows = max(UPLOAD_CHUNK_BYTES // row_bytes(texture.layout, width), 1) * (4 if texture.compressed else 1)
+
+        if height <= bandRows:
+            uploadTextureLevel(texture, level)
+        else:
+            glTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, format, GL_UNSIGNED_BYTE, None)
+            for row in range(0, height, bandRows):
+                yield
+                glBindTexture(GL_TEXTURE_2D, textureID)
+                uploadTextureLevel(texture, level, row, min(bandRows, height - row))
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(texture.levels) - 1)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level)
+        yield
+        glBindTexture(GL_TEXTURE_2D, textureID)
 
-    return textureID
+# asset registry loaders: each returns the loaded object and the memory it occupies
+# ---------------------------------------------------------------------------------
+def loadMeshAsset(path: str) -> tuple:
+    mesh = Mesh(path)
+    return mesh, mesh.nbytes
+
+def loadTextureAsset(path: str) -> tuple:
+    textureID = loadTexture(path)
+    return textureID, textureMemory(textureID)
+
+def deleteTexture(textureID: int) -> None:
+    glDeleteTextures(1, (textureID,))
+
+# loads the meshes and textures of (obj, diffuse, specular) path triples into the asset registry,
+# decoding on an asset_loader.AssetLoader pool and uploading on this thread; returns its timings.
+# textureLoaded(path, textureID, bakedTexture) is called for every uploaded texture
+# -----------------------------------------------------------------------------------------------
+def preloadAssets(objectPaths, textureLoaded=None, workers: int = None, processes: bool = False) -> dict:
+    def upload(kind: str, path: str, data, decodeTime: float) -> None:
+        start = time.perf_counter()
+        if kind == "mesh":
+            mesh = Mesh(path, data)
+            value, nbytes, unload = mesh, mesh.nbytes, Mesh.delete
+        else:
+            value = uploadTexture(path, data)
+            nbytes, unload = textureMemory(value), deleteTexture
+            if textureLoaded:
+                textureLoaded(path, value, data)
+        assets.preload(kind, path, value, nbytes, decodeTime + time.perf_counter() - start, unload)
+
+    return AssetLoader(workers, processes, assetDecoders()).load(assetRequests(objectPaths), upload)
+
+# puts placeholders (empty meshes, 1x1 grey textures) in the asset registry for the meshes and
+# textures of (obj, diffuse, specular) path triples and returns the asset_loader.AssetStream
+# that replaces their contents as the files are decoded; meshDecoded(mesh) is called as soon
+# as a mesh's bounds are known, before its vertices are uploaded, and textureLoaded like in
+# preloadAssets once a texture has all its levels
+# --------------------------------------------------------------------------------------------
+def streamSceneAssets(objectPaths, meshDecoded, textureLoaded, workers: int = None, processes: bool = False) -> AssetStream:
+    requests = assetRequests(objectPaths)
+
+    placeholders = {}
+    for kind, path in unique_requests(requests):
+        if kind == "mesh":
+            value, unload = Mesh(path, pending=True), Mesh.delete
+        else:
+            value, unload = placeholderTexture(), deleteTexture
+        assets.preload(kind, path, value, 0, 0.0, unload)
+        placeholders[(kind, path)] = value
+
+    def upload(kind: str, path: str, data, decodeTime: float):
+        value = placeholders[(kind, path)]
+        if kind == "mesh":
+            value.set_geometry(*data)
+            meshDecoded(value)
+            yield from value.stream_upload(UPLOAD_CHUNK_BYTES)
+            nbytes = value.nbytes
+        else:
+            yield from streamTexture(value, path, data)
+            nbytes = textureMemory(value)
+            textureLoaded(path, value, data)
+        # the upload is spread over several frames, so only the decode time is recorded
+        assets.update(kind, path, nbytes, decodeTime)
+
+    # meshes first, so their placeholder boxes show up early, then the images from the smallest
+    requests.sort(key=lambda request: (request[0] != "mesh", file_size(request[1])))
+    return AssetStream(requests, upload, workers, processes, assetDecoders())
+
+# the mesh and texture requests for (obj, diffuse, specular) path triples
+def assetRequests(objectPaths) -> list:
+    requests = []
+    for obj_path, diffuse_path, specular_path in objectPaths:
+        requests += [("mesh", obj_path), ("texture", diffuse_path), ("texture", specular_path)]
+    return requests
+
+# memory used by a 2D texture: the sum of its mip levels, compressed or not
+# -------------------------------------------------------------------------
+def textureMemory(textureID: int) -> int:
+    glBindTexture(GL_TEXTURE_2D, textureID)
+    total = 0
+    level = 0
+    while True:
+        width = glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_WIDTH)
+        if width == 0:
+            return total
+
+        if glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED):
+            total += glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED_IMAGE_SIZE)
+        else:
+            height = glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_HEIGHT)
+            internalFormat = glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_INTERNAL_FORMAT)
+            bytesPerTexel = 1 if internalFormat in (GL_RED, GL_R8) else \
+                            3 if internalFormat in (GL_RGB, GL_RGB8) else \
+                            4
+            total += width * height * bytesPerTexel
+        level += 1
 
 def key_callback(window, key, scancode, action, mods):
-    global enable_ambient, enable_diffuse, enable_specular, diffuse_light_color, specular_light_color, ambient_light_color, dt_specular, dt_diffuse, dt_ambient
+    global use_instancing, use_light_clusters, use_frustum_culling, use_mesh_lod, use_static_batching, use_state_sorting, printTextures, show_profiler, writeTrace, enable_ambient, enable_diffuse, enable_specular, diffuse_light_color, specular_light_color, ambient_light_color, dt_specular, dt_diffuse, dt_ambient
 
     if action == GLFW_PRESS:
         if key == GLFW_KEY_1:
@@ -614,6 +1204,24 @@ def key_callback(window, key, scancode, action, mods):
             enable_diffuse = not enable_diffuse
         elif key == GLFW_KEY_3:
             enable_specular = not enable_specular
+        elif key == GLFW_KEY_T:
+            use_instancing = not use_instancing
+        elif key == GLFW_KEY_G:
+            use_light_clusters = not use_light_clusters
+        elif key == GLFW_KEY_F:
+            use_frustum_culling = not use_frustum_culling
+        elif key == GLFW_KEY_H:
+            use_mesh_lod = not use_mesh_lod
+        elif key == GLFW_KEY_Y:
+            use_static_batching = not use_static_batching
+        elif key == GLFW_KEY_E:
+            use_state_sorting = not use_state_sorting
+        elif key == GLFW_KEY_P:
+            printTextures = True
+        elif key == GLFW_KEY_F1:
+            show_profiler = not show_profiler
+        elif key == GLFW_KEY_F2:
+            writeTrace = True
 
         elif key == GLFW_KEY_U:
             specular_light_color = glm.vec3(1, 0, 0)
@@ -655,4 +1263,5 @@ def key_callback(window, key, scancode, action, mods):
             ambient_light_color = glm.vec3(dt_ambient, dt_ambient, dt_ambient)
 
 
-main()
+if __name__ == "__main__":
+    main()
\ No newline at end of file